@@ -0,0 +1,108 @@
+#    Lifelog (bench_compression.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Compare the database size and the save/load latency of a diary for each compression codec
+# Usage : python3 benchmarks/bench_compression.py [--entries N] [--images N] [--image-size WIDTHxHEIGHT] [--noise-bits N]
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lifelog import compression
+from lifelog import config
+from lifelog import crypto_utils
+from lifelog import db_handler
+from lifelog import entry_store
+
+# Build a content looking like a serialized Gtk.TextBuffer : XML text and tags, then the raw pixels of the images
+def make_entry_content(rng, images, image_width, image_height, noise_bits):
+    paragraphs = []
+    for i in range(rng.randint(3, 12)):
+        words = " ".join(rng.choice(("today", "walked", "the", "city", "friends", "coffee", "rain", "work", "felt", "good")) for _ in range(rng.randint(20, 80)))
+        paragraphs.append(f'   <text><apply_tag name="{rng.choice(("bold", "italic", "underline"))}">{words}</apply_tag>\n</text>\n')
+    for i in range(images):
+        paragraphs.append(f'   <text><pixbuf index="{i}" /></text>\n')
+    xml = ('<text_view_markup>\n <tags>\n  <tag name="bold" priority="0">\n   <attr name="weight" type="gint" value="700" />\n  </tag>\n </tags>\n'
+           f' <text>\n{"".join(paragraphs)} </text>\n</text_view_markup>\n').encode("utf-8")
+
+    # Photo-like pixels : a smooth gradient with some bits of noise (added without carries as the gradient stays below the noise)
+    noise_mask = (1 << noise_bits) - 1
+    gradient = bytes(x * (0xFF - noise_mask) // (image_width * 4) for x in range(image_width * 4)) * image_height
+    noise_table = bytes(value & noise_mask for value in range(256))
+    pixbufs = []
+    for i in range(images):
+        noise = rng.randbytes(len(gradient)).translate(noise_table)
+        pixbufs.append((int.from_bytes(gradient, "big") + int.from_bytes(noise, "big")).to_bytes(len(gradient), "big"))
+
+    return b"GTKTEXTBUFFERCONTENTS-0001" + len(xml).to_bytes(4, "big") + xml + b"".join(pixbufs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compression of the entry contents")
+    parser.add_argument("--entries", type=int, default=200, help="number of entries in the diary")
+    parser.add_argument("--images", type=int, default=2, help="images per entry")
+    parser.add_argument("--image-size", default="320x240", help="size of each image")
+    parser.add_argument("--noise-bits", type=int, default=3, help="random low bits of each pixel byte (0 to 8, more is less compressible)")
+    args = parser.parse_args()
+
+    image_width, image_height = (int(size) for size in args.image_size.split("x"))
+    rng = random.Random(0)
+    entry_contents = [make_entry_content(rng, args.images, image_width, image_height, args.noise_bits) for _ in range(args.entries)]
+    raw_mib = sum(len(entry_content) for entry_content in entry_contents) / 1024**2
+
+    codecs = ["none", "zlib"] + (["zstd"] if compression.IS_ZSTD_AVAILABLE else [])
+    print(f"{args.entries} entries with {args.images} images of {args.image_size} ({raw_mib:.1f} MiB of content)")
+    print(f"{'codec':>6} {'db MiB':>8} {'ratio':>7} {'save ms':>9} {'load ms':>9}")
+
+    for codec in codecs:
+        config.COMPRESSION_CODEC = codec
+        with tempfile.TemporaryDirectory() as temp_dir:
+            db = db_handler.DbHandler(os.path.join(temp_dir, "diary.db"))
+            db.ensure_schema()
+            store = entry_store.EntryStore(db, crypto_utils.AESCipher(os.urandom(32)))
+            entry_dates = [f"{2000 + i // 365:04d}-{i // 28 % 12 + 1:02d}-{i % 28 + 1:02d}" for i in range(args.entries)]
+
+            save_seconds = []
+            for entry_date, entry_content in zip(entry_dates, entry_contents):
+                start_time = time.perf_counter()
+                store.save_entry(entry_date, "Title", "tags", 50, entry_content)
+                save_seconds.append(time.perf_counter() - start_time)
+
+            load_seconds = []
+            store.cache.clear()
+            for entry_date in entry_dates:
+                start_time = time.perf_counter()
+                store.load_entry(entry_date)
+                load_seconds.append(time.perf_counter() - start_time)
+                store.cache.clear()
+
+            db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            store.close()
+            db.close()
+            db_mib = os.path.getsize(os.path.join(temp_dir, "diary.db")) / 1024**2
+
+        print(f"{codec:>6} {db_mib:>8.1f} {raw_mib / db_mib:>6.2f}x {statistics.median(save_seconds) * 1000:>9.2f} {statistics.median(load_seconds) * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#    Lifelog (bench_decrypt.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Measure the throughput of AESCipher.decrypt_many for an increasing number of workers
+# Usage : python3 benchmarks/bench_decrypt.py [--count N] [--size BYTES] [--workers 1,2,4,8]
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lifelog import crypto_utils
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the parallel decryption of many values")
+    parser.add_argument("--count", type=int, default=2000, help="number of encrypted values")
+    parser.add_argument("--size", type=int, default=64 * 1024, help="size of each value in bytes")
+    parser.add_argument("--workers", default=f"1,2,4,{os.cpu_count() or 1}", help="comma-separated worker counts")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per worker count (the best one is kept)")
+    args = parser.parse_args()
+
+    aes_cipher = crypto_utils.AESCipher(os.urandom(32))
+    encrypted_values = aes_cipher.encrypt_many((os.urandom(args.size) for _ in range(args.count)))
+    total_mib = args.count * args.size / 1024**2
+
+    print(f"{args.count} values of {args.size} bytes ({total_mib:.1f} MiB), {os.cpu_count()} CPU cores")
+    print(f"{'workers':>8} {'seconds':>10} {'MiB/s':>10} {'speedup':>8}")
+
+    baseline_seconds = None
+    for workers in sorted({int(workers) for workers in args.workers.split(",")}):
+        best_seconds = None
+        for _ in range(args.repeat):
+            start_time = time.perf_counter()
+            aes_cipher.decrypt_many(encrypted_values, workers)
+            elapsed_seconds = time.perf_counter() - start_time
+            best_seconds = elapsed_seconds if best_seconds is None else min(best_seconds, elapsed_seconds)
+
+        baseline_seconds = baseline_seconds or best_seconds
+        print(f"{workers:>8} {best_seconds:>10.3f} {total_mib / best_seconds:>10.1f} {baseline_seconds / best_seconds:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#    Lifelog (bench_suite.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Time the main operations of the app on a synthetic diary, without Gtk, and print the results as JSON
+# (latency percentiles in milliseconds and peak memory), to compare them between versions
+# Usage : python3 benchmarks/bench_suite.py [--entries N] [--images-every N] [--diary FILE] [--output FILE] [--compare BASELINE_FILE]
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lifelog import crypto_utils
+from lifelog import db_handler
+from lifelog import entry_store
+from lifelog import exporter
+from lifelog import key_manager
+from lifelog import search
+from synthetic_diary import PASSWORD, generate_diary
+
+# Not available on Windows
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Get the peak resident memory of the process in MiB (None if unknown)
+def get_peak_rss_mib():
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak_rss / 1024**2 if sys.platform == "darwin" else peak_rss / 1024 # Bytes on macOS, KiB on Linux
+
+
+# Reset the peak resident memory, so that it can be measured for each scenario (only possible on Linux)
+def reset_peak_rss():
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs_file:
+            clear_refs_file.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# Nearest-rank percentile of sorted values
+def get_percentile(sorted_values, percent):
+    return sorted_values[min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))]
+
+
+def summarize(seconds):
+    milliseconds = sorted(elapsed_seconds * 1000 for elapsed_seconds in seconds)
+    return {
+        "runs": len(milliseconds),
+        "mean_ms": sum(milliseconds) / len(milliseconds),
+        "p50_ms": get_percentile(milliseconds, 50),
+        "p90_ms": get_percentile(milliseconds, 90),
+        "p99_ms": get_percentile(milliseconds, 99),
+        "max_ms": milliseconds[-1],
+    }
+
+
+# Call a function with each argument and return the time taken by each call
+def time_calls(function, arguments):
+    seconds = []
+    for argument in arguments:
+        start_time = time.perf_counter()
+        function(argument)
+        seconds.append(time.perf_counter() - start_time)
+    return seconds
+
+
+# Run the scenarios on a diary, returning their results by name
+def run_scenarios(db_filepath, runs, unlock_runs, seed=0):
+    rng = random.Random(seed)
+    db = db_handler.DbHandler(db_filepath)
+    results = {}
+    try:
+        scenarios = []
+
+        def scenario(function):
+            scenarios.append(function)
+            return function
+
+        @scenario
+        def unlock():
+            return time_calls(lambda run: key_manager.unlock(db, PASSWORD), range(unlock_runs))
+
+        aes_key = key_manager.unlock(db, PASSWORD)
+        if aes_key is None:
+            sys.exit(f"The password of the diary must be {PASSWORD.decode()}")
+        store = entry_store.EntryStore(db, crypto_utils.AESCipher(aes_key))
+        entry_dates = db.get_entry_dates_between("0000-00-00", "9999-99-99")
+        if not entry_dates:
+            sys.exit("The diary has no entries")
+        months = sorted({(int(entry_date[:4]), int(entry_date[5:7])) for entry_date in entry_dates})
+
+        # Not cached, like the first display of a day
+        @scenario
+        def load_day():
+            def load_entry(entry_date):
+                store.cache.clear()
+                store.prefetch_cache.clear()
+                store.load_entry(entry_date)
+            return time_calls(load_entry, rng.choices(entry_dates, k=runs))
+
+        # What the app waits for before showing a day : the first chunk of the content, with the previews of its images
+        @scenario
+        def load_day_start():
+            def load_entry_preview(entry_date):
+                store.cache.clear()
+                store.prefetch_cache.clear()
+                store.load_entry_preview(entry_date)
+            return time_calls(load_entry_preview, rng.choices(entry_dates, k=runs))
+
+        @scenario
+        def mark_month():
+            def get_month_mask(month):
+                store.date_masks.clear()
+                store.get_month_mask(*month)
+            return time_calls(get_month_mask, rng.choices(months, k=runs))
+
+        @scenario
+        def save():
+            def save_entry(entry_date):
+                entry = store.load_entry(entry_date)
+                store.save_entry(entry_date, entry.title + " (edited)", entry.tags, entry.mood, entry.content)
+            return time_calls(save_entry, rng.choices(entry_dates, k=runs))
+
+        @scenario
+        def search_title():
+            return time_calls(lambda word: sum(1 for found_entries in search.iter_search_results(store, "0000-00-00", "9999-99-99", "title", word, 64)
+                                              for found_entry in found_entries), rng.choices(("coffee", "rain", "garden", "Day 1"), k=max(1, runs // 20)))
+
+        @scenario
+        def search_mood():
+            return time_calls(lambda mood_filter: sum(1 for found_entries in search.iter_search_results(store, "0000-00-00", "9999-99-99", "mood", mood_filter, 64)
+                                                     for found_entry in found_entries), rng.choices((">= 90", "<= 10", "50"), k=max(1, runs // 20)))
+
+        @scenario
+        def export_jsonl():
+            def export_entries(run):
+                with tempfile.TemporaryDirectory() as temp_dir:
+                    writer = exporter.JsonlWriter(os.path.join(temp_dir, "export.jsonl"))
+                    exporter.export_entries(store, writer, "0000-00-00", "9999-99-99")
+                    writer.close()
+            return time_calls(export_entries, range(1))
+
+        is_peak_rss_per_scenario = True
+        for function in scenarios:
+            is_peak_rss_per_scenario = reset_peak_rss() and is_peak_rss_per_scenario
+            results[function.__name__] = summarize(function())
+            results[function.__name__]["peak_rss_mib"] = get_peak_rss_mib()
+        store.close()
+    finally:
+        db.close()
+    return results, is_peak_rss_per_scenario
+
+
+# Get the scenarios whose median latency is more than threshold_percent above the one of a baseline
+def find_regressions(results, baseline_results, threshold_percent):
+    regressions = {}
+    for name, result in results.items():
+        if name in baseline_results and result["p50_ms"] > baseline_results[name]["p50_ms"] * (1 + threshold_percent / 100):
+            regressions[name] = {"baseline_p50_ms": baseline_results[name]["p50_ms"], "p50_ms": result["p50_ms"]}
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark unlocking, loading, marking the calendar, saving, searching and exporting a diary")
+    parser.add_argument("--entries", type=int, default=1000, help="entries of the generated diary (one per day)")
+    parser.add_argument("--images-every", type=int, default=0, help="add an image to every N-th generated entry (0 : no images)")
+    parser.add_argument("--diary", help=f"use this diary instead of generating one (made with synthetic_diary.py, or having {PASSWORD.decode()} as password)")
+    parser.add_argument("--runs", type=int, default=200, help="runs of the fast scenarios (the searches run 20 times less)")
+    parser.add_argument("--unlock-runs", type=int, default=3, help="runs of the unlock scenario")
+    parser.add_argument("--output", help="write the results to this file instead of printing them")
+    parser.add_argument("--compare", help="results of a previous run, exit with status 1 if a median latency is higher by more than --threshold")
+    parser.add_argument("--threshold", type=float, default=20, help="percentage of the regressions reported by --compare")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_filepath = args.diary
+        generation_seconds = None
+        if db_filepath is None:
+            db_filepath = os.path.join(temp_dir, "diary.db")
+            start_time = time.perf_counter()
+            generate_diary(db_filepath, args.entries, args.images_every)
+            generation_seconds = time.perf_counter() - start_time
+        diary_mib = os.path.getsize(db_filepath) / 1024**2
+        results, is_peak_rss_per_scenario = run_scenarios(db_filepath, args.runs, args.unlock_runs)
+
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count()},
+        "diary": {"path": args.diary, "entries": None if args.diary else args.entries, "images_every": None if args.diary else args.images_every,
+                  "size_mib": diary_mib, "generation_seconds": generation_seconds},
+        "results": results,
+        "peak_rss_mib": get_peak_rss_mib(),
+        "is_peak_rss_per_scenario": is_peak_rss_per_scenario,
+    }
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as baseline_file:
+            report["regressions"] = find_regressions(results, json.load(baseline_file)["results"], args.threshold)
+
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            output_file.write(report_json + "\n")
+    else:
+        print(report_json)
+
+    if report.get("regressions"):
+        for name, regression in report["regressions"].items():
+            print(f"Regression in {name} : median {regression['baseline_p50_ms']:.2f} ms -> {regression['p50_ms']:.2f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#    Lifelog (synthetic_diary.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Generate a synthetic encrypted diary, entries being saved like the app does (records, attachments, search and mood indexes)
+# Usage : python3 benchmarks/synthetic_diary.py OUTPUT [--entries N] [--images-every N] [--image-size WIDTHxHEIGHT] [--seed N]
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lifelog import attachment_store
+from lifelog import crypto_utils
+from lifelog import db_handler
+from lifelog import entry_store
+from lifelog import key_manager
+from lifelog import rich_text
+
+WORDS = ("today", "walked", "the", "city", "friends", "coffee", "rain", "work", "felt", "good", "tired", "book", "music",
+         "dinner", "family", "morning", "project", "garden", "train", "sleep", "happy", "quiet", "long", "call", "park")
+TAGS = ("work", "family", "travel", "health", "books", "music", "sport", "friends")
+FIRST_DATE = date(2000, 1, 1)
+PASSWORD = b"benchmark"
+IMAGE_TYPE = 0x01 | attachment_store.PIXDATA_SAMPLE_WIDTH_8 | attachment_store.PIXDATA_ENCODING_RAW # RGB
+
+# Make an RGB GdkPixdata looking like a photo (a gradient with some noise, so that it compresses like one)
+def make_image(rng, width, height):
+    rowstride = width * 3
+    gradient = bytes(x * 0xF0 // rowstride for x in range(rowstride)) * height
+    noise = rng.randbytes(len(gradient)).translate(bytes(value & 0x0F for value in range(256)))
+    pixels = (int.from_bytes(gradient, "big") + int.from_bytes(noise, "big")).to_bytes(len(gradient), "big")
+    return attachment_store.PIXDATA_HEADER.pack(attachment_store.PIXDATA_MAGIC, attachment_store.PIXDATA_HEADER.size + len(pixels),
+                                                IMAGE_TYPE, rowstride, width, height) + pixels
+
+
+# Make an entry with a few paragraphs (and an image at the end if image_size is given)
+def make_entry(rng, entry_number, image_size=None):
+    entry_title = f"Day {entry_number} " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4)))
+    entry_tags = ", ".join(rng.sample(TAGS, rng.randint(0, 3)))
+    entry_text = "\n\n".join(" ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 120))) for _ in range(rng.randint(1, 6)))
+    if not image_size:
+        return entry_store.Entry(entry_title, entry_tags, rng.randint(0, 100), rich_text.from_plain_text(entry_text))
+
+    # Serialized like Gtk.TextBuffer does, the image being referenced from the text
+    xml = f'<text_view_markup>\n <tags>\n </tags>\n<text>{rich_text.escape(entry_text)}\n<pixbuf index="0" /></text>\n</text_view_markup>\n'.encode("utf-8")
+    text_content = attachment_store.SECTION_HEADER.pack(attachment_store.TEXT_SECTION_NAME, len(xml)) + xml
+    entry_content = attachment_store.join_content(text_content, [make_image(rng, *image_size)])
+    return entry_store.Entry(entry_title, entry_tags, rng.randint(0, 100), entry_content)
+
+
+# Get the date of the entry of the given number (one entry per day from FIRST_DATE)
+def get_entry_date(entry_number):
+    return (FIRST_DATE + timedelta(days=entry_number)).isoformat()
+
+
+# Create a diary with the given number of entries (every images_every-th one having an image, none if 0)
+# kdf_params are the ones of a new diary by default (calibrated to take KDF_TARGET_UNLOCK_SECONDS)
+def generate_diary(db_filepath, entries, images_every=0, image_size=(320, 240), seed=0, kdf_params=None, batch_size=256):
+    rng = random.Random(seed)
+    db = db_handler.DbHandler(db_filepath)
+    try:
+        db.reset_database()
+        aes_key = key_manager.create_keys(db, PASSWORD, kdf_params)
+        db.commit()
+        store = entry_store.EntryStore(db, crypto_utils.AESCipher(aes_key))
+        store.ensure_indexes_built()
+        for first_entry_number in range(0, entries, batch_size):
+            store.save_entries([(get_entry_date(entry_number), make_entry(rng, entry_number, image_size if images_every and entry_number % images_every == 0 else None))
+                                for entry_number in range(first_entry_number, min(entries, first_entry_number + batch_size))])
+        store.close()
+        db.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Generate a synthetic diary (its password is {PASSWORD.decode()})")
+    parser.add_argument("output", help="diary file to create")
+    parser.add_argument("--entries", type=int, default=1000, help="number of entries (one per day)")
+    parser.add_argument("--images-every", type=int, default=0, help="add an image to every N-th entry (0 : no images)")
+    parser.add_argument("--image-size", default="320x240", help="size of each image")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random content")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output):
+        sys.exit(f"The output already exists : {args.output}")
+    start_time = time.perf_counter()
+    generate_diary(args.output, args.entries, args.images_every, tuple(int(size) for size in args.image_size.split("x")), args.seed)
+    print(f"{args.entries} entries generated in {time.perf_counter() - start_time:.1f} s ({os.path.getsize(args.output) / 1024**2:.1f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
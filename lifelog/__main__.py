@@ -16,16 +16,35 @@
 #    You should have received a copy of the GNU General Public License along with 
 #    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
 
+import time
+startup_phases = [("start", time.perf_counter())] # (phase, end time), shown with --profile-startup
+
 import gi
 gi.require_version('Gtk', '3.0')
-from gi.repository import Gtk, Pango, GdkPixbuf
-from sqlite3 import Binary
-from datetime import date, datetime
-from os import urandom
+from gi.repository import Gtk, Gdk, Pango, GLib
+startup_phases.append(("import gtk", time.perf_counter()))
+
+import argparse
+import sys
+from collections import deque
+from datetime import date, datetime, timedelta
 
+# The database, the encryption and the image decoding are imported where they are first used (when a diary is opened),
+# as loading them would delay the main window
 from lifelog import config
-from lifelog import db_handler
-from lifelog import crypto_utils
+from lifelog import content_chunks
+from lifelog import dialogs
+from lifelog import instrumentation
+from lifelog import search
+from lifelog import worker
+from lifelog.entry import EMPTY_ENTRY
+startup_phases.append(("import lifelog", time.perf_counter()))
+
+# Responses of the buttons of the performance dialog (other than Close)
+PERFORMANCE_DIALOG_RESET = 1
+PERFORMANCE_DIALOG_SAVE_STATS = 2
+PERFORMANCE_DIALOG_SAVE_TRACE = 3
+PERFORMANCE_DIALOG_REFRESH = 4
 
 class LifelogApp:
     # Initialize the application
@@ -33,11 +52,21 @@ class LifelogApp:
         self.db_filepath = ""
         self.is_file_opened = False
 
+        # Database of the opened diary (kept open until the file is closed or switched)
+        self.db = None
+        self.temp_db = None
+        self.entry_store = None # Decrypts the entries and keeps the recent ones in memory
+
+        # Runs the database and encryption work outside of the main loop
+        self.worker = worker.BackgroundWorker(GLib.idle_add)
+        # Decodes the inserted images, without delaying the database work
+        self.image_worker = worker.BackgroundWorker(GLib.idle_add, "lifelog-images")
+        self.is_password_verified = False
+
         # Used for encryption
         self.password = b""
         self.aes_key = b"\x00" * 32
-        self.aes_cipher = crypto_utils.AESCipher(self.aes_key)
-        self.scrypt_hasher = crypto_utils.scryptHasher()
+        self.aes_cipher = None # Created when a diary is opened
 
         # Date related variables for the calendar, the database and the user
         self.current_date = str(date.today()).split("-")
@@ -58,9 +87,9 @@ class LifelogApp:
 
         self.trigger_callback_func = True # Set to False to avoid recursion when necessary
 
-        # Initialize the Gtk builder and load the glade file
-        self.builder = Gtk.Builder()
-        self.builder.add_from_file(config.GLADE_FILEPATH)
+        # Build the main window only, the dialogs being built when they are first opened
+        self.builder = dialogs.build_objects(dialogs.MAIN_WINDOW_OBJECTS)
+        mark_startup_phase("build main window")
 
         # Load the main window
         self.main_win = self.builder.get_object("main_win")
@@ -96,6 +125,26 @@ class LifelogApp:
         self.error_statusbar_context_id = self.statusbar.get_context_id("error")
         self.info_statusbar_context_id = self.statusbar.get_context_id("info")
 
+        # Days marked in the calendar (bit 0 being the first day)
+        self.marked_days_mask = 0
+
+        # Search running in the search dialog
+        self.search_cancellation_token = None
+
+        # Chunks of the displayed entry still to be added to the text buffer (see display_entry)
+        self.entry_display_id = 0 # Incremented for each displayed entry, so that the chunks of the previous one are dropped
+        self.pending_entry_chunks = deque()
+        self.entry_chunks_to_read = 0 # Chunks still being read from the database
+        self.entry_chunks_idle_id = None
+        self.has_entry_previews = False
+        self.on_entry_displayed = None
+
+        # Marks where the images being loaded will be inserted, deleted when another entry is displayed (see insert_image)
+        self.image_insertion_marks = set()
+
+        # Date of the entry that couldn't be decrypted, which can't be edited or saved over until it is loaded again
+        self.damaged_entry_date = None
+
         # Widgets for the password dialogs, loaded when necessary
         self.password_set_entry = None
         self.password_set_retype_entry = None
@@ -146,6 +195,14 @@ class LifelogApp:
             "on_search_treeview_row_activated": self.on_search_treeview_row_activated,
         }
         self.builder.connect_signals(self.handlers)
+
+        # Dialogs, built when first opened and then reused
+        self.dialogs = dialogs.DialogFactory(self.main_win, self.handlers)
+
+        # Performance dialog (Ctrl+Shift+D), only when the instrumentation is enabled
+        if instrumentation.is_enabled:
+            self.main_win.connect("key-press-event", self.on_main_win_key_press_event)
+        mark_startup_phase("init app")
         
     
     # Show the main window and start the main loop
@@ -164,18 +221,32 @@ class LifelogApp:
 
         statusbar_date_message = f"Welcome! The current date is : {self.user_formatted_date}"
         self.change_statusbar_message(self.info_statusbar_context_id, statusbar_date_message)
+        mark_startup_phase("show main window")
 
         # Start the main loop
         Gtk.main()
 
+        # Close the opened diary when the main loop ends and wait for the background jobs to finish
+        self.close_database()
+        self.worker.shutdown()
+        self.image_worker.shutdown()
+
+
+    # Close the database of the opened diary and wipe its decrypted entries from memory (in the worker thread, after the pending jobs)
+    def close_database(self):
+        if self.db:
+            self.worker.clear_idle_jobs()
+            self.worker.submit(lambda db=self.db, store=self.entry_store: close_diary(db, store))
+            self.db = None
+            self.entry_store = None
+
 
     def check_for_unsaved_changes(self):
         # Get the unsaved entry changes
         self.unsaved_entry_title = self.title_entry.get_text()
         self.unsaved_entry_tags = self.tags_entry.get_text()
         self.unsaved_entry_mood = int(self.mood_adjustment.get_value())
-        entry_start, entry_end = self.entry_textbuffer.get_bounds()
-        self.unsaved_entry_content = self.entry_textbuffer.serialize(self.entry_textbuffer, self.entry_textbuffer_tags, entry_start, entry_end)
+        self.unsaved_entry_content = self.serialize_entry_textbuffer()
 
         # Compare them to the saved entry details
         is_entry_title_modified = self.saved_entry_title != self.unsaved_entry_title
@@ -188,23 +259,33 @@ class LifelogApp:
 
 
     def open_unsaved_changes_dialog(self):
-        # Temporary builder to fix the filechooser dialog being empty after closing and reopening
-        temp_builder = Gtk.Builder()
-        temp_builder.add_from_file(config.GLADE_FILEPATH)
-        temp_builder.connect_signals(self.handlers)
-
-        unsaved_changes_dialog = temp_builder.get_object("unsaved_changes_dialog")
+        unsaved_changes_dialog = self.dialogs.get_dialog("unsaved_changes_dialog")
         dialog_response = unsaved_changes_dialog.run()
+        unsaved_changes_dialog.hide()
         if dialog_response == Gtk.ResponseType.NO:
-            unsaved_changes_dialog.destroy()
             return False
 
         # If the user wants to ignore the changes
         elif dialog_response == Gtk.ResponseType.YES:
-            unsaved_changes_dialog.destroy()
             return True
 
 
+    # Run the file chooser dialog and return the chosen file path, or None if it is cancelled
+    def choose_file(self, title, action, ok_button_label, current_name=None):
+        filechooser_win = self.dialogs.get_dialog("filechooser_win")
+        filechooser_win.set_title(title)
+        filechooser_win.set_action(action)
+        self.dialogs.get_object("filechooser_win", "ok_button_filechooser_win").set_label(ok_button_label)
+        filechooser_win.unselect_all()
+        if current_name is not None:
+            filechooser_win.set_current_name(current_name)
+
+        filechooser_response = filechooser_win.run()
+        filepath = filechooser_win.get_filename() if filechooser_response == Gtk.ResponseType.OK else None
+        filechooser_win.hide()
+        return filepath
+
+
     def on_password_set_dialog_response(self, dialog, response):        
         if response == Gtk.ResponseType.OK:
             # Get the password from both Gtk.Entry(s)
@@ -218,8 +299,8 @@ class LifelogApp:
                 return True
 
             # If the password is too short, stop the dialog from closing
-            elif len(password) < 8:
-                self.message_label_password_set_dialog.set_text("Password must be at least 8 characters long!")
+            elif len(password) < config.MIN_PASSWORD_LENGTH:
+                self.message_label_password_set_dialog.set_text(f"Password must be at least {config.MIN_PASSWORD_LENGTH} characters long!")
                 dialog.stop_emission_by_name("response")
                 return True
 
@@ -231,33 +312,45 @@ class LifelogApp:
 
     def on_password_verify_dialog_response(self, dialog, response):
         if response == Gtk.ResponseType.OK:
-            self.password = self.password_verify_entry.get_text().encode('utf-8')
+            # The password has been verified, close the dialog and proceed
+            if self.is_password_verified:
+                return False
 
-            # Get the encryption details
-            db = db_handler.DbHandler(self.temp_db_filepath)
-            encryption_salt = db.get_setting("encryption_salt")
-            password_verification_salt = db.get_setting("password_verification_salt")
-            password_verification_hash = db.get_setting("password_verification_hash")
-            db.close()
+            # Stop the dialog from closing while the password is verified in the background
+            dialog.stop_emission_by_name("response")
+            if not self.worker.is_pending("password_verification"):
+                self.message_label_password_verify_dialog.set_text("Verifying password...")
+                password = self.password_verify_entry.get_text().encode('utf-8')
+                self.worker.submit(lambda: self.verify_password(self.temp_db_filepath, password),
+                                   lambda aes_key: self.on_password_verified(dialog, password, aes_key),
+                                   key="password_verification")
+            return True
 
-            # Hash the input password with the password verification salt
-            input_password_hash = self.scrypt_hasher.hash_password(self.password, password_verification_salt)
 
-            # If the hashes match (password is correct)
-            if input_password_hash == password_verification_hash:
-                # Generate the key and load it
-                self.aes_key = self.scrypt_hasher.hash_password(self.password, encryption_salt)
-                self.aes_cipher = crypto_utils.AESCipher(self.aes_key)
+    # Check a password against the diary being opened and return its AES key, or None if it is incorrect (in the worker thread)
+    def verify_password(self, db_filepath, password):
+        from lifelog import db_handler
+        from lifelog import key_manager
 
-                # Close the dialog and proceed
-                return False
+        # The connection is kept if the password is correct
+        if self.temp_db is None:
+            self.temp_db = db_handler.DbHandler(db_filepath)
+        return key_manager.unlock(self.temp_db, password)
 
-            # If the hashes don't match (password is incorrect)
-            else:
-                # Display a message and stop the dialog from closing
-                self.message_label_password_verify_dialog.set_text("Wrong password!")
-                dialog.stop_emission_by_name("response")
-                return True
+
+    def on_password_verified(self, dialog, password, aes_key):
+        # If the password is incorrect, display a message and keep the dialog open
+        if aes_key is None:
+            self.message_label_password_verify_dialog.set_text("Wrong password!")
+            return
+
+        # Load the key, then close the dialog and proceed
+        from lifelog import crypto_utils
+        self.password = password
+        self.aes_key = aes_key
+        self.aes_cipher = crypto_utils.AESCipher(self.aes_key)
+        self.is_password_verified = True
+        dialog.response(Gtk.ResponseType.OK)
 
 
     def on_main_win_delete_event(self, widget, event):
@@ -284,78 +377,69 @@ class LifelogApp:
             if unsaved_changes_dialog_response == False:
                 return
 
-        # Temporary builder to fix the filechooser dialog being empty after closing and reopening
-        temp_builder = Gtk.Builder()
-        temp_builder.add_from_file(config.GLADE_FILEPATH)
-        temp_builder.connect_signals(self.handlers)
-
-        # Load the filechooser dialog and button, and the password set dialog with its entries
-        filechooser_win = temp_builder.get_object("filechooser_win")
-        ok_button_filechooser_win = temp_builder.get_object("ok_button_filechooser_win")
-        password_set_dialog = temp_builder.get_object("password_set_dialog")
-        self.password_set_entry = temp_builder.get_object("password_set_entry")
-        self.password_set_retype_entry = temp_builder.get_object("password_set_retype_entry")
-        self.message_label_password_set_dialog = temp_builder.get_object("message_label_password_set_dialog")
-
-        # Modify to a save filechooser dialog
-        filechooser_win.set_title("Save as")
-        filechooser_win.set_action(Gtk.FileChooserAction.SAVE)
-        ok_button_filechooser_win.set_label(Gtk.STOCK_SAVE_AS)
-
         # Get the selected file or cancel the operation
-        filechooser_response = filechooser_win.run()
-        if filechooser_response == Gtk.ResponseType.OK:
-            self.temp_db_filepath = filechooser_win.get_filename()
-            filechooser_win.destroy()
+        db_filepath = self.choose_file("Save as", Gtk.FileChooserAction.SAVE, Gtk.STOCK_SAVE_AS, current_name="")
+        if db_filepath is not None:
+            self.temp_db_filepath = db_filepath
+
+            # Load the password set dialog with its entries, emptied if it has been used before
+            password_set_dialog = self.dialogs.get_dialog("password_set_dialog")
+            self.password_set_entry = self.dialogs.get_object("password_set_dialog", "password_set_entry")
+            self.password_set_retype_entry = self.dialogs.get_object("password_set_dialog", "password_set_retype_entry")
+            self.message_label_password_set_dialog = self.dialogs.get_object("password_set_dialog", "message_label_password_set_dialog")
+            self.password_set_entry.set_text("")
+            self.password_set_retype_entry.set_text("")
 
             # Run the dialog to get the password used for encryption
             self.message_label_password_set_dialog.set_text("Waiting for password confirmation...")
             password_set_response = password_set_dialog.run()
+            password_set_dialog.hide()
 
             # Stop the process if the user cancels the password dialog, proceed otherwise
             if password_set_response == Gtk.ResponseType.CANCEL:
-                password_set_dialog.destroy()
                 return
 
-            password_set_dialog.destroy()
-
-            # Reset the database and enable saving entries
+            # Close the previous diary and create the new one in the background
+            self.close_database()
+            self.is_file_opened = False
             self.db_filepath = self.temp_db_filepath
-            db = db_handler.DbHandler(self.db_filepath)
-            db.reset_database()
+            self.change_statusbar_message(self.info_statusbar_context_id, "Creating the diary...")
+            self.worker.submit(lambda: self.create_diary(self.db_filepath, self.password), self.on_diary_created, key="file")
 
-            # Setup the encryption
-            encryption_salt = urandom(16)
-            password_verification_salt = urandom(16)
-            password_verification_hash = self.scrypt_hasher.hash_password(self.password, password_verification_salt)
-            self.aes_key = self.scrypt_hasher.hash_password(self.password, encryption_salt) # Use a scrypt hash as the encryption key for AES-256
-            self.aes_cipher = crypto_utils.AESCipher(self.aes_key) # Load the key
 
-            # Save the encryption settings to the database
-            db.update_setting("encryption_salt", encryption_salt)
-            db.update_setting("password_verification_salt", password_verification_salt)
-            db.update_setting("password_verification_hash", password_verification_hash)
+    # Reset the database and setup the encryption of a new diary (in the worker thread)
+    def create_diary(self, db_filepath, password):
+        from lifelog import db_handler
+        from lifelog import key_manager
 
-            # Close the database
-            db.close()
+        db = db_handler.DbHandler(db_filepath)
+        db.reset_database()
 
-            self.is_file_opened = True
-            self.entry_textbuffer.set_modified(False)
+        # Derive the password verification key and the AES-256 key with a single KDF pass, and save the KDF settings
+        aes_key = key_manager.create_keys(db, password)
+        db.commit()
+        return db, aes_key
 
-            # Set the selected calendar date to today
-            self.current_date = str(date.today()).split("-")
-            self.calendar.select_day(int(self.current_date[2]))
-            self.calendar.select_month(int(self.current_date[1])-1, int(self.current_date[0]))
 
-            # Update the statusbar to the greet message
-            statusbar_date_message = f"Welcome! The current date is : {self.user_formatted_date}"
-            self.change_statusbar_message(self.info_statusbar_context_id, statusbar_date_message)
+    def on_diary_created(self, result):
+        from lifelog import crypto_utils
+        from lifelog import entry_store
 
-        elif filechooser_response == Gtk.ResponseType.CANCEL:
-            pass
-        
-        # Close the filechooser dialog
-        filechooser_win.destroy()
+        # Load the key and enable saving entries
+        self.db, self.aes_key = result
+        self.aes_cipher = crypto_utils.AESCipher(self.aes_key)
+        self.entry_store = entry_store.EntryStore(self.db, self.aes_cipher)
+        self.is_file_opened = True
+        self.entry_textbuffer.set_modified(False)
+
+        # Set the selected calendar date to today
+        self.current_date = str(date.today()).split("-")
+        self.calendar.select_day(int(self.current_date[2]))
+        self.calendar.select_month(int(self.current_date[1])-1, int(self.current_date[0]))
+
+        # Update the statusbar to the greet message
+        statusbar_date_message = f"Welcome! The current date is : {self.user_formatted_date}"
+        self.change_statusbar_message(self.info_statusbar_context_id, statusbar_date_message)
 
 
     def on_open_file_button_clicked(self, widget):
@@ -365,41 +449,43 @@ class LifelogApp:
             if unsaved_changes_dialog_response == False:
                 return
             
-        # Temporary builder to fix the filechooser dialog being empty after closing and reopening
-        temp_builder = Gtk.Builder()
-        temp_builder.add_from_file(config.GLADE_FILEPATH)
-        temp_builder.connect_signals(self.handlers)
-
-        # Load the filechooser dialog and button, and the password verify dialog with its entry and label
-        filechooser_win = temp_builder.get_object("filechooser_win")
-        ok_button_filechooser_win = temp_builder.get_object("ok_button_filechooser_win")
-        password_verify_dialog = temp_builder.get_object("password_verify_dialog")
-        self.password_verify_entry = temp_builder.get_object("password_verify_entry")
-        self.message_label_password_verify_dialog = temp_builder.get_object("message_label_password_verify_dialog")
-
-        # Modify to an open filechooser dialog
-        ok_button_filechooser_win.set_label(Gtk.STOCK_OPEN)
-        filechooser_win.set_title("Open File")
-        filechooser_win.set_action(Gtk.FileChooserAction.OPEN)
-
         # Get the selected file or cancel the operation
-        filechooser_response = filechooser_win.run()
-        if filechooser_response == Gtk.ResponseType.OK:
-            # Temporarily store the database file path and close the filechooser dialog
-            self.temp_db_filepath = filechooser_win.get_filename()
-            filechooser_win.destroy()
+        db_filepath = self.choose_file("Open File", Gtk.FileChooserAction.OPEN, Gtk.STOCK_OPEN)
+        if db_filepath is not None:
+            # Temporarily store the database file path
+            self.temp_db_filepath = db_filepath
+
+            # Load the password verify dialog with its entry and label, reset if it has been used before
+            password_verify_dialog = self.dialogs.get_dialog("password_verify_dialog")
+            self.password_verify_entry = self.dialogs.get_object("password_verify_dialog", "password_verify_entry")
+            self.message_label_password_verify_dialog = self.dialogs.get_object("password_verify_dialog", "message_label_password_verify_dialog")
+            self.password_verify_entry.set_text("")
+            self.message_label_password_verify_dialog.set_text("Waiting for password...")
 
             # Run the dialog to verify the password
+            self.is_password_verified = False
             password_verify_dialog_response = password_verify_dialog.run()
-            
+            password_verify_dialog.hide()
+
             # Stop the process if the user cancels the password dialog, proceed otherwise
-            if password_verify_dialog_response == Gtk.ResponseType.CANCEL:
-                password_verify_dialog.destroy()
+            if password_verify_dialog_response != Gtk.ResponseType.OK:
+                # Ignore a verification still running and close the database after it
+                self.worker.discard("password_verification")
+                self.worker.submit(self.close_temp_database)
                 return
-            password_verify_dialog.destroy()
 
-            # Set the database filepath
+            # Switch to the database of the opened file (the modules have been loaded by the password verification)
+            from lifelog import entry_store
+            from lifelog import key_manager
+            self.close_database()
             self.db_filepath = self.temp_db_filepath
+            self.db = self.temp_db
+            self.temp_db = None
+            self.entry_store = entry_store.EntryStore(self.db, self.aes_cipher)
+
+            # Upgrade the key derivation of older diaries in the background (the entries aren't re-encrypted)
+            self.worker.submit(lambda db=self.db, password=self.password, aes_key=self.aes_key: key_manager.rehash(db, password, aes_key),
+                               self.on_diary_rehashed)
 
             # Set the selected calendar date to today
             self.entry_textbuffer.set_modified(False)
@@ -412,12 +498,18 @@ class LifelogApp:
             statusbar_date_message = f"Welcome! The current date is : {self.user_formatted_date}"
             self.change_statusbar_message(self.info_statusbar_context_id, statusbar_date_message)
 
-        elif filechooser_response == Gtk.ResponseType.CANCEL:
-            pass
-        
-        # Close the filechooser dialog
-        filechooser_win.destroy()
-        
+
+    def on_diary_rehashed(self, is_rehashed):
+        if is_rehashed:
+            self.change_statusbar_message(self.info_statusbar_context_id, "The password protection of this diary has been upgraded!")
+
+
+    # Close the database of a file which hasn't been opened (in the worker thread)
+    def close_temp_database(self):
+        if self.temp_db:
+            self.temp_db.close()
+            self.temp_db = None
+
 
     def on_search_button_clicked(self, widget):
         # Unable to search if no file is opened
@@ -425,29 +517,30 @@ class LifelogApp:
             self.change_statusbar_message(self.info_statusbar_context_id, "No file is opened!")
             return
         
-        # Temporary builder to fix the search dialog being empty after closing and reopening
-        temp_builder = Gtk.Builder()
-        temp_builder.add_from_file(config.GLADE_FILEPATH)
-        temp_builder.connect_signals(self.handlers)
-        
         # Load the search dialog and the used widgets for them to be able to be accessed by on_search_button_search_win_clicked
-        search_dialog = temp_builder.get_object("search_dialog")
-        self.from_month_combobox = temp_builder.get_object("from_month_combobox")
-        self.from_day_combobox = temp_builder.get_object("from_day_combobox")
-        self.from_year_entry = temp_builder.get_object("from_year_entry")
-        self.to_month_combobox = temp_builder.get_object("to_month_combobox")
-        self.to_day_combobox = temp_builder.get_object("to_day_combobox")
-        self.to_year_entry = temp_builder.get_object("to_year_entry")
-        self.search_criteria_combobox = temp_builder.get_object("search_criteria_combobox")
-        self.search_entry = temp_builder.get_object("search_entry")
-        self.search_treeview = temp_builder.get_object("search_treeview")
-        self.search_liststore = temp_builder.get_object("search_liststore")
-        self.search_message_label = temp_builder.get_object("search_message_label")
-        self.jump_to_button = temp_builder.get_object("jump_to_button")
+        search_dialog = self.dialogs.get_dialog("search_dialog")
+        search_builder = self.dialogs.get_builder("search_dialog")
+        self.from_month_combobox = search_builder.get_object("from_month_combobox")
+        self.from_day_combobox = search_builder.get_object("from_day_combobox")
+        self.from_year_entry = search_builder.get_object("from_year_entry")
+        self.to_month_combobox = search_builder.get_object("to_month_combobox")
+        self.to_day_combobox = search_builder.get_object("to_day_combobox")
+        self.to_year_entry = search_builder.get_object("to_year_entry")
+        self.search_criteria_combobox = search_builder.get_object("search_criteria_combobox")
+        self.search_entry = search_builder.get_object("search_entry")
+        self.search_treeview = search_builder.get_object("search_treeview")
+        self.search_liststore = search_builder.get_object("search_liststore")
+        self.search_message_label = search_builder.get_object("search_message_label")
+        self.jump_to_button = search_builder.get_object("jump_to_button")
 
         # Resize the search dialog to have the same size as the main window
         main_win_size = self.main_win.get_size()
-        search_dialog.set_default_size(main_win_size[0], main_win_size[1])
+        search_dialog.resize(main_win_size[0], main_win_size[1])
+
+        # Remove the previous search
+        self.search_entry.set_text("")
+        self.search_liststore.clear()
+        self.search_message_label.set_text("Awaiting user input...")
 
         # Set the to date to today
         self.from_year_entry.set_text(self.current_date[0])
@@ -463,6 +556,8 @@ class LifelogApp:
 
         # Run the dialog
         response = search_dialog.run()
+        search_dialog.hide()
+        self.cancel_search()
         if response == Gtk.ResponseType.OK:
             # Get the selected entry's date (ISO 8601 format), then separate the date into year, month, and day
             selection = self.search_treeview.get_selection()
@@ -473,7 +568,6 @@ class LifelogApp:
             if self.check_for_unsaved_changes():
                 unsaved_changes_dialog_response = self.open_unsaved_changes_dialog()
                 if unsaved_changes_dialog_response == False:
-                    search_dialog.destroy()
                     return
             
             # Set the calendar to the selected entry's date
@@ -482,11 +576,6 @@ class LifelogApp:
             self.on_calendar_day_selected(self.calendar)
             self.on_calendar_month_changed(self.calendar)
 
-            search_dialog.destroy()
-
-        else: # Cancel button clicked
-            search_dialog.destroy()
-
 
     def on_search_treeview_row_activated(self, *_):
         # Make the jump to button visible when an entry is selected
@@ -517,50 +606,74 @@ class LifelogApp:
             return
 
         # Get the search criteria
-        criteria_index_entry = {"Title": 1, # Title is the first column
-                                "Tags": 2,  # Tags are the second column 
-                                "Mood": 3}  # Mood is the third column
-        search_criteria = criteria_index_entry[self.search_criteria_combobox.get_active_text()]
+        criteria_entry_field = {"Title": "title",
+                                "Tags": "tags",
+                                "Mood": "mood"}
+        search_criteria = criteria_entry_field[self.search_criteria_combobox.get_active_text()]
         search_content = self.search_entry.get_text()
 
-        # Remove the previous search results
+        # Stop the previous search and remove its results
+        self.cancel_search()
         self.jump_to_button.set_visible(False)
         self.search_liststore.clear()
 
-        # Search from the db
+        # Search from the db in the background, the results being added batch by batch as they are found
         self.search_message_label.set_text("Searching...")
-        db = db_handler.DbHandler(self.db_filepath)
-        entries_found = db.get_all_entries_between(from_date, to_date)
-        db.close()
-
-        # Filter the entries based on the search criteria
-        filtered_entries = []
-        for entry in entries_found:
-            entry_data = list(entry[1:5]) # Ignore the entry id (from the database) and the entry content
-
-            # Decrypt the entry data for each column except the date column (the first one) as it isn't encrypted
-            for column_i in range(1, len(entry_data)):
-                entry_data[column_i] = self.aes_cipher.decrypt(entry_data[column_i]).decode("utf-8")
-            
-            # Check if the entry data contains the search content
-            if search_content in entry_data[search_criteria]:
-                # Display a more user-friendly date (the original is kept for jumping to the entry)
-                user_formatted_date = datetime.fromisoformat(entry_data[0]).strftime("%b %d, %Y")
-                entry_data.insert(1, user_formatted_date)
+        self.search_cancellation_token = search.CancellationToken()
+        self.search_found_count = 0
+        self.worker.submit(lambda store=self.entry_store, cancellation_token=self.search_cancellation_token:
+                               self.run_search(store, from_date, to_date, search_criteria, search_content, cancellation_token),
+                           self.on_search_done, key="search")
 
-                # Add the entry to the filtered list
-                filtered_entries.append(entry_data)
+
+    # Search the entries and send each batch of results to the main loop (in the worker thread)
+    def run_search(self, store, from_date, to_date, search_criteria, search_content, cancellation_token):
+        progress_callback = lambda scanned_entries, total_entries: GLib.idle_add(self.on_search_progress, scanned_entries, total_entries, cancellation_token)
+        for found_entries in search.iter_search_results(store, from_date, to_date, search_criteria, search_content,
+                                                        config.SEARCH_BATCH_SIZE, cancellation_token, progress_callback):
+            GLib.idle_add(self.add_search_results, found_entries, cancellation_token)
+        return cancellation_token
+
+
+    # Add a batch of search results to the search dialog
+    def add_search_results(self, found_entries, cancellation_token):
+        if cancellation_token.is_cancelled():
+            return False
 
         # Add the elements to the Gtk.Liststore and therefore to the Gtk.TreeView
-        for filtered_entry in filtered_entries:
-            self.search_liststore.append(filtered_entry)
+        for entry_date, entry_summary in found_entries:
+            # Display a more user-friendly date (the original is kept for jumping to the entry)
+            user_formatted_date = datetime.fromisoformat(entry_date).strftime("%b %d, %Y")
+            self.search_liststore.append([entry_date, user_formatted_date, entry_summary.title, entry_summary.tags, str(entry_summary.mood)])
+        self.search_found_count += len(found_entries)
+        return False
+
+
+    # Show the progress of the running search
+    def on_search_progress(self, scanned_entries, total_entries, cancellation_token):
+        if not cancellation_token.is_cancelled():
+            self.search_message_label.set_text(f"Searching... {scanned_entries}/{total_entries} entries scanned, {self.search_found_count} found.")
+        return False
+
+
+    def on_search_done(self, cancellation_token):
+        if cancellation_token.is_cancelled():
+            return
 
         # Update the search message to the adequate quantity
         result_message = "Search done! "
-        if len(filtered_entries) == 0: result_message += "No matching entry found."
-        elif len(filtered_entries) == 1: result_message += "1 matching entry found."
-        else: result_message += f"{len(filtered_entries)} matching entries found."
+        if self.search_found_count == 0: result_message += "No matching entry found."
+        elif self.search_found_count == 1: result_message += "1 matching entry found."
+        else: result_message += f"{self.search_found_count} matching entries found."
         self.search_message_label.set_text(result_message)
+        self.search_cancellation_token = None
+
+
+    # Stop the running search, if any
+    def cancel_search(self):
+        if self.search_cancellation_token:
+            self.search_cancellation_token.cancel()
+            self.search_cancellation_token = None
 
 
     def on_today_button_clicked(self, widget):
@@ -570,11 +683,45 @@ class LifelogApp:
         self.on_calendar_month_changed(self.calendar)
 
     def on_about_button_clicked(self, widget):
-        temp_builder = Gtk.Builder()
-        temp_builder.add_from_file(config.GLADE_FILEPATH)
-        about_dialog = temp_builder.get_object("about_dialog")
+        about_dialog = self.dialogs.get_dialog("about_dialog")
         about_dialog.run()
-        about_dialog.destroy()
+        about_dialog.hide()
+
+
+    def on_main_win_key_press_event(self, widget, event):
+        modifiers = event.state & Gtk.accelerator_get_default_mod_mask()
+        if modifiers == Gdk.ModifierType.CONTROL_MASK | Gdk.ModifierType.SHIFT_MASK and Gdk.keyval_to_lower(event.keyval) == Gdk.KEY_d:
+            self.open_performance_dialog()
+            return True
+        return False
+
+
+    # Show the time taken by the instrumented functions, and save it as JSON or as a trace
+    def open_performance_dialog(self):
+        performance_dialog = self.dialogs.get_dialog("performance_dialog")
+        performance_liststore = self.dialogs.get_object("performance_dialog", "performance_liststore")
+
+        while True:
+            performance_liststore.clear()
+            for name, stat in instrumentation.get_stats().items():
+                performance_liststore.append([name, str(stat["calls"]), f"{stat['total_ms']:.2f}", f"{stat['mean_ms']:.3f}", f"{stat['max_ms']:.2f}"])
+
+            response = performance_dialog.run()
+            if response == PERFORMANCE_DIALOG_RESET:
+                instrumentation.reset()
+            elif response in (PERFORMANCE_DIALOG_SAVE_STATS, PERFORMANCE_DIALOG_SAVE_TRACE):
+                is_trace = response == PERFORMANCE_DIALOG_SAVE_TRACE
+                filepath = self.choose_file("Save trace" if is_trace else "Save statistics", Gtk.FileChooserAction.SAVE, Gtk.STOCK_SAVE_AS,
+                                            "lifelog-trace.json" if is_trace else "lifelog-stats.json")
+                if filepath is not None:
+                    try:
+                        (instrumentation.save_trace if is_trace else instrumentation.save_stats)(filepath)
+                        self.change_statusbar_message(self.info_statusbar_context_id, f"Saved {filepath}")
+                    except OSError as exception:
+                        self.change_statusbar_message(self.error_statusbar_context_id, f"Unable to save {filepath} : {exception}")
+            elif response != PERFORMANCE_DIALOG_REFRESH:
+                break
+        performance_dialog.hide()
 
 
     def on_calendar_day_selected(self, widget):
@@ -598,9 +745,9 @@ class LifelogApp:
                 self.tags_entry.set_text(self.unsaved_entry_tags)
                 self.mood_adjustment.set_value(self.unsaved_entry_mood)
                 
-                self.entry_textbuffer.set_text("")               # Clear the buffer
-                entry_end = self.entry_textbuffer.get_end_iter() # Get the position of the end of the buffer to insert back the content
-                self.entry_textbuffer.deserialize(self.entry_textbuffer, self.entry_textbuffer_tags, entry_end, self.unsaved_entry_content) # Reinsert the content
+                self.delete_image_insertion_marks() # They would all be at the beginning of the new content
+                self.entry_textbuffer.set_text("") # Clear the buffer
+                self.deserialize_entry_textbuffer(self.unsaved_entry_content) # Reinsert the content
 
                 self.entry_textbuffer.set_modified(True)
 
@@ -614,37 +761,155 @@ class LifelogApp:
         date_obj = datetime.strptime(self.db_formatted_date, "%Y-%m-%d")
         self.user_formatted_date = date_obj.strftime("%b %d, %Y")
 
-        # Get the entry with the corresponding date from the database
-        db = db_handler.DbHandler(self.db_filepath)
-        entry = db.get_entry_from_date(self.db_formatted_date)
-        db.close()
+        # Without an opened file, display the default values
+        if self.entry_store is None:
+            self.display_entry(EMPTY_ENTRY)
+            return True
 
-        # If entry doesn't exist, use default values
-        if not entry:
-            entry = ["", "", "", "", "", ""]
+        # Get the decrypted entry with the corresponding date in the background (only the last selected one is displayed)
+        self.change_statusbar_message(self.info_statusbar_context_id, f"Loading entry for date : {self.user_formatted_date}")
+        # Large images are first displayed as previews
+        self.worker.submit(lambda store=self.entry_store, entry_date=self.db_formatted_date: load_entry_preview_copy(store, entry_date),
+                           self.display_entry_preview, self.on_entry_load_failed, key="entry")
+        return True
+
+
+    # Display the beginning of an entry (its first chunk, with the previews of its images), then its next chunks and the complete images
+    def display_entry_preview(self, entry_preview):
+        self.display_entry(entry_preview.entry, entry_preview.has_previews, entry_preview.chunks_count, self.on_entry_preview_displayed)
+        if entry_preview.chunks_count:
+            self.read_entry_chunk(self.db_formatted_date, entry_preview.content_id, 1, entry_preview.chunks_count)
+
+
+    # Read a chunk of the displayed entry in the background, then the next ones (each is added to the text buffer when the app is idle)
+    def read_entry_chunk(self, entry_date, content_id, chunk_index, chunks_count):
+        self.worker.submit(lambda store=self.entry_store: store.load_entry_chunk(entry_date, content_id, chunk_index),
+                           lambda chunk_and_has_previews, entry_display_id=self.entry_display_id:
+                               self.on_entry_chunk_read(chunk_and_has_previews, entry_display_id, entry_date, content_id, chunk_index, chunks_count),
+                           self.on_entry_load_failed, key="entry")
 
-        # Used to verify the presence of unsaved changes
-        encrypted_entry_title = entry[2]
-        encrypted_entry_tags = entry[3]
-        encrypted_entry_mood = entry[4]
-        encrypted_entry_content = entry[5]
 
-        # Decrypt the entry data (and use the default values for empty values)
-        self.saved_entry_title = self.aes_cipher.decrypt(encrypted_entry_title).decode("utf-8")
-        self.saved_entry_tags = self.aes_cipher.decrypt(encrypted_entry_tags).decode("utf-8")
-        self.saved_entry_mood = int(self.aes_cipher.decrypt(encrypted_entry_mood).decode("utf-8") or "50")
-        saved_entry_content = self.aes_cipher.decrypt(encrypted_entry_content)
+    def on_entry_chunk_read(self, chunk_and_has_previews, entry_display_id, entry_date, content_id, chunk_index, chunks_count):
+        if entry_display_id != self.entry_display_id:
+            return
+        if chunk_index < chunks_count:
+            self.read_entry_chunk(entry_date, content_id, chunk_index + 1, chunks_count)
+        chunk, has_previews = chunk_and_has_previews
+        self.has_entry_previews = self.has_entry_previews or has_previews
+        self.entry_chunks_to_read -= 1
+        self.add_entry_chunks([chunk])
+
+
+    # Called once the beginning of an entry and all its chunks are displayed : load the complete images if there are previews
+    def on_entry_preview_displayed(self):
+        if self.has_entry_previews:
+            self.worker.submit(lambda store=self.entry_store, entry_date=self.db_formatted_date: load_entry_copy(store, entry_date),
+                               self.display_complete_entry, self.on_entry_load_failed, key="entry")
+        else:
+            self.prefetch_around_selected_date()
+
+
+    # Replace the previews by the complete images, unless the entry has been edited meanwhile or an image is being added to it
+    # (saving it keeps the complete images anyway)
+    def display_complete_entry(self, entry):
+        self.prefetch_around_selected_date()
+        if (self.entry_textbuffer.get_modified() or self.image_insertion_marks
+                or self.title_entry.get_text() != self.saved_entry_title or self.tags_entry.get_text() != self.saved_entry_tags):
+            return
+
+        # Keep the scroll position, restored once all the chunks are displayed again
+        vadjustment = self.entry_textview.get_vadjustment()
+        scroll_position = vadjustment.get_value()
+        self.display_entry(entry, on_displayed=lambda: GLib.idle_add(vadjustment.set_value, scroll_position))
+
+
+    # Serialize the text, tags and images of the entry text buffer, in chunks of consecutive parts of the text (see content_chunks)
+    def serialize_entry_textbuffer(self):
+        entry_start, entry_end = self.entry_textbuffer.get_bounds()
+        entry_text = self.entry_textbuffer.get_slice(entry_start, entry_end, True) # Images being IMAGE_CHARACTER
+        chunk_offsets = content_chunks.get_chunk_offsets(entry_text, config.ENTRY_CHUNK_CHARS, config.ENTRY_CHUNK_IMAGES) + [len(entry_text)]
+        return b"".join(self.entry_textbuffer.serialize(self.entry_textbuffer, self.entry_textbuffer_tags,
+                                                        self.entry_textbuffer.get_iter_at_offset(chunk_start), self.entry_textbuffer.get_iter_at_offset(chunk_end))
+                        for chunk_start, chunk_end in zip(chunk_offsets, chunk_offsets[1:]))
+
+
+    # Insert serialized content (one or more chunks) at the end of the entry text buffer
+    def deserialize_entry_textbuffer(self, entry_content):
+        for chunk in content_chunks.split_chunks(entry_content):
+            entry_end = self.entry_textbuffer.get_end_iter()
+            self.entry_textbuffer.deserialize(self.entry_textbuffer, self.entry_textbuffer_tags, entry_end, chunk)
+
+
+    # Add chunks at the end of the displayed entry, one at a time when the app is idle (the app stays responsive meanwhile)
+    def add_entry_chunks(self, chunks):
+        self.pending_entry_chunks.extend(chunks)
+        if self.entry_chunks_idle_id is None:
+            self.entry_chunks_idle_id = GLib.idle_add(self.add_next_entry_chunk)
+
+
+    def add_next_entry_chunk(self):
+        # Adding a chunk isn't an edit of the user
+        if self.pending_entry_chunks:
+            is_modified = self.entry_textbuffer.get_modified()
+            self.deserialize_entry_textbuffer(self.pending_entry_chunks.popleft())
+            self.entry_textbuffer.set_modified(is_modified)
+            if self.pending_entry_chunks:
+                return True
+
+        self.entry_chunks_idle_id = None
+        self.check_entry_displayed()
+        return False
+
+
+    # Check if the displayed entry has no chunk left to add, calling on_entry_displayed once it is the case
+    def check_entry_displayed(self):
+        if self.is_entry_displayed() and self.on_entry_displayed is not None:
+            on_entry_displayed, self.on_entry_displayed = self.on_entry_displayed, None
+            on_entry_displayed()
+
+
+    # Check if the whole content of the displayed entry is in the text buffer
+    def is_entry_displayed(self):
+        return not self.pending_entry_chunks and self.entry_chunks_to_read == 0
+
+
+    # Display a decrypted entry in the main window
+    # Only the first chunk of its content is added at once, the next ones being added when the app is idle (followed by the
+    # chunks_to_read ones still being read from the database), then on_displayed is called
+    def display_entry(self, entry, has_previews=False, chunks_to_read=0, on_displayed=None):
+        # Used to verify the presence of unsaved changes
+        self.saved_entry_title = entry.title
+        self.saved_entry_tags = entry.tags
+        self.saved_entry_mood = entry.mood
+        saved_entry_content = entry.content
 
         # Display the entry info (not entry content)
         self.title_entry.set_text(self.saved_entry_title)
         self.tags_entry.set_text(self.saved_entry_tags)
         self.mood_adjustment.set_value(int(self.saved_entry_mood))
-        
+
+        # A displayed entry has been loaded (or is empty), it can be edited
+        self.damaged_entry_date = None
+        self.set_entry_editable(True)
+
+        # Drop the chunks of the previously displayed entry and its images being loaded
+        self.entry_display_id += 1
+        self.delete_image_insertion_marks()
+        self.pending_entry_chunks.clear()
+        self.entry_chunks_to_read = chunks_to_read
+        if self.entry_chunks_idle_id is not None:
+            GLib.source_remove(self.entry_chunks_idle_id)
+            self.entry_chunks_idle_id = None
+        self.has_entry_previews = has_previews
+        self.on_entry_displayed = on_displayed
+
         # Display the entry content
         self.entry_textbuffer.set_text("") # Clear the buffer
         if saved_entry_content: # If there is content
-            entry_end = self.entry_textbuffer.get_end_iter() # Get the position of the end of the buffer to insert the new content
-            self.entry_textbuffer.deserialize(self.entry_textbuffer, self.entry_textbuffer_tags, entry_end, saved_entry_content) # Insert the content
+            first_chunk, *next_chunks = content_chunks.split_chunks(saved_entry_content)
+            self.deserialize_entry_textbuffer(first_chunk) # Insert the content
+            if next_chunks:
+                self.add_entry_chunks(next_chunks)
         self.entry_textbuffer.set_modified(False)
 
         # Change the window title and statusbar message
@@ -655,28 +920,69 @@ class LifelogApp:
             self.main_win.set_title(f"Lifelog - {self.user_formatted_date}")
             self.change_statusbar_message(self.info_statusbar_context_id, f"No existing entry found for date : {self.user_formatted_date}")
 
-        return True
+        self.check_entry_displayed()
+
+
+    # Allow or prevent editing and saving the displayed entry
+    def set_entry_editable(self, is_editable):
+        for widget in (self.entry_textview, self.title_entry, self.tags_entry, self.mood_scale, self.add_image_button, self.apply_entry_changes_button):
+            widget.set_sensitive(is_editable)
+
+
+    # Read ahead the entries of the days around the selected one and the marks of the months around the displayed one,
+    # only when the worker has nothing else to do, so that browsing the calendar doesn't wait for the database
+    def prefetch_around_selected_date(self):
+        self.worker.clear_idle_jobs()
+        if self.entry_store is None:
+            return
+
+        # Closest days first, alternating between the next and the previous ones
+        selected_date = datetime.strptime(self.db_formatted_date, "%Y-%m-%d").date()
+        for distance in range(1, config.PREFETCH_DAYS+1):
+            for prefetched_date in (selected_date + timedelta(days=distance), selected_date - timedelta(days=distance)):
+                self.worker.submit_idle(lambda store=self.entry_store, entry_date=prefetched_date.isoformat(): store.prefetch_entry(entry_date))
+
+        displayed_month_index = self.calendar.get_property("year") * 12 + self.calendar.get_property("month")
+        for distance in range(1, config.PREFETCH_MONTHS+1):
+            for month_index in (displayed_month_index + distance, displayed_month_index - distance):
+                self.worker.submit_idle(lambda store=self.entry_store, year=month_index // 12, month=month_index % 12 + 1: store.get_month_mask(year, month))
+
+
+    # Called if the entry couldn't be decrypted (modified or damaged record)
+    # Nothing is displayed and the date is blocked, so that saving can't replace the damaged entry (or the part of it already displayed)
+    def on_entry_load_failed(self, exception):
+        self.display_entry(EMPTY_ENTRY)
+        self.damaged_entry_date = self.db_formatted_date
+        self.set_entry_editable(False)
+        self.main_win.set_title(f"Lifelog - {self.user_formatted_date}")
+        self.change_statusbar_message(self.error_statusbar_context_id, f"The entry for {self.user_formatted_date} is damaged and couldn't be decrypted: {exception}")
 
     # Mark the days of the existing entries
     def on_calendar_month_changed(self, widget):
-        # Unmark all days
-        for day in range(1, 32):
-            if self.calendar.get_day_is_marked(day):
-                self.calendar.unmark_day(day)
-
         # Get the month and year from the calendar
         month = str(self.calendar.get_property("month")+1).zfill(2)
         year = str(self.calendar.get_property("year"))
 
-        # Get the existing entry dates for the selected month and year
-        db = db_handler.DbHandler(self.db_filepath)
-        existing_entry_dates = db.get_existing_entry_dates_for_month_year(month, year)
-        db.close()
+        # Without an opened file, no day is marked
+        if self.entry_store is None:
+            self.mark_entry_days(0)
+            return
+
+        # Get the days having an entry in the displayed month in the background (only the last displayed month is marked)
+        self.worker.submit(lambda store=self.entry_store: store.get_month_mask(int(year), int(month)), self.mark_entry_days, key="month")
 
-        # Mark the days of the existing entries
-        for existing_entry_date in existing_entry_dates:
-            day = int(existing_entry_date[0].split("-")[2])
-            self.calendar.mark_day(day)
+
+    # Mark the days of the existing entries in the calendar, given as a mask (bit 0 being the first day)
+    def mark_entry_days(self, month_mask):
+        # Only change the days whose mark differs
+        changed_days_mask = month_mask ^ self.marked_days_mask
+        for day in range(1, 32):
+            if changed_days_mask & (1 << (day - 1)):
+                if month_mask & (1 << (day - 1)):
+                    self.calendar.mark_day(day)
+                else:
+                    self.calendar.unmark_day(day)
+        self.marked_days_mask = month_mask
 
 
     # Change the statusbar message
@@ -691,30 +997,32 @@ class LifelogApp:
             self.change_statusbar_message(self.info_statusbar_context_id, "No file is opened!")
             return
 
+        # The displayed entry isn't the one of the selected date yet, or isn't complete
+        if self.worker.is_pending("entry") or not self.is_entry_displayed():
+            self.change_statusbar_message(self.info_statusbar_context_id, "The entry is still loading!")
+            return
+
+        # The damaged entry of this date couldn't be loaded, saving would replace it with what is displayed
+        if self.damaged_entry_date == self.db_formatted_date:
+            self.change_statusbar_message(self.error_statusbar_context_id, f"The entry for {self.user_formatted_date} is damaged and can't be saved over!")
+            return
+
         # Get the entry data from the widgets (not entry content)
-        encoded_entry_title = self.title_entry.get_text().encode("utf-8")
-        encoded_entry_tags = self.tags_entry.get_text().encode("utf-8")
-        encoded_entry_mood = str(int((self.mood_adjustment.get_value()))).encode("utf-8")
+        entry_title = self.title_entry.get_text()
+        entry_tags = self.tags_entry.get_text()
+        entry_mood = int(self.mood_adjustment.get_value())
 
         # Serialize the textbuffer
-        entry_start, entry_end = self.entry_textbuffer.get_bounds()
-        entry_content = self.entry_textbuffer.serialize(self.entry_textbuffer, self.entry_textbuffer_tags, entry_start, entry_end)
+        entry_content = self.serialize_entry_textbuffer()
  
-        # Encrypt the entry data
-        encrypted_entry_title = self.aes_cipher.encrypt(encoded_entry_title)
-        encrypted_entry_tags = self.aes_cipher.encrypt(encoded_entry_tags)
-        encrypted_entry_mood = self.aes_cipher.encrypt(encoded_entry_mood)
-        encrypted_entry_content = self.aes_cipher.encrypt(entry_content)
-
-        # Update or add the entry in the database
-        db = db_handler.DbHandler(self.db_filepath)
-        db.update_entry(self.db_formatted_date, encrypted_entry_title, encrypted_entry_tags, encrypted_entry_mood, encrypted_entry_content)
-        db.close()
+        # Encrypt and update or add the entry in the database in the background (its cached version is invalidated)
+        self.worker.submit(lambda store=self.entry_store, entry_date=self.db_formatted_date: store.save_entry(entry_date, entry_title, entry_tags, entry_mood, entry_content),
+                           lambda _, entry_date=self.db_formatted_date: self.on_entry_saved(entry_date), self.on_entry_save_failed)
 
         # Set the entry data as saved
-        self.saved_entry_title = encoded_entry_title.decode("utf-8")
-        self.saved_entry_tags = encoded_entry_tags.decode("utf-8")
-        self.saved_entry_mood = int(encoded_entry_mood.decode("utf-8"))
+        self.saved_entry_title = entry_title
+        self.saved_entry_tags = entry_tags
+        self.saved_entry_mood = entry_mood
         self.entry_textbuffer.set_modified(False)
 
         # Update the title of the main window with the date and entry title if there is one
@@ -723,13 +1031,23 @@ class LifelogApp:
         else:
             self.main_win.set_title(f"Lifelog - {self.user_formatted_date}")
 
-        # Mark the entry day in the calendar
-        self.on_calendar_month_changed(self.calendar)
 
-        # Change the statusbar message and mark the buffer as not modified
+    def on_entry_saved(self, entry_date):
+        # Mark the entry day in the calendar if its month is still displayed
+        year, month, day = (int(date_part) for date_part in entry_date.split("-"))
+        if (year, month) == (self.calendar.get_property("year"), self.calendar.get_property("month")+1) and not self.worker.is_pending("month"):
+            self.mark_entry_days(self.marked_days_mask | 1 << (day - 1))
+
+        # Change the statusbar message
         self.change_statusbar_message(self.info_statusbar_context_id, "Entry saved successfully!")
 
 
+    def on_entry_save_failed(self, exception):
+        # Keep the entry marked as unsaved
+        self.entry_textbuffer.set_modified(True)
+        self.change_statusbar_message(self.error_statusbar_context_id, "An error occurred: " + str(exception))
+
+
     def on_bold_button_clicked(self, widget):
         try:
             selection_start, selection_end = self.entry_textbuffer.get_selection_bounds()   # Get selection bounds
@@ -838,48 +1156,108 @@ class LifelogApp:
 
 
     def on_add_image_button_clicked(self, widget):
-        # Temporary builder to fix the filechooser dialog being empty after closing and reopening
-        temp_builder = Gtk.Builder()
-        temp_builder.add_from_file(config.GLADE_FILEPATH)
-        temp_builder.connect_signals(self.handlers)
-
-        # Load the filechooser dialog and button
-        filechooser_win = temp_builder.get_object("filechooser_win")
-        ok_button_filechooser_win = temp_builder.get_object("ok_button_filechooser_win")
-
-        # Configure the dialog as an open dialog
-        filechooser_win.set_title("Open Image")
-        filechooser_win.set_action(Gtk.FileChooserAction.OPEN)
-        ok_button_filechooser_win.set_label(Gtk.STOCK_OPEN)
-        
-        # Run the dialog
-        filechooser_response = filechooser_win.run()
-        if filechooser_response == Gtk.ResponseType.OK:
-            # Get the selected file or cancel the operation
-            image_filepath = filechooser_win.get_filename()
-
-            # Load the selected image
-            try:
-                image_pixbuf = GdkPixbuf.Pixbuf.new_from_file(image_filepath)
-            except Exception as e:
-                self.change_statusbar_message(self.error_statusbar_context_id, "An error occurred: " + str(e))
-                return
+        # Get the selected file or cancel the operation
+        image_filepath = self.choose_file("Open Image", Gtk.FileChooserAction.OPEN, Gtk.STOCK_OPEN)
+        if image_filepath is not None:
+            from lifelog import image_ingest
+
+            # Remember where to insert the image, as the text may be edited while it is loaded
+            cursor_iter = self.entry_textbuffer.get_iter_at_mark(self.entry_textbuffer.get_insert())
+            insertion_mark = self.entry_textbuffer.create_mark(None, cursor_iter, True)
+            self.image_insertion_marks.add(insertion_mark)
+
+            # Decode the selected image in the background
+            self.change_statusbar_message(self.info_statusbar_context_id, "Loading image...")
+            self.image_worker.submit(lambda: image_ingest.load_image(image_filepath),
+                                     lambda image_pixbuf, entry_display_id=self.entry_display_id: self.insert_image(image_pixbuf, insertion_mark, entry_display_id),
+                                     lambda exception: self.on_image_load_failed(exception, insertion_mark))
+
+
+    # Insert a loaded image where it was requested, if the same entry is still displayed (not even displayed again, its mark being deleted then)
+    def insert_image(self, image_pixbuf, insertion_mark, entry_display_id):
+        if entry_display_id == self.entry_display_id and not insertion_mark.get_deleted():
+            self.entry_textbuffer.insert_pixbuf(self.entry_textbuffer.get_iter_at_mark(insertion_mark), image_pixbuf)
+            self.change_statusbar_message(self.info_statusbar_context_id, "Image successfully added!")
+        self.delete_image_insertion_mark(insertion_mark)
 
-            # Insert the image at the cursor
-            cursor_mark = self.entry_textbuffer.get_insert()
-            cursor_iter = self.entry_textbuffer.get_iter_at_mark(cursor_mark)
-            self.entry_textbuffer.insert_pixbuf(cursor_iter, image_pixbuf)
 
-            # Close the filechooser window
-            self.change_statusbar_message(self.info_statusbar_context_id, "Image successfully added!")
-            filechooser_win.destroy()
-        else:
-            filechooser_win.destroy()
+    def on_image_load_failed(self, exception, insertion_mark):
+        self.delete_image_insertion_mark(insertion_mark)
+        self.change_statusbar_message(self.error_statusbar_context_id, "An error occurred: " + str(exception))
+
+
+    def delete_image_insertion_mark(self, insertion_mark):
+        self.image_insertion_marks.discard(insertion_mark)
+        if not insertion_mark.get_deleted():
+            self.entry_textbuffer.delete_mark(insertion_mark)
+
+
+    # Cancel the insertion of the images being loaded (they are dropped once loaded)
+    def delete_image_insertion_marks(self):
+        for insertion_mark in list(self.image_insertion_marks):
+            self.delete_image_insertion_mark(insertion_mark)
+
+
+# Get a decrypted entry whose content can't be wiped by the cache while it is displayed
+def load_entry_copy(store, entry_date):
+    entry = store.load_entry(entry_date)
+    return entry._replace(content=bytes(entry.content))
+
+
+# Get the beginning of a decrypted entry with the previews of its images (an EntryPreview), as load_entry_copy
+def load_entry_preview_copy(store, entry_date):
+    entry_preview = store.load_entry_preview(entry_date)
+    return entry_preview._replace(entry=entry_preview.entry._replace(content=bytes(entry_preview.entry.content)))
+
+
+# Wipe the decrypted entries of a diary and close its database
+def close_diary(db, store):
+    if store:
+        store.close()
+    db.close()
+
+
+# Record the end of a startup phase
+def mark_startup_phase(name):
+    startup_phases.append((name, time.perf_counter()))
+
+
+# Print how long each startup phase took, since this module started being imported (the Python startup isn't included)
+def print_startup_report():
+    start_time = startup_phases[0][1]
+    previous_time = start_time
+    print(f"{'Phase':<20} {'Time (ms)':>10} {'Total (ms)':>10}", file=sys.stderr)
+    for name, end_time in startup_phases[1:]:
+        print(f"{name:<20} {(end_time - previous_time) * 1000:>10.1f} {(end_time - start_time) * 1000:>10.1f}", file=sys.stderr)
+        previous_time = end_time
+    deferred_modules = [name for name in ("lifelog.crypto_utils", "lifelog.db_handler", "lifelog.image_ingest") if name not in sys.modules]
+    print(f"{len(sys.modules)} modules loaded, not loaded yet : {', '.join(deferred_modules) or 'none'}", file=sys.stderr)
+
+
+# Called once the main window has been drawn for the first time : report the startup times, then quit
+def on_first_frame_drawn(widget, cairo_context, handler_ids):
+    widget.disconnect(handler_ids[0])
+    mark_startup_phase("first frame")
+    print_startup_report()
+    GLib.idle_add(Gtk.main_quit)
+    return False
 
 
 # For the package
-def run():
+def run(argv=None):
+    parser = argparse.ArgumentParser(prog="lifelog", description="A simple and secure diary app")
+    parser.add_argument("--profile-startup", action="store_true", help="print the time taken by each startup phase once the window is drawn, then quit")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    # The app's own hot paths are timed too : loading the UI, switching days and the text buffer
+    if instrumentation.enable_from_environment():
+        instrumentation.instrument(dialogs, ["build_objects"], "gtk")
+        instrumentation.instrument(LifelogApp, ["on_calendar_day_selected", "on_calendar_month_changed", "display_entry", "mark_entry_days",
+                                                "serialize_entry_textbuffer", "deserialize_entry_textbuffer"], "app")
     app = LifelogApp()
+    if args.profile_startup:
+        handler_ids = []
+        handler_ids.append(app.main_win.connect_after("draw", on_first_frame_drawn, handler_ids))
     app.main()
 
 
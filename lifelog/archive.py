@@ -0,0 +1,153 @@
+#    Lifelog (archive.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Portable encrypted archive of entries, protected by its own password :
+#   header : magic, length of the settings (4 bytes), settings (JSON : KDF parameters and salt, password verification key)
+#   then chunks : length (4 bytes), AES-GCM encrypted batch of entries bound to the index of the chunk,
+#   the last chunk being empty and marked as such (a truncated archive is therefore detected)
+
+import hmac
+import json
+import os
+import struct
+
+from lifelog import compression
+from lifelog import crypto_utils
+from lifelog import key_manager
+from lifelog.entry import Entry
+
+ARCHIVE_MAGIC = b"LIFELOG-ARCHIVE1"
+ARCHIVE_EXTENSION = ".lifelog-archive"
+LENGTH = struct.Struct(">I")
+CHUNK_ASSOCIATED_DATA = struct.Struct(">QB") # Chunk index, last chunk flag
+ENTRY_HEADER = struct.Struct(">10sIIBI") # Date, title length, tags length, mood, content length
+
+# Derive the password verification key and the encryption key of an archive
+def derive_archive_keys(password, settings):
+    return crypto_utils.expand_master_key(crypto_utils.derive_master_key(password, bytes.fromhex(settings["kdf_salt"]), settings["kdf_params"]))
+
+
+class ArchiveWriter:
+    # Create an archive, or reopen an interrupted one at the end of its last complete chunk (given by get_state)
+    def __init__(self, archive_filepath, password, state=None):
+        if state is None:
+            settings = {"kdf_params": key_manager.calibrate_kdf_params(), "kdf_salt": os.urandom(16).hex()}
+            verification_key, self.key = derive_archive_keys(password, settings)
+            settings["password_verification_key"] = verification_key.hex()
+            settings_data = json.dumps(settings).encode("utf-8")
+
+            self.file = open(archive_filepath, "wb")
+            self.file.write(ARCHIVE_MAGIC + LENGTH.pack(len(settings_data)) + settings_data)
+            self.chunk_index = 0
+        else:
+            self.key = read_archive_key(archive_filepath, password)
+            self.file = open(archive_filepath, "r+b")
+            self.file.truncate(state["offset"])
+            self.file.seek(state["offset"])
+            self.chunk_index = state["chunk_index"]
+
+
+    # Add a chunk with entries given as (entry_date, entry) tuples
+    def write_entries(self, dated_entries):
+        entries_data = b"".join(ENTRY_HEADER.pack(entry_date.encode("ascii"), len(entry_title), len(entry_tags), int(entry.mood), len(entry.content))
+                                + entry_title + entry_tags + bytes(entry.content)
+                                for entry_date, entry in dated_entries
+                                for entry_title, entry_tags in [(entry.title.encode("utf-8"), entry.tags.encode("utf-8"))])
+        self.write_chunk(entries_data, is_last=False)
+
+
+    # Compress, encrypt and write a chunk
+    def write_chunk(self, data, is_last):
+        codec, compressed_data = compression.compress(data)
+        encrypted_chunk = crypto_utils.encrypt_gcm(self.key, bytes([codec]) + compressed_data, CHUNK_ASSOCIATED_DATA.pack(self.chunk_index, is_last))
+        self.file.write(LENGTH.pack(len(encrypted_chunk)) + encrypted_chunk)
+        self.chunk_index += 1
+
+
+    # Get what is needed to resume writing after the last chunk
+    def get_state(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"offset": self.file.tell(), "chunk_index": self.chunk_index}
+
+
+    # Number of bytes written
+    def tell(self):
+        return self.file.tell()
+
+
+    # Write the last chunk and close the archive
+    def close(self):
+        self.write_chunk(b"", is_last=True)
+        self.file.close()
+
+
+# Check the password of an archive and return its encryption key (raises ValueError if the password is incorrect)
+def read_archive_key(archive_filepath, password):
+    with open(archive_filepath, "rb") as archive_file:
+        return read_archive_header(archive_file, password)
+
+
+# Read the header of an archive and return its encryption key (raises ValueError if the password is incorrect)
+def read_archive_header(archive_file, password):
+    if archive_file.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+        raise ValueError("Not a Lifelog archive")
+    settings = json.loads(archive_file.read(LENGTH.unpack(archive_file.read(LENGTH.size))[0]))
+    verification_key, key = derive_archive_keys(password, settings)
+    if not hmac.compare_digest(verification_key, bytes.fromhex(settings["password_verification_key"])):
+        raise ValueError("Wrong archive password")
+    return key
+
+
+# Read the entries of an archive one chunk at a time, as (entry_date, entry) tuples
+# Raises ValueError if the password is incorrect or the archive has been modified, truncated or extended
+def read_archive(archive_filepath, password):
+    with open(archive_filepath, "rb") as archive_file:
+        key = read_archive_header(archive_file, password)
+        chunk_index = 0
+        while True:
+            length_data = archive_file.read(LENGTH.size)
+            if len(length_data) < LENGTH.size:
+                raise ValueError("Truncated archive")
+            encrypted_chunk = archive_file.read(LENGTH.unpack(length_data)[0])
+
+            # The flag is authenticated with the chunk, the last chunk is the one it can be decrypted with
+            for is_last in (False, True):
+                try:
+                    data = crypto_utils.decrypt_gcm(key, encrypted_chunk, CHUNK_ASSOCIATED_DATA.pack(chunk_index, is_last))
+                    break
+                except ValueError:
+                    if is_last:
+                        raise ValueError(f"Damaged archive (chunk {chunk_index})") from None
+            if is_last:
+                if archive_file.read(1):
+                    raise ValueError("Damaged archive (data after the last chunk)")
+                return
+
+            data = memoryview(compression.decompress(data[0], data[1:]))
+            position = 0
+            while position < len(data):
+                entry_date, title_length, tags_length, entry_mood, content_length = ENTRY_HEADER.unpack_from(data, position)
+                position += ENTRY_HEADER.size
+                entry_title = bytes(data[position:position+title_length]).decode("utf-8")
+                position += title_length
+                entry_tags = bytes(data[position:position+tags_length]).decode("utf-8")
+                position += tags_length
+                entry_content = bytes(data[position:position+content_length])
+                position += content_length
+                yield entry_date.decode("ascii"), Entry(entry_title, entry_tags, entry_mood, entry_content)
+            chunk_index += 1
@@ -0,0 +1,159 @@
+#    Lifelog (attachment_store.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import hmac
+import struct
+from hashlib import sha256
+
+from lifelog import compression
+from lifelog import config
+from lifelog import crypto_utils
+from lifelog.content_chunks import SECTION_HEADER, TEXT_SECTION_NAME, IMAGE_SECTION_NAME
+
+# The data of an image section is a GdkPixdata : magic, length, type, rowstride, width and height, then the pixels
+PIXDATA_HEADER = struct.Struct(">6I")
+PIXDATA_MAGIC = 0x47646B50
+PIXDATA_CHANNELS = {0x01: 3, 0x02: 4} # Color type (RGB or RGBA) -> bytes per pixel
+PIXDATA_COLOR_TYPE_MASK = 0xFF
+PIXDATA_SAMPLE_WIDTH_MASK = 0x0F << 16
+PIXDATA_SAMPLE_WIDTH_8 = 0x01 << 16
+PIXDATA_ENCODING_MASK = 0x0F << 24
+PIXDATA_ENCODING_RAW = 0x01 << 24
+
+
+# Split a serialized Gtk.TextBuffer (a single chunk of an entry content) into its text section and the data of its images
+# Content in any other format is returned unchanged without images
+def split_content(entry_content):
+    entry_content = memoryview(entry_content)
+    sections = []
+    position = 0
+    while position + SECTION_HEADER.size <= len(entry_content):
+        section_name, length = SECTION_HEADER.unpack_from(entry_content, position)
+        sections.append((section_name, position, position + SECTION_HEADER.size + length))
+        position += SECTION_HEADER.size + length
+
+    if position != len(entry_content) or not sections or sections[0][0] != TEXT_SECTION_NAME:
+        return bytes(entry_content), []
+
+    text_content = b"".join(entry_content[start:end] for section_name, start, end in sections if section_name != IMAGE_SECTION_NAME)
+    images = [bytes(entry_content[start+SECTION_HEADER.size:end]) for section_name, start, end in sections if section_name == IMAGE_SECTION_NAME]
+    return text_content, images
+
+
+# Rebuild a serialized Gtk.TextBuffer from its text section and the data of its images (in the same order)
+def join_content(text_content, images):
+    return b"".join([text_content] + [SECTION_HEADER.pack(IMAGE_SECTION_NAME, len(image)) + image for image in images])
+
+
+# Make a smaller copy of an image section (nearest neighbour), fitting in a square of max_size pixels
+# Returns None if the image is already small enough or can't be read
+def make_preview(image, max_size):
+    if len(image) < PIXDATA_HEADER.size:
+        return None
+    magic, length, pixdata_type, rowstride, width, height = PIXDATA_HEADER.unpack_from(image)
+    channels = PIXDATA_CHANNELS.get(pixdata_type & PIXDATA_COLOR_TYPE_MASK)
+    if (magic != PIXDATA_MAGIC or channels is None
+            or pixdata_type & PIXDATA_SAMPLE_WIDTH_MASK != PIXDATA_SAMPLE_WIDTH_8
+            or pixdata_type & PIXDATA_ENCODING_MASK != PIXDATA_ENCODING_RAW
+            or len(image) < PIXDATA_HEADER.size + rowstride * height
+            or max(width, height) <= max_size):
+        return None
+
+    # Keep one pixel out of step in both directions, copying each channel of a row at once
+    step = -(-max(width, height) // max_size)
+    preview_width, preview_height = -(-width // step), -(-height // step)
+    preview_rowstride = preview_width * channels
+    pixels = memoryview(image)[PIXDATA_HEADER.size:]
+    preview_pixels = bytearray(preview_rowstride * preview_height)
+    for y in range(preview_height):
+        row = pixels[y*step*rowstride:y*step*rowstride + width*channels]
+        for channel in range(channels):
+            preview_pixels[y*preview_rowstride+channel:(y+1)*preview_rowstride:channels] = row[channel::channels*step]
+
+    return PIXDATA_HEADER.pack(PIXDATA_MAGIC, PIXDATA_HEADER.size + len(preview_pixels), pixdata_type,
+                               preview_rowstride, preview_width, preview_height) + bytes(preview_pixels)
+
+
+class AttachmentStore:
+    # Initialize the store with keys derived from the AES key of the diary
+    def __init__(self, db, aes_key):
+        self.db = db
+        self.key = crypto_utils.derive_subkey(aes_key, b"lifelog attachments")
+        self.id_key = crypto_utils.derive_subkey(aes_key, b"lifelog attachment ids")
+
+
+    # Get the ID of an attachment from its data (keyed, so that the ID of a known image can't be guessed)
+    def get_attachment_id(self, data):
+        return hmac.new(self.id_key, data, sha256).digest()
+
+
+    # Compress and encrypt the data of an attachment, bound to its ID
+    def encrypt(self, data, associated_data):
+        codec, compressed_data = compression.compress(data)
+        return crypto_utils.encrypt_gcm(self.key, bytes([codec]) + compressed_data, associated_data)
+
+
+    # Decrypt and decompress the data of an attachment (raises ValueError if it has been modified)
+    def decrypt(self, encrypted_data, associated_data):
+        data = crypto_utils.decrypt_gcm(self.key, encrypted_data, associated_data)
+        return compression.decompress(data[0], data[1:])
+
+
+    # Store the attachments which aren't already stored, with a preview of the large images, and return the IDs of all of them, in the same order
+    # Identical attachments are only stored once
+    def store(self, attachments):
+        attachment_ids = [self.get_attachment_id(data) for data in attachments]
+
+        # Previews still displayed when the entry is saved stand for their complete image
+        attachment_ids_from_preview_ids = self.db.get_attachment_ids_from_preview_ids(attachment_ids)
+        attachment_ids = [attachment_ids_from_preview_ids.get(attachment_id, attachment_id) for attachment_id in attachment_ids]
+
+        existing_attachment_ids = self.db.get_existing_attachment_ids(attachment_ids)
+        for attachment_id, data in zip(attachment_ids, attachments):
+            if attachment_id not in existing_attachment_ids:
+                preview_id = encrypted_preview = None
+                preview = make_preview(data, config.IMAGE_PREVIEW_SIZE)
+                if preview is not None:
+                    preview_id = self.get_attachment_id(preview)
+                    encrypted_preview = self.encrypt(preview, attachment_id + b"preview")
+                self.db.add_attachment(attachment_id, self.encrypt(data, attachment_id), preview_id, encrypted_preview)
+                existing_attachment_ids.add(attachment_id)
+        return attachment_ids
+
+
+    # Get the decrypted attachments of the given IDs, in the same order
+    # Raises ValueError if one of them is missing or has been modified
+    def load(self, attachment_ids):
+        return self.load_previews(attachment_ids, with_previews=False)[0]
+
+
+    # Get the decrypted previews of the given attachments (or the attachments without preview), in the same order
+    # Returns them and the number of previews
+    def load_previews(self, attachment_ids, with_previews=True):
+        encrypted_attachments = self.db.get_attachments(attachment_ids, with_previews)
+        attachments = []
+        previews_count = 0
+        for attachment_id in attachment_ids:
+            if attachment_id not in encrypted_attachments:
+                raise ValueError("Missing attachment")
+            encrypted_data, encrypted_preview = encrypted_attachments[attachment_id]
+            if encrypted_preview is not None:
+                attachments.append(self.decrypt(encrypted_preview, attachment_id + b"preview"))
+                previews_count += 1
+            else:
+                attachments.append(self.decrypt(encrypted_data, attachment_id))
+        return attachments, previews_count
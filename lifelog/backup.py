@@ -0,0 +1,163 @@
+#    Lifelog (backup.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Back up a diary to a folder while it may be open in the app, and restore it
+# The first backup (and every BACKUP_MAX_INCREMENTALS backups) is a full copy made with the SQLite online backup API,
+# the other ones only contain the entries changed since the previous backup, found with the change journal of the diary
+# The backups are as encrypted as the diary, so no password is needed
+# Usage : lifelog backup DIARY_FILE BACKUP_FOLDER [--full]
+#         lifelog backup DIARY_FILE BACKUP_FOLDER --restore (restores the last backup to a new DIARY_FILE)
+
+import argparse
+import os
+import re
+import sys
+import time
+
+from lifelog import config
+from lifelog import db_handler
+
+BACKUP_FULL = "full"
+BACKUP_INCREMENTAL = "incremental"
+BACKUP_FILENAME_REGEX = re.compile(rf"^(\d+)-\d{{8}}-\d{{6}}-({BACKUP_FULL}|{BACKUP_INCREMENTAL})\.db$")
+
+# Get the backups of a folder in order, as (number, kind, path) tuples
+def list_backups(backup_folder):
+    backups = []
+    for filename in os.listdir(backup_folder):
+        filename_match = BACKUP_FILENAME_REGEX.match(filename)
+        if filename_match:
+            backups.append((int(filename_match.group(1)), filename_match.group(2), os.path.join(backup_folder, filename)))
+    return sorted(backups)
+
+
+# Get the backups needed to restore the last one : the last full backup and the incremental ones made after it
+def get_backup_chain(backups):
+    for i in range(len(backups) - 1, -1, -1):
+        if backups[i][1] == BACKUP_FULL:
+            return backups[i:]
+    return []
+
+
+# Back up a diary to a folder, incrementally if possible
+# progress_callback is called during a full backup with the number of pages copied and the total number of pages
+# Returns the path and the information of the new backup
+def backup_diary(db, backup_folder, full=False, progress_callback=None):
+    os.makedirs(backup_folder, exist_ok=True)
+    backups = list_backups(backup_folder)
+    backup_chain = get_backup_chain(backups)
+    db.ensure_schema()
+    current_state = db_handler.get_journal_state(db.conn)
+
+    # A full backup is needed when the last one doesn't continue from this diary as it is
+    last_state = db_handler.read_backup_info(backup_chain[-1][2]) if backup_chain else None
+    if (full or not last_state or len(backup_chain) > config.BACKUP_MAX_INCREMENTALS
+            or last_state["diary_id"] != current_state["diary_id"]
+            or last_state["schema_version"] != current_state["schema_version"]
+            or last_state["change_id"] > current_state["change_id"]):
+        backup_kind = BACKUP_FULL
+    else:
+        backup_kind = BACKUP_INCREMENTAL
+
+    number = backups[-1][0] + 1 if backups else 1
+    backup_filepath = os.path.join(backup_folder, f"{number:04d}-{time.strftime('%Y%m%d-%H%M%S')}-{backup_kind}.db")
+    backup_info = {"kind": backup_kind, "created_at": int(time.time())}
+
+    # Written under a temporary name, so that a backup interrupted midway is never used
+    temporary_filepath = backup_filepath + ".tmp"
+    if os.path.exists(temporary_filepath):
+        os.remove(temporary_filepath)
+    try:
+        if backup_kind == BACKUP_FULL:
+            progress = (lambda status, remaining, total: progress_callback(total - remaining, total)) if progress_callback else None
+            backup_info = db.write_full_backup(temporary_filepath, backup_info, progress)
+        else:
+            backup_info["base_change_id"] = last_state["change_id"]
+            backup_info = db.write_incremental_backup(temporary_filepath, backup_info, last_state)
+        os.replace(temporary_filepath, backup_filepath)
+    finally:
+        if os.path.exists(temporary_filepath):
+            os.remove(temporary_filepath)
+    return backup_filepath, backup_info
+
+
+# Restore the last backup of a folder to a new diary file
+# Raises ValueError if there is no backup or if one of the backups needed is missing
+def restore_diary(backup_folder, db_filepath):
+    backup_chain = get_backup_chain(list_backups(backup_folder))
+    if not backup_chain:
+        raise ValueError(f"No full backup in {backup_folder}")
+
+    # Check that each incremental backup continues from the previous one before writing anything
+    backup_infos = [db_handler.read_backup_info(backup_filepath) for number, backup_kind, backup_filepath in backup_chain]
+    for (number, backup_kind, backup_filepath), previous_info, backup_info in zip(backup_chain[1:], backup_infos, backup_infos[1:]):
+        if backup_info["base_change_id"] != previous_info["change_id"]:
+            raise ValueError(f"{os.path.basename(backup_filepath)} doesn't continue from the previous backup (one is missing)")
+
+    db = db_handler.DbHandler(db_filepath)
+    try:
+        db.restore_full_backup(backup_chain[0][2])
+        for number, backup_kind, backup_filepath in backup_chain[1:]:
+            db.apply_incremental_backup(backup_filepath)
+    finally:
+        db.close()
+    return len(backup_chain)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="lifelog backup", description="Back up a diary (it can stay open in Lifelog meanwhile). "
+                                                                         "Only the entries changed since the previous backup are copied, "
+                                                                         "except for the first backup and every "
+                                                                         f"{config.BACKUP_MAX_INCREMENTALS + 1} backups")
+    parser.add_argument("diary", help="diary file to back up (or to create with --restore)")
+    parser.add_argument("backup_folder", help="folder of the backups")
+    parser.add_argument("--full", action="store_true", help="copy the whole diary, even if it has been backed up to this folder before")
+    parser.add_argument("--restore", action="store_true", help="restore the last backup of the folder to a new diary file")
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    if args.restore:
+        if os.path.exists(args.diary):
+            sys.exit(f"The diary already exists : {args.diary}")
+        if not os.path.isdir(args.backup_folder):
+            sys.exit(f"No such folder : {args.backup_folder}")
+        try:
+            backups_count = restore_diary(args.backup_folder, args.diary)
+        except ValueError as exception:
+            sys.exit(str(exception))
+        print(f"{args.diary} restored from {backups_count} backups in {time.perf_counter() - start_time:.1f} s.", file=sys.stderr)
+        return
+
+    if not os.path.isfile(args.diary):
+        sys.exit(f"No such file : {args.diary}")
+    db = db_handler.DbHandler(args.diary)
+    try:
+        progress_callback = lambda copied_pages, total_pages: print(f"\r{copied_pages}/{total_pages} pages copied", end="", file=sys.stderr)
+        backup_filepath, backup_info = backup_diary(db, args.backup_folder, args.full, progress_callback)
+    finally:
+        db.close()
+
+    elapsed_seconds = time.perf_counter() - start_time
+    if backup_info["kind"] == BACKUP_FULL:
+        print(f"\nFull backup {backup_filepath} made in {elapsed_seconds:.1f} s ({os.path.getsize(backup_filepath) / 1024**2:.1f} MiB).", file=sys.stderr)
+    else:
+        print(f"Incremental backup {backup_filepath} made in {elapsed_seconds:.1f} s ({backup_info['entries']} entries changed, "
+              f"{os.path.getsize(backup_filepath) / 1024**2:.1f} MiB).", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#    Lifelog (cli.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Command line interface to a diary, without Gtk (for scripts and scheduled jobs)
+# The password is asked, or read from the LIFELOG_PASSWORD environment variable (LIFELOG_NEW_PASSWORD for the new one of passwd,
+# LIFELOG_ARCHIVE_PASSWORD for the one of an archive), like in lifelog import and lifelog export
+# Usage : lifelog-cli DIARY_FILE read|write|list|search|export|passwd ...
+
+import argparse
+import getpass
+import json
+import os
+import sys
+
+from lifelog import core
+from lifelog import exporter
+from lifelog import instrumentation
+from lifelog import rich_text
+
+PASSWORD_ENVIRONMENT_VARIABLE = "LIFELOG_PASSWORD"
+NEW_PASSWORD_ENVIRONMENT_VARIABLE = "LIFELOG_NEW_PASSWORD"
+ARCHIVE_PASSWORD_ENVIRONMENT_VARIABLE = "LIFELOG_ARCHIVE_PASSWORD"
+
+def get_password(prompt="Password : ", environment_variable=PASSWORD_ENVIRONMENT_VARIABLE):
+    if environment_variable in os.environ:
+        return os.environ[environment_variable]
+    return getpass.getpass(prompt)
+
+
+# Get a password being set, asked twice unless it is read from the environment
+# Raises ValueError if the retyped password doesn't match
+def get_new_password(prompt="Password : ", environment_variable=PASSWORD_ENVIRONMENT_VARIABLE):
+    if environment_variable in os.environ:
+        return os.environ[environment_variable]
+    password = getpass.getpass(prompt)
+    if getpass.getpass(f"Retype {prompt[0].lower()}{prompt[1:]}") != password:
+        raise ValueError("The passwords don't match!")
+    return password
+
+
+def print_entry(entry_date, entry, output_format, text=None):
+    if output_format == "json":
+        fields = {"date": entry_date, "title": entry.title, "tags": entry.tags, "mood": entry.mood}
+        if text is not None:
+            fields["text"] = text
+        print(json.dumps(fields, ensure_ascii=False))
+    elif text is None:
+        print(f"{entry_date}\t{entry.title}\t{entry.tags}\t{entry.mood}")
+    else:
+        print(f"{entry_date} - {entry.title}\nTags : {entry.tags}\nMood : {entry.mood}\n\n{text}")
+
+
+def read_command(diary, args):
+    entry = diary.read_entry(args.date)
+    text = rich_text.to_markdown(entry.content) if args.markdown else rich_text.to_plain_text(entry.content)
+    print_entry(args.date, entry, args.output_format, text)
+
+
+def write_command(diary, args):
+    old_entry = diary.read_entry(args.date)
+    # The fields not given are kept, the content too (with its formatting and images) unless a text is given
+    if args.text is None:
+        content = old_entry.content
+    else:
+        content = rich_text.from_plain_text(sys.stdin.read() if args.text == "-" else args.text)
+    diary.write_entry(args.date,
+                      title=old_entry.title if args.title is None else args.title,
+                      tags=old_entry.tags if args.tags is None else args.tags,
+                      mood=old_entry.mood if args.mood is None else args.mood,
+                      content=content)
+
+
+def list_command(diary, args):
+    for entry_date in diary.get_entry_dates(args.from_date, args.to_date):
+        print(entry_date)
+
+
+def search_command(diary, args):
+    for entry_date, entry in diary.search(args.field, args.search_content, args.from_date, args.to_date):
+        print_entry(entry_date, entry, args.output_format)
+
+
+def export_command(diary, args):
+    archive_password = get_password("Archive password : ", ARCHIVE_PASSWORD_ENVIRONMENT_VARIABLE).encode("utf-8") if args.format == "archive" else None
+    exported_entries = diary.export(args.output, args.format, args.from_date, args.to_date, archive_password)
+    print(f"{exported_entries} entries exported.", file=sys.stderr)
+
+
+def passwd_command(diary, args):
+    try:
+        diary.change_password(args.password, get_new_password("New password : ", NEW_PASSWORD_ENVIRONMENT_VARIABLE))
+    except ValueError as exception:
+        sys.exit(str(exception))
+    print("Password changed.", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="lifelog-cli", description="Read, write, search and export the entries of a diary, or change its password, "
+                                                                      f"without the app (the password is read from {PASSWORD_ENVIRONMENT_VARIABLE} if set)")
+    parser.add_argument("diary", help="diary file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_date_range_arguments(command_parser):
+        command_parser.add_argument("--from", dest="from_date", default=core.MIN_DATE, help="first date (YYYY-MM-DD)")
+        command_parser.add_argument("--to", dest="to_date", default=core.MAX_DATE, help="last date (YYYY-MM-DD)")
+
+    def add_output_format_argument(command_parser):
+        command_parser.add_argument("--json", dest="output_format", action="store_const", const="json", default="text", help="print JSON")
+
+    read_parser = commands.add_parser("read", help="print an entry")
+    read_parser.add_argument("date", help="date of the entry (YYYY-MM-DD)")
+    read_parser.add_argument("--markdown", action="store_true", help="keep the formatting as Markdown")
+    add_output_format_argument(read_parser)
+    read_parser.set_defaults(function=read_command)
+
+    write_parser = commands.add_parser("write", help="add or change an entry (the fields not given are kept)")
+    write_parser.add_argument("date", help="date of the entry (YYYY-MM-DD)")
+    write_parser.add_argument("--title")
+    write_parser.add_argument("--tags")
+    write_parser.add_argument("--mood", type=int, choices=range(101), metavar="0-100")
+    write_parser.add_argument("--text", help="new text of the entry (- reads it from stdin)")
+    write_parser.set_defaults(function=write_command)
+
+    list_parser = commands.add_parser("list", help="print the dates of the entries")
+    add_date_range_arguments(list_parser)
+    list_parser.set_defaults(function=list_command)
+
+    search_parser = commands.add_parser("search", help="print the entries whose title or tags contain a text, or whose mood matches a filter (like \">= 70\")")
+    search_parser.add_argument("field", choices=["title", "tags", "mood"])
+    search_parser.add_argument("search_content")
+    add_date_range_arguments(search_parser)
+    add_output_format_argument(search_parser)
+    search_parser.set_defaults(function=search_command)
+
+    export_parser = commands.add_parser("export", help="export the entries (see lifelog export to resume long exports)")
+    export_parser.add_argument("output", help="output file (or folder for markdown)")
+    export_parser.add_argument("--format", choices=sorted(exporter.WRITERS), required=True)
+    add_date_range_arguments(export_parser)
+    export_parser.set_defaults(function=export_command)
+
+    passwd_parser = commands.add_parser("passwd", help=f"change the password of the diary (the new one is read from {NEW_PASSWORD_ENVIRONMENT_VARIABLE} if set)")
+    passwd_parser.set_defaults(function=passwd_command)
+
+    args = parser.parse_args(argv)
+    instrumentation.enable_from_environment()
+    if not os.path.isfile(args.diary):
+        sys.exit(f"No such file : {args.diary}")
+    if args.command == "export" and os.path.exists(args.output):
+        sys.exit(f"The output already exists : {args.output}")
+
+    args.password = get_password() # Also needed by passwd
+    try:
+        diary = core.Diary(args.diary, args.password)
+    except ValueError as exception:
+        sys.exit(str(exception))
+    try:
+        args.function(diary, args)
+    finally:
+        diary.close()
+
+
+if __name__ == "__main__":
+    main()
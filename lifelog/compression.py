@@ -0,0 +1,76 @@
+#    Lifelog (compression.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import zlib
+
+from lifelog import config
+
+# Zstandard is optional, zlib is used when it isn't installed
+try:
+    import zstandard
+    IS_ZSTD_AVAILABLE = True
+except ImportError:
+    IS_ZSTD_AVAILABLE = False
+
+# Codec IDs, stored with the compressed data
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_NAMES = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+# Get the ID of the codec used for new data
+def get_default_codec():
+    codec = CODEC_NAMES[config.COMPRESSION_CODEC]
+    if codec == CODEC_ZSTD and not IS_ZSTD_AVAILABLE:
+        return CODEC_ZLIB
+    return codec
+
+
+# Compress data, returning the ID of the codec used and the compressed data
+# Small or incompressible data (images already compressed...) is left as is
+def compress(raw, codec=None):
+    codec = get_default_codec() if codec is None else codec
+    if codec == CODEC_NONE or len(raw) < config.COMPRESSION_MIN_BYTES:
+        return CODEC_NONE, raw
+
+    if codec == CODEC_ZSTD:
+        compressed = zstandard.ZstdCompressor(level=config.ZSTD_LEVEL).compress(raw)
+    else:
+        compressed = zlib.compress(raw, config.ZLIB_LEVEL)
+
+    if len(compressed) >= len(raw):
+        return CODEC_NONE, raw
+    return codec, compressed
+
+
+# Decompress data compressed with the given codec (raises ValueError if it can't be)
+def decompress(codec, compressed):
+    if codec == CODEC_NONE:
+        return compressed
+    if codec == CODEC_ZLIB:
+        try:
+            return zlib.decompress(compressed)
+        except zlib.error as exception:
+            raise ValueError(f"Invalid zlib data: {exception}") from exception
+    if codec == CODEC_ZSTD:
+        if not IS_ZSTD_AVAILABLE:
+            raise ValueError("This entry is compressed with Zstandard, install zstandard to read it")
+        try:
+            return zstandard.ZstdDecompressor().decompress(compressed)
+        except zstandard.ZstdError as exception:
+            raise ValueError(f"Invalid Zstandard data: {exception}") from exception
+    raise ValueError(f"Unknown compression codec: {codec}")
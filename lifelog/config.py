@@ -21,3 +21,80 @@ APP_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
 RES_DIRECTORY = os.path.join(APP_DIRECTORY, "res")
 GLADE_FILENAME = "ui.glade"
 GLADE_FILEPATH = os.path.join(APP_DIRECTORY, RES_DIRECTORY, GLADE_FILENAME)
+
+# SQLite connection tuning for the diary database
+DB_CACHED_STATEMENTS = 64      # Prepared statements kept per connection
+DB_JOURNAL_MODE = "WAL"
+DB_SYNCHRONOUS = "NORMAL"      # Safe with WAL, avoids an fsync on every commit
+DB_CACHE_SIZE_KIB = 8192       # Page cache size
+DB_MMAP_SIZE = 64 * 1024**2    # Memory-mapped I/O size
+DB_BUSY_TIMEOUT_MS = 5000
+
+# Memory used by the cache of decrypted entries
+ENTRY_CACHE_MAX_BYTES = 32 * 1024**2
+
+# Read ahead of the calendar : days before and after the selected one, months before and after the displayed one,
+# and memory used by the entries read ahead (in addition to the cache)
+PREFETCH_DAYS = 2
+PREFETCH_MONTHS = 1
+PREFETCH_MAX_BYTES = 16 * 1024**2
+
+# Size of the chunks of the entry content (in characters, an image counting as one, and in images), each stored and encrypted
+# on its own : the first one is displayed at once, the next ones are loaded and added to the text view when the app is idle
+ENTRY_CHUNK_CHARS = 8192
+ENTRY_CHUNK_IMAGES = 4
+
+# Compression of the entry content before its encryption ("zstd" falls back to "zlib" if zstandard isn't installed)
+COMPRESSION_CODEC = "zstd"
+COMPRESSION_MIN_BYTES = 128 # Smaller contents are stored as is
+ZLIB_LEVEL = 1 # Pixel data of the images barely compresses better at higher levels, while saving gets much slower
+ZSTD_LEVEL = 3
+
+# Inserted images are decoded at most at this size (in pixels, for their longest side)
+IMAGE_MAX_SIZE = 1920
+# Images larger than this get a preview, displayed while they are loaded
+IMAGE_PREVIEW_SIZE = 480
+
+# Number of entries decrypted at once while searching
+SEARCH_BATCH_SIZE = 64
+# Number of entries decrypted at once when building the search index and the mood store
+INDEX_REBUILD_BATCH_SIZE = 256
+
+# Bulk encryption and decryption (0 uses one worker per CPU core)
+CRYPTO_WORKERS = 0
+CRYPTO_PARALLEL_MIN_VALUES = 64 # Smaller batches are handled by the calling thread
+
+# Minimum length of the diary passwords
+MIN_PASSWORD_LENGTH = 8
+
+# Minimum key derivation parameters of new diaries (Argon2id is used if argon2-cffi is installed)
+SCRYPT_N = 2**14
+SCRYPT_R = 8
+SCRYPT_P = 1
+ARGON2_TIME_COST = 3
+ARGON2_MEMORY_COST_KIB = 64 * 1024
+
+# Key derivation calibration of new diaries
+KDF_TARGET_UNLOCK_SECONDS = 0.5
+KDF_MAX_MEMORY_MIB = 256
+KDF_MAX_ARGON2_TIME_COST = 64
+
+# Timing of the hot paths (database, encryption, text buffer), enabled by setting LIFELOG_INSTRUMENT=1
+# With LIFELOG_TRACE_FILE set, a trace (Chrome trace event format) is also saved there on exit
+INSTRUMENTATION_ENV_VARIABLE = "LIFELOG_INSTRUMENT"
+INSTRUMENTATION_TRACE_FILE_ENV_VARIABLE = "LIFELOG_TRACE_FILE"
+INSTRUMENTATION_MAX_TRACE_EVENTS = 200000 # Only the last calls are kept in the trace
+
+# Number of entries saved per transaction when importing entries
+IMPORT_BATCH_SIZE = 256
+
+# Number of entries decrypted and written at once when exporting a diary
+EXPORT_BATCH_SIZE = 64
+
+# Pages copied per step of a full backup (the diary stays usable between the steps)
+BACKUP_PAGES_PER_STEP = 1024
+# Incremental backups made after a full one before the next full one (restoring needs all of them)
+BACKUP_MAX_INCREMENTALS = 30
+
+# Number of entries re-encrypted at once when migrating the key of a diary or rewriting its old entries in the current format
+KEY_MIGRATION_BATCH_SIZE = 256
@@ -0,0 +1,75 @@
+#    Lifelog (content_chunks.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+
+# The content of an entry is made of one or more chunks : serialized Gtk.TextBuffers of consecutive parts of the text, put one after the other
+# Each chunk can be stored, read and displayed on its own, so that the beginning of a long entry is shown without waiting for the rest
+# (the content of the entries written before is a single chunk)
+
+import struct
+
+# A serialized Gtk.TextBuffer is a list of sections, each made of a 26 bytes name, its length (4 bytes) and its data :
+# the text and tags first (as XML, images being referenced by their index), then the pixel data of each image
+SECTION_HEADER = struct.Struct(">26sI")
+TEXT_SECTION_NAME = b"GTKTEXTBUFFERCONTENTS-0001"
+IMAGE_SECTION_NAME = b"GTKTEXTBUFFERPIXBDATA-0001"
+
+# Character standing for an image in the text of a Gtk.TextBuffer
+IMAGE_CHARACTER = "\ufffc"
+
+
+# Split the content of an entry into its chunks, each starting with its text section
+# Content in any other format is returned unchanged as a single chunk
+def split_chunks(entry_content):
+    entry_content = memoryview(entry_content)
+    chunk_starts = []
+    position = 0
+    while position + SECTION_HEADER.size <= len(entry_content):
+        section_name, length = SECTION_HEADER.unpack_from(entry_content, position)
+        if section_name == TEXT_SECTION_NAME:
+            chunk_starts.append(position)
+        position += SECTION_HEADER.size + length
+
+    if position != len(entry_content) or not chunk_starts or chunk_starts[0] != 0:
+        return [bytes(entry_content)]
+    return [bytes(entry_content[start:end]) for start, end in zip(chunk_starts, chunk_starts[1:] + [len(entry_content)])]
+
+
+# Get the offsets where the chunks of a text start (the first one being 0)
+# A chunk ends at the last line break before it gets longer than chunk_chars characters or has more than chunk_images images
+# (in the middle of a line only if it is longer than that), images being IMAGE_CHARACTER
+def get_chunk_offsets(text, chunk_chars, chunk_images):
+    offsets = [0]
+    position = 0
+    while True:
+        end = position + chunk_chars
+        image_end = position
+        for _ in range(chunk_images):
+            image_end = text.find(IMAGE_CHARACTER, image_end, end) + 1
+            if image_end == 0:
+                break
+        else:
+            if text.find(IMAGE_CHARACTER, image_end, end) != -1:
+                end = image_end
+        if end >= len(text):
+            return offsets
+
+        line_end = text.rfind("\n", position, end)
+        if line_end != -1:
+            end = line_end + 1
+        offsets.append(end)
+        position = end
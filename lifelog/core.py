@@ -0,0 +1,154 @@
+#    Lifelog (core.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Use a diary from scripts, without Gtk (the app doesn't need to be running, but the diary shouldn't be open in it while writing)
+#
+#     with core.Diary("diary.db", b"password") as diary:
+#         diary.write_entry("2024-01-01", title="New year", text="...")
+#         for entry_date, entry in diary.search("title", "year"):
+#             print(entry_date, entry.title, diary.read_text(entry_date))
+
+import os
+
+from lifelog import config
+from lifelog import crypto_utils
+from lifelog import db_handler
+from lifelog import exporter
+from lifelog import key_manager
+from lifelog import rich_text
+from lifelog import search
+from lifelog.entry_store import EntryStore, Entry, DEFAULT_ENTRY_MOOD
+
+MIN_DATE = "0000-00-00"
+MAX_DATE = "9999-99-99"
+
+def encode_password(password):
+    return password.encode("utf-8") if isinstance(password, str) else password
+
+
+class Diary:
+    # Open a diary (or create it) and unlock it with its password
+    # Raises ValueError if the diary doesn't exist (opening a mistyped path would create an empty file) or if the password is incorrect
+    def __init__(self, db_filepath, password, create=False):
+        password = encode_password(password)
+        if not create and not os.path.isfile(db_filepath):
+            raise ValueError(f"No such file : {db_filepath}")
+        self.db = db_handler.DbHandler(db_filepath)
+        try:
+            if create:
+                self.db.reset_database()
+                aes_key = key_manager.create_keys(self.db, password)
+                self.db.commit()
+            else:
+                if not key_manager.has_keys(self.db):
+                    raise ValueError(f"Not a Lifelog diary : {db_filepath}")
+                aes_key = key_manager.unlock(self.db, password)
+                if aes_key is None:
+                    raise ValueError("Wrong password!")
+        except BaseException:
+            self.db.close()
+            raise
+        self.store = EntryStore(self.db, crypto_utils.AESCipher(aes_key))
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+
+    def close(self):
+        if self.db.conn:
+            self.store.close()
+            self.db.close()
+
+
+    # Change the password of the diary (its entries aren't re-encrypted)
+    # Raises ValueError if the current password is incorrect or if the new one is too short
+    def change_password(self, current_password, new_password):
+        current_password, new_password = encode_password(current_password), encode_password(new_password)
+        if len(new_password.decode("utf-8")) < config.MIN_PASSWORD_LENGTH:
+            raise ValueError(f"Password must be at least {config.MIN_PASSWORD_LENGTH} characters long!")
+        if not key_manager.change_password(self.db, current_password, new_password):
+            raise ValueError("Wrong password!")
+
+
+    # Get an entry (an empty one if there is none on this date), its content being the serialized Gtk.TextBuffer
+    def read_entry(self, entry_date):
+        return self.store.read_entry(entry_date)
+
+
+    # Get the text of an entry without its formatting and images
+    def read_text(self, entry_date):
+        return rich_text.to_plain_text(self.read_entry(entry_date).content)
+
+
+    # Add or replace an entry, given either as text or as a serialized Gtk.TextBuffer
+    def write_entry(self, entry_date, title="", tags="", mood=DEFAULT_ENTRY_MOOD, text="", content=None):
+        self.write_entries([(entry_date, self.make_entry(title, tags, mood, text, content))])
+
+
+    # Add or replace many entries, given as (entry_date, entry) tuples, in a single transaction
+    def write_entries(self, dated_entries):
+        self.store.ensure_indexes_built()
+        self.store.save_entries(dated_entries)
+
+
+    # Raises ValueError if the mood isn't between 0 and 100
+    @staticmethod
+    def make_entry(title="", tags="", mood=DEFAULT_ENTRY_MOOD, text="", content=None):
+        mood = int(mood)
+        if not 0 <= mood <= 100:
+            raise ValueError(f"Mood {mood} isn't between 0 and 100")
+        if content is None:
+            content = rich_text.from_plain_text(text)
+        return Entry(title, tags, mood, content)
+
+
+    # Get the dates of the entries between two dates
+    def get_entry_dates(self, from_date=MIN_DATE, to_date=MAX_DATE):
+        return self.db.get_entry_dates_between(from_date, to_date)
+
+
+    # Search the entries whose title or tags contain a text, or whose mood matches a filter (like ">= 70")
+    # Yields (entry_date, entry) tuples, the entries having no content (read_entry gets it)
+    def search(self, field, search_content, from_date=MIN_DATE, to_date=MAX_DATE):
+        for found_entries in search.iter_search_results(self.store, from_date, to_date, field, search_content, config.SEARCH_BATCH_SIZE):
+            yield from found_entries
+
+
+    # Get the mood statistics of each month between two dates
+    def get_mood_stats(self, from_date=MIN_DATE, to_date=MAX_DATE):
+        return self.store.get_mood_stats(from_date, to_date)
+
+
+    # Export the entries between two dates (see lifelog.exporter for the formats, archives need archive_password)
+    # progress_callback is called after each batch with the number of exported entries
+    def export(self, output_path, export_format, from_date=MIN_DATE, to_date=MAX_DATE, archive_password=None, progress_callback=None):
+        writer = exporter.make_writer(export_format, output_path, archive_password=archive_password)
+        exported_entries = 0
+        def on_batch_written(last_date, batch_entries):
+            nonlocal exported_entries
+            exported_entries += batch_entries
+            if progress_callback:
+                progress_callback(exported_entries)
+
+        exporter.export_entries(self.store, writer, from_date, to_date, on_batch_written=on_batch_written)
+        writer.close()
+        return exported_entries
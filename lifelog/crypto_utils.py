@@ -18,8 +18,36 @@
 from Cryptodome.Cipher import AES
 from Cryptodome.Random import get_random_bytes
 from Cryptodome.Util.Padding import pad, unpad
+from Cryptodome.Protocol.KDF import HKDF
+from Cryptodome.Hash import SHA256
+
+from hashlib import scrypt, sha256
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+from lifelog import config
+
+# Argon2 is optional, scrypt is used when it isn't installed
+try:
+    from argon2.low_level import hash_secret_raw, Type
+    IS_ARGON2_AVAILABLE = True
+except ImportError:
+    IS_ARGON2_AVAILABLE = False
+
+# Thread pools shared by every cipher, by number of workers (PyCryptodome releases the GIL while encrypting)
+thread_pools = {}
+
+# Get a shared thread pool with the given number of workers
+def get_thread_pool(workers):
+    if workers not in thread_pools:
+        thread_pools[workers] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lifelog-crypto")
+    return thread_pools[workers]
+
+
+# Get the default number of workers used for bulk encryption
+def get_default_workers():
+    return config.CRYPTO_WORKERS or os.cpu_count() or 1
 
-from hashlib import scrypt
 
 class AESCipher:
     def __init__(self, key):
@@ -41,10 +69,95 @@ class AESCipher:
             return b''
 
 
+    # Encrypt many values, in parallel if there are enough of them
+    def encrypt_many(self, raw_values, workers=None):
+        return self.map_parallel(self.encrypt, raw_values, workers)
+
+
+    # Decrypt many values, in parallel if there are enough of them
+    def decrypt_many(self, encrypted_values, workers=None):
+        return self.map_parallel(self.decrypt, encrypted_values, workers)
+
+
+    # Apply a function to every value and return the results in the same order
+    def map_parallel(self, function, values, workers=None):
+        values = list(values)
+        workers = workers or get_default_workers()
+        if workers == 1 or len(values) < config.CRYPTO_PARALLEL_MIN_VALUES:
+            return [function(value) for value in values]
+
+        # Each worker handles a contiguous slice, as a task per value costs more than decrypting a small field
+        slice_size = -(-len(values) // workers)
+        slices = [values[i:i+slice_size] for i in range(0, len(values), slice_size)]
+        results = []
+        for slice_results in get_thread_pool(workers).map(lambda values_slice: [function(value) for value in values_slice], slices):
+            results += slice_results
+        return results
+
+
 class scryptHasher:
     @staticmethod
-    def hash_password(password, salt):
-        n = 2**14 # CPU/Memory cost factor
-        r = 8     # Block size
-        p = 1     # Parallelization factor
-        return scrypt(password=password, salt=salt, n=2**14, r=8, p=1, dklen=32)
+    def hash_password(password, salt, n=2**14, r=8, p=1):
+        # n : CPU/Memory cost factor, r : Block size, p : Parallelization factor
+        maxmem = min(128 * r * (n + p) + 1024**2, 2**31 - 1)
+        return scrypt(password=password, salt=salt, n=n, r=r, p=p, maxmem=maxmem, dklen=32)
+
+
+# Derive a 32-byte master key from a password with the KDF described by kdf_params
+def derive_master_key(password, salt, kdf_params):
+    if kdf_params["algorithm"] == "argon2id":
+        if not IS_ARGON2_AVAILABLE:
+            raise ValueError("This diary requires the argon2-cffi package")
+        return hash_secret_raw(secret=password, salt=salt, time_cost=kdf_params["time_cost"], memory_cost=kdf_params["memory_cost"],
+                               parallelism=kdf_params["parallelism"], hash_len=32, type=Type.ID)
+
+    elif kdf_params["algorithm"] == "scrypt":
+        # OpenSSL computes the p blocks of scrypt one after the other, so the cores are used by hashing independent lanes
+        # (each with its own salt) in parallel threads and combining their outputs
+        lanes = kdf_params.get("lanes", 1)
+        if lanes == 1:
+            return scryptHasher.hash_password(password, salt, kdf_params["n"], kdf_params["r"], kdf_params["p"])
+
+        hash_lane = lambda lane: scryptHasher.hash_password(password, salt + bytes([lane]), kdf_params["n"], kdf_params["r"], kdf_params["p"])
+        return sha256(b"".join(get_thread_pool(lanes).map(hash_lane, range(lanes)))).digest()
+
+    raise ValueError(f"Unknown KDF : {kdf_params['algorithm']}")
+
+
+# Expand a master key into independent keys for the password verification and the encryption
+def expand_master_key(master_key):
+    verification_key, aes_key = HKDF(master_key, 32, b"", SHA256, num_keys=2, context=b"lifelog key derivation")
+    return verification_key, aes_key
+
+
+# Encrypt and authenticate data with AES-GCM, associated_data being authenticated but not encrypted
+# Returns the nonce, the encrypted data and the tag
+def encrypt_gcm(key, raw, associated_data=b""):
+    nonce = get_random_bytes(12)
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(associated_data)
+    encrypted_data, tag = cipher.encrypt_and_digest(raw)
+    return nonce + encrypted_data + tag
+
+
+# Decrypt data encrypted by encrypt_gcm (raises ValueError if it or its associated data has been modified)
+def decrypt_gcm(key, enc, associated_data=b""):
+    nonce, tag = enc[:12], enc[-16:]
+    cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+    cipher.update(associated_data)
+    return cipher.decrypt_and_verify(enc[12:-16], tag)
+
+
+# Derive an independent subkey for a given purpose from a key
+def derive_subkey(key, purpose):
+    return HKDF(key, 32, b"", SHA256, context=purpose)
+
+
+# Encrypt a key with a key-encryption key (AES-GCM, so that a modified wrapped key is detected)
+def wrap_key(key_encryption_key, key):
+    return encrypt_gcm(key_encryption_key, key)
+
+
+# Decrypt a key encrypted by wrap_key (raises ValueError if it has been modified)
+def unwrap_key(key_encryption_key, wrapped_key):
+    return decrypt_gcm(key_encryption_key, wrapped_key)
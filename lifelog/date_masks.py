@@ -0,0 +1,44 @@
+#    Lifelog (date_masks.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+class DateMasks:
+    # Initialize the cache of the days having an entry, as a 31 bits mask per month (bit 0 being the first day)
+    def __init__(self, db):
+        self.db = db
+        self.month_masks = {} # (year, month) -> mask, year and month being integers
+
+
+    # Get the mask of the days having an entry in a month
+    def get_month_mask(self, year, month):
+        if (year, month) not in self.month_masks:
+            month_mask = 0
+            for entry_date in self.db.get_entry_dates_between(f"{year:04d}-{month:02d}-01", f"{year:04d}-{month:02d}-31"):
+                month_mask |= 1 << (int(entry_date[8:10]) - 1)
+            self.month_masks[(year, month)] = month_mask
+        return self.month_masks[(year, month)]
+
+
+    # Mark the day of an entry (only updates the mask of its month if it is already known)
+    def add_date(self, entry_date):
+        year, month, day = (int(date_part) for date_part in entry_date.split("-"))
+        if (year, month) in self.month_masks:
+            self.month_masks[(year, month)] |= 1 << (day - 1)
+
+
+    # Forget every mask
+    def clear(self):
+        self.month_masks.clear()
@@ -19,99 +19,665 @@ import sqlite3
 
 from lifelog import config
 
-class DbHandler:
-    # Initialize the database connection
-    def __init__(self, db_filepath:str):
-        # Connect to the database and create the cursor
-        self.conn = sqlite3.connect(db_filepath)
-        self.cursor = self.conn.cursor()
-
-        # If the tables don't exist, create them
-        self.cursor.execute('''
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+SCHEMA_MIGRATIONS = [
+    # 1 : Original layout
+    (
+        '''
         CREATE TABLE IF NOT EXISTS entries (
-	        db_id INTEGER PRIMARY KEY AUTOINCREMENT,
-	        entry_date DATE UNIQUE,
-	        entry_title BLOB,
-    	    entry_tags BLOB,
+            db_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            entry_date DATE UNIQUE,
+            entry_title BLOB,
+            entry_tags BLOB,
             entry_mood BLOB,
             entry_content BLOB
         );
-        ''')
-        
-        self.cursor.execute('''
+        ''',
+        '''
         CREATE TABLE IF NOT EXISTS settings (
             db_id INTEGER PRIMARY KEY AUTOINCREMENT,
             key TEXT UNIQUE,
             value BLOB
         );
-        ''')
+        ''',
+    ),
+    # 2 : Search index (keyed HMAC terms -> entry dates)
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS search_terms (
+            term BLOB NOT NULL,
+            entry_date DATE NOT NULL,
+            PRIMARY KEY (term, entry_date)
+        ) WITHOUT ROWID;
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS search_terms_entry_date ON search_terms (entry_date);
+        ''',
+    ),
+    # 3 : Moods of a whole year encrypted in a single block
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS mood_blocks (
+            year TEXT PRIMARY KEY,
+            data BLOB
+        );
+        ''',
+    ),
+    # 4 : Row format of the entries (1 : fields encrypted separately, 2 : single record in entry_content)
+    (
+        '''
+        ALTER TABLE entries ADD COLUMN entry_format INTEGER NOT NULL DEFAULT 1;
+        ''',
+    ),
+    # 5 : Images stored once outside of the entries, and the images used by each entry
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS attachments (
+            db_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            attachment_id BLOB UNIQUE NOT NULL,
+            data BLOB
+        );
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS entry_attachments (
+            entry_date DATE NOT NULL,
+            attachment_id BLOB NOT NULL,
+            PRIMARY KEY (entry_date, attachment_id)
+        ) WITHOUT ROWID;
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS entry_attachments_attachment_id ON entry_attachments (attachment_id);
+        ''',
+    ),
+    # 6 : Smaller previews of the large images, displayed while the complete ones are loaded
+    (
+        '''
+        ALTER TABLE attachments ADD COLUMN preview_id BLOB;
+        ''',
+        '''
+        ALTER TABLE attachments ADD COLUMN preview BLOB;
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS attachments_preview_id ON attachments (preview_id);
+        ''',
+    ),
+    # 7 : Change journal of the entries (last change of each date, deleted entries included), for the incremental backups
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS entry_changes (
+            entry_date DATE PRIMARY KEY,
+            change_id INTEGER NOT NULL,
+            changed_at INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS entry_changes_change_id ON entry_changes (change_id);
+        ''',
+        '''
+        INSERT OR IGNORE INTO entry_changes (entry_date, change_id, changed_at) SELECT entry_date, db_id, CAST(strftime('%s', 'now') AS INTEGER) FROM entries;
+        ''',
+        *(f'''
+        CREATE TRIGGER IF NOT EXISTS entries_{event.lower()}_journal AFTER {event} ON entries BEGIN
+            INSERT OR REPLACE INTO entry_changes (entry_date, change_id, changed_at)
+            VALUES ({row}.entry_date, (SELECT IFNULL(MAX(change_id), 0) + 1 FROM entry_changes), CAST(strftime('%s', 'now') AS INTEGER));
+        END;
+        ''' for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD"))),
+        # Tells the backups of different diaries apart
+        '''
+        INSERT OR IGNORE INTO settings (key, value) VALUES ('diary_id', lower(hex(randomblob(16))));
+        ''',
+    ),
+    # 8 : Chunks of the content of the long entries after the first one (stored in the record), each encrypted on its own
+    (
+        '''
+        CREATE TABLE IF NOT EXISTS entry_chunks (
+            entry_date DATE NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            chunk_record BLOB NOT NULL,
+            PRIMARY KEY (entry_date, chunk_index)
+        ) WITHOUT ROWID;
+        ''',
+    ),
+]
+
+# Columns of the entry summaries, the record being only selected for the rows having one
+# (same indexes as the columns of a complete entry row)
+ENTRY_SUMMARY_COLUMNS = "db_id, entry_date, entry_title, entry_tags, entry_mood, CASE WHEN entry_format >= 2 THEN entry_content END, entry_format"
+
+# Maximum number of parameters bound to a single query
+MAX_QUERY_PARAMETERS = 500
+
+# Tables copied whole by the incremental backups (the other ones only have their changed rows copied)
+BACKUP_WHOLE_TABLES = ("settings", "mood_blocks")
+
+# Get the state of the change journal of a database (attached under the given schema name), saved in its backups
+def get_journal_state(conn, schema="main"):
+    settings = dict(conn.execute(f"SELECT key, value FROM {schema}.settings WHERE key IN ('diary_id', 'search_index_version')"))
+    return {
+        "diary_id": settings.get("diary_id"),
+        "schema_version": conn.execute(f"PRAGMA {schema}.user_version").fetchone()[0],
+        "change_id": conn.execute(f"SELECT IFNULL(MAX(change_id), 0) FROM {schema}.entry_changes").fetchone()[0],
+        "attachment_db_id": conn.execute(f"SELECT IFNULL(MAX(db_id), 0) FROM {schema}.attachments").fetchone()[0],
+        "search_index_version": settings.get("search_index_version"),
+    }
+
+
+# Get the information saved in a backup file
+def read_backup_info(backup_filepath):
+    conn = sqlite3.connect(f"file:{backup_filepath}?mode=ro", uri=True)
+    try:
+        return dict(conn.execute("SELECT key, value FROM backup_info"))
+    finally:
+        conn.close()
+
+
+class DbHandler:
+    # Initialize the database connection, kept open for as long as the diary is
+    def __init__(self, db_filepath:str):
+        self.db_filepath = db_filepath
+
+        # Identical SQL strings reuse the prepared statements kept by the connection
+        self.conn = sqlite3.connect(db_filepath, cached_statements=config.DB_CACHED_STATEMENTS, check_same_thread=False)
+
+        self.conn.execute(f"PRAGMA journal_mode = {config.DB_JOURNAL_MODE}")
+        self.conn.execute(f"PRAGMA synchronous = {config.DB_SYNCHRONOUS}")
+        self.conn.execute(f"PRAGMA cache_size = -{config.DB_CACHE_SIZE_KIB}")
+        self.conn.execute(f"PRAGMA mmap_size = {config.DB_MMAP_SIZE}")
+        self.conn.execute(f"PRAGMA busy_timeout = {config.DB_BUSY_TIMEOUT_MS}")
+        self.conn.execute("PRAGMA temp_store = MEMORY")
+
+        # The tables are created on first use
+        self.is_schema_ready = False
+
+
+    # Create or upgrade the tables if needed (only runs the DDL once per connection)
+    def ensure_schema(self):
+        if self.is_schema_ready:
+            return
+
+        schema_version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if schema_version < len(SCHEMA_MIGRATIONS):
+            # Apply all the missing migrations in a single transaction
+            self.conn.commit()
+            self.conn.execute("BEGIN")
+            try:
+                for migration in SCHEMA_MIGRATIONS[schema_version:]:
+                    for statement in migration:
+                        self.conn.execute(statement)
+                self.conn.execute(f"PRAGMA user_version = {len(SCHEMA_MIGRATIONS)}")
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+
+        self.is_schema_ready = True
+
+
+    # Commit the pending changes
+    def commit(self):
+        if self.conn:
+            self.conn.commit()
+
+
+    # Cancel the pending changes
+    def rollback(self):
+        if self.conn:
+            self.conn.rollback()
 
 
     # Commit and close the connection database
     def close(self):
-        self.conn.commit()
         if self.conn:
+            self.conn.commit()
+            self.conn.execute("PRAGMA optimize")
             self.conn.close()
             self.conn = None
 
 
-    # Reset the database if new file is overwrittzn
+    # Reset the database if new file is overwritten
     def reset_database(self):
-        self.cursor.execute('''
-        DROP TABLE IF EXISTS entries
-        ''')
-        self.cursor.execute('''
-        CREATE TABLE IF NOT EXISTS entries (
-        db_id INTEGER PRIMARY KEY AUTOINCREMENT,
-        entry_date DATE UNIQUE,
-        entry_title TEXT,
-        entry_tags TEXT,
-        entry_mood INTEGER,
-        entry_content BLOB
-        );
-        ''')
+        self.conn.commit()
+        tables = self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'").fetchall()
+        with self.conn:
+            for table in tables:
+                self.conn.execute(f'DROP TABLE IF EXISTS "{table[0]}"')
+            self.conn.execute("PRAGMA user_version = 0")
+        self.is_schema_ready = False
+        self.ensure_schema()
 
 
-    # Add or update an entry in the database
-    def update_entry(self, entry_date, entry_title, entry_tags, entry_mood, entry_content):
-        self.cursor.execute('''
+    # Add or update an entry in the database (and its search index terms if given)
+    def update_entry(self, entry_date, entry_title, entry_tags, entry_mood, entry_content, search_terms=None):
+        self.ensure_schema()
+        self.conn.execute('''
         INSERT OR REPLACE INTO entries (entry_date, entry_title, entry_tags, entry_mood, entry_content) VALUES (?, ?, ?, ?, ?)
         ''', (entry_date, entry_title, entry_tags, entry_mood, entry_content))
 
+        if search_terms is not None:
+            self.update_search_terms(entry_date, search_terms)
+
+
+    # Add or update many entries stored as single encrypted records, given as (entry_date, entry_record) tuples
+    def update_entry_records_from_dates(self, dated_entry_records):
+        self.ensure_schema()
+        self.conn.executemany('''
+        INSERT OR REPLACE INTO entries (entry_date, entry_content, entry_format) VALUES (?, ?, 2)
+        ''', dated_entry_records)
+
 
     # Get an entry from the database by its date
     def get_entry_from_date(self, entry_date):
-        self.cursor.execute('''
+        self.ensure_schema()
+        return self.conn.execute('''
         SELECT * FROM entries WHERE entry_date = ?
-        ''', (entry_date,))
-        return self.cursor.fetchone()
+        ''', (entry_date,)).fetchone()
 
 
-    # Get all existing entries for a given month and year
-    def get_existing_entry_dates_for_month_year(self, month, year):
-        query = "SELECT entry_date FROM entries WHERE entry_date LIKE ?"
-        self.cursor.execute(query, (f"{year}-{month}-%",))
-        return self.cursor.fetchall()
+    # Get the dates of the existing entries between two dates (a range read of the entry_date index)
+    def get_entry_dates_between(self, from_date, to_date):
+        self.ensure_schema()
+        return [row[0] for row in self.conn.execute('''
+        SELECT entry_date FROM entries WHERE entry_date >= ? AND entry_date <= ? ORDER BY entry_date
+        ''', (from_date, to_date))]
 
     
-    # Get all existing entries between two dates
-    def get_all_entries_between(self, from_date, to_date):
-        self.cursor.execute('''
-        SELECT * FROM entries WHERE entry_date >= ? AND entry_date <= ?
+    # Get all existing entries between two dates without their content
+    def get_entry_summaries_between(self, from_date, to_date):
+        self.ensure_schema()
+        return self.conn.execute(f'''
+        SELECT {ENTRY_SUMMARY_COLUMNS} FROM entries WHERE entry_date >= ? AND entry_date <= ? ORDER BY entry_date
+        ''', (from_date, to_date)).fetchall()
+
+
+    # Get the next batch of complete entries after a database ID, in ID order
+    def get_entries_after_id(self, db_id, batch_size):
+        self.ensure_schema()
+        return self.conn.execute('''
+        SELECT * FROM entries WHERE db_id > ? ORDER BY db_id LIMIT ?
+        ''', (db_id, batch_size)).fetchall()
+
+
+    # Get the next batch of complete entries still using the old format (every field encrypted separately) after a database ID, in ID order
+    def get_legacy_entries_after_id(self, db_id, batch_size):
+        self.ensure_schema()
+        return self.conn.execute('''
+        SELECT * FROM entries WHERE entry_format = 1 AND db_id > ? ORDER BY db_id LIMIT ?
+        ''', (db_id, batch_size)).fetchall()
+
+
+    # Count the entries still using the old format
+    def count_legacy_entries(self):
+        self.ensure_schema()
+        return self.conn.execute('''
+        SELECT COUNT(*) FROM entries WHERE entry_format = 1
+        ''').fetchone()[0]
+
+
+    # Replace many entries by single encrypted records, given as (entry_record, db_id) tuples
+    def update_entry_records(self, entry_records):
+        self.ensure_schema()
+        self.conn.executemany('''
+        UPDATE entries SET entry_title = NULL, entry_tags = NULL, entry_mood = NULL, entry_content = ?, entry_format = 2 WHERE db_id = ?
+        ''', entry_records)
+
+
+    # Count the existing entries between two dates
+    def count_entries_between(self, from_date, to_date):
+        self.ensure_schema()
+        return self.conn.execute('''
+        SELECT COUNT(*) FROM entries WHERE entry_date >= ? AND entry_date <= ?
+        ''', (from_date, to_date)).fetchone()[0]
+
+
+    # Iterate over batches of the entries between two dates without their content (only one batch is in memory at a time)
+    def iter_entry_summaries_between(self, from_date, to_date, batch_size):
+        self.ensure_schema()
+        cursor = self.conn.execute(f'''
+        SELECT {ENTRY_SUMMARY_COLUMNS} FROM entries WHERE entry_date >= ? AND entry_date <= ? ORDER BY entry_date
         ''', (from_date, to_date))
-        return self.cursor.fetchall()
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+    # Iterate over batches of the complete entries between two dates and after after_date, in date order
+    # (only one batch is in memory at a time, after_date allows resuming after the last entry read)
+    def iter_entries_between(self, from_date, to_date, batch_size, after_date=""):
+        self.ensure_schema()
+        cursor = self.conn.execute('''
+        SELECT * FROM entries WHERE entry_date >= ? AND entry_date <= ? AND entry_date > ? ORDER BY entry_date
+        ''', (from_date, to_date, after_date))
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+
+    # Get the entries of the given dates without their content
+    def get_entry_summaries_from_dates(self, entry_dates):
+        self.ensure_schema()
+        entry_dates = list(entry_dates)
+        entry_summaries = []
+        for i in range(0, len(entry_dates), MAX_QUERY_PARAMETERS):
+            dates_chunk = entry_dates[i:i+MAX_QUERY_PARAMETERS]
+            placeholders = ", ".join("?" * len(dates_chunk))
+            entry_summaries += self.conn.execute(f'''
+            SELECT {ENTRY_SUMMARY_COLUMNS} FROM entries WHERE entry_date IN ({placeholders})
+            ''', dates_chunk).fetchall()
+        return sorted(entry_summaries, key=lambda entry_summary: entry_summary[1])
+
+
+    # Replace the search index terms of an entry
+    def update_search_terms(self, entry_date, search_terms):
+        self.update_search_terms_from_dates([(entry_date, search_terms)])
+
+
+    # Replace the search index terms of many entries, given as (entry_date, search_terms) tuples
+    def update_search_terms_from_dates(self, dated_search_terms):
+        self.ensure_schema()
+        dated_search_terms = list(dated_search_terms)
+        self.conn.executemany('''
+        DELETE FROM search_terms WHERE entry_date = ?
+        ''', ((entry_date,) for entry_date, search_terms in dated_search_terms))
+        self.conn.executemany('''
+        INSERT OR IGNORE INTO search_terms (term, entry_date) VALUES (?, ?)
+        ''', ((search_term, entry_date) for entry_date, search_terms in dated_search_terms for search_term in search_terms))
+
+
+    # Remove every search index term
+    def clear_search_terms(self):
+        self.ensure_schema()
+        self.conn.execute("DELETE FROM search_terms")
+
+
+    # Get the dates (between two dates) of the entries having all the given search index terms
+    def get_entry_dates_with_search_terms(self, search_terms, from_date, to_date):
+        self.ensure_schema()
+        search_terms = list(search_terms)[:MAX_QUERY_PARAMETERS]
+        placeholders = ", ".join("?" * len(search_terms))
+        rows = self.conn.execute(f'''
+        SELECT entry_date FROM search_terms
+        WHERE term IN ({placeholders}) AND entry_date >= ? AND entry_date <= ?
+        GROUP BY entry_date HAVING COUNT(*) = ? ORDER BY entry_date
+        ''', (*search_terms, from_date, to_date, len(search_terms))).fetchall()
+        return [row[0] for row in rows]
+
+
+    # Replace the content chunks of many entries, given as (entry_date, chunk_records) tuples (the chunks after the first one, in order)
+    def update_entry_chunks_from_dates(self, dated_chunk_records):
+        self.ensure_schema()
+        dated_chunk_records = list(dated_chunk_records)
+        self.conn.executemany('''
+        DELETE FROM entry_chunks WHERE entry_date = ?
+        ''', ((entry_date,) for entry_date, chunk_records in dated_chunk_records))
+        self.conn.executemany('''
+        INSERT INTO entry_chunks (entry_date, chunk_index, chunk_record) VALUES (?, ?, ?)
+        ''', ((entry_date, chunk_index, chunk_record) for entry_date, chunk_records in dated_chunk_records
+              for chunk_index, chunk_record in enumerate(chunk_records, 1)))
+
+
+    # Get a content chunk of an entry (None if it doesn't exist)
+    def get_entry_chunk(self, entry_date, chunk_index):
+        self.ensure_schema()
+        row = self.conn.execute('''
+        SELECT chunk_record FROM entry_chunks WHERE entry_date = ? AND chunk_index = ?
+        ''', (entry_date, chunk_index)).fetchone()
+        return row[0] if row else None
+
+
+    # Get the content chunks of the entries of the given dates, as lists of chunk records (in order) by date
+    def get_entry_chunks_from_dates(self, entry_dates):
+        self.ensure_schema()
+        entry_dates = list(entry_dates)
+        entry_chunks = {}
+        for i in range(0, len(entry_dates), MAX_QUERY_PARAMETERS):
+            dates_chunk = entry_dates[i:i+MAX_QUERY_PARAMETERS]
+            placeholders = ", ".join("?" * len(dates_chunk))
+            for entry_date, chunk_record in self.conn.execute(f'''
+            SELECT entry_date, chunk_record FROM entry_chunks WHERE entry_date IN ({placeholders}) ORDER BY entry_date, chunk_index
+            ''', dates_chunk):
+                entry_chunks.setdefault(entry_date, []).append(chunk_record)
+        return entry_chunks
+
+
+    # Get the IDs of the given attachments which are stored
+    def get_existing_attachment_ids(self, attachment_ids):
+        self.ensure_schema()
+        attachment_ids = list(attachment_ids)
+        existing_attachment_ids = set()
+        for i in range(0, len(attachment_ids), MAX_QUERY_PARAMETERS):
+            ids_chunk = attachment_ids[i:i+MAX_QUERY_PARAMETERS]
+            placeholders = ", ".join("?" * len(ids_chunk))
+            existing_attachment_ids.update(row[0] for row in self.conn.execute(f'''
+            SELECT attachment_id FROM attachments WHERE attachment_id IN ({placeholders})
+            ''', ids_chunk))
+        return existing_attachment_ids
+
+
+    # Get the encrypted data of the given attachments by their ID, as (data, preview) tuples
+    # With with_previews, only the preview is read if there is one (data is then None), otherwise preview is always None
+    def get_attachments(self, attachment_ids, with_previews=False):
+        self.ensure_schema()
+        attachment_ids = list(dict.fromkeys(attachment_ids))
+        columns = "CASE WHEN preview IS NULL THEN data END, preview" if with_previews else "data, NULL"
+        attachments = {}
+        for i in range(0, len(attachment_ids), MAX_QUERY_PARAMETERS):
+            ids_chunk = attachment_ids[i:i+MAX_QUERY_PARAMETERS]
+            placeholders = ", ".join("?" * len(ids_chunk))
+            for attachment_id, data, preview in self.conn.execute(f'''
+            SELECT attachment_id, {columns} FROM attachments WHERE attachment_id IN ({placeholders})
+            ''', ids_chunk):
+                attachments[attachment_id] = (data, preview)
+        return attachments
+
+
+    # Get the IDs of the attachments having the given preview IDs, by preview ID
+    def get_attachment_ids_from_preview_ids(self, preview_ids):
+        self.ensure_schema()
+        preview_ids = list(preview_ids)
+        attachment_ids = {}
+        for i in range(0, len(preview_ids), MAX_QUERY_PARAMETERS):
+            ids_chunk = preview_ids[i:i+MAX_QUERY_PARAMETERS]
+            placeholders = ", ".join("?" * len(ids_chunk))
+            attachment_ids.update(self.conn.execute(f'''
+            SELECT preview_id, attachment_id FROM attachments WHERE preview_id IN ({placeholders})
+            ''', ids_chunk))
+        return attachment_ids
+
+
+    # Add an attachment and its optional preview (nothing is done if it already exists)
+    def add_attachment(self, attachment_id, data, preview_id=None, preview=None):
+        self.ensure_schema()
+        self.conn.execute('''
+        INSERT OR IGNORE INTO attachments (attachment_id, data, preview_id, preview) VALUES (?, ?, ?, ?)
+        ''', (attachment_id, data, preview_id, preview))
+
+
+    # Replace the attachments used by an entry, removing the ones no other entry uses anymore
+    def update_entry_attachments(self, entry_date, attachment_ids):
+        self.ensure_schema()
+        old_attachment_ids = {row[0] for row in self.conn.execute('''
+        SELECT attachment_id FROM entry_attachments WHERE entry_date = ?
+        ''', (entry_date,))}
+        self.conn.execute('''
+        DELETE FROM entry_attachments WHERE entry_date = ?
+        ''', (entry_date,))
+        self.conn.executemany('''
+        INSERT OR IGNORE INTO entry_attachments (entry_date, attachment_id) VALUES (?, ?)
+        ''', ((entry_date, attachment_id) for attachment_id in attachment_ids))
+
+        self.conn.executemany('''
+        DELETE FROM attachments WHERE attachment_id = ? AND NOT EXISTS (SELECT 1 FROM entry_attachments WHERE attachment_id = ?)
+        ''', ((attachment_id, attachment_id) for attachment_id in old_attachment_ids - set(attachment_ids)))
+
+
+    # Copy the whole database to a new backup file with the online backup API, a few pages at a time
+    # The diary can be used by the app meanwhile (the copy restarts if it is modified by another connection)
+    # Returns the saved backup information (backup_info and the state of the change journal of the copy)
+    def write_full_backup(self, backup_filepath, backup_info, progress=None):
+        self.ensure_schema()
+        self.conn.commit()
+        backup_conn = sqlite3.connect(backup_filepath)
+        try:
+            self.conn.backup(backup_conn, pages=config.BACKUP_PAGES_PER_STEP, progress=progress)
+            backup_conn.execute("PRAGMA journal_mode = DELETE") # Single file
+            backup_info = {**backup_info, **get_journal_state(backup_conn)}
+            with backup_conn:
+                backup_conn.execute("CREATE TABLE backup_info (key TEXT PRIMARY KEY, value)")
+                backup_conn.executemany("INSERT INTO backup_info (key, value) VALUES (?, ?)", backup_info.items())
+        finally:
+            backup_conn.close()
+        return backup_info
+
+
+    # Copy the entries changed since the given journal state (and their content chunks, attachments and search index terms) to a new backup file
+    # Everything is read in a single transaction, so the copy is consistent while the app keeps writing to the diary
+    # Returns the saved backup information
+    def write_incremental_backup(self, backup_filepath, backup_info, last_state):
+        self.ensure_schema()
+        self.conn.commit()
+        self.conn.execute("ATTACH DATABASE ? AS backup", (backup_filepath,))
+        try:
+            self.conn.execute("BEGIN")
+            changed_dates = "SELECT entry_date FROM main.entry_changes WHERE change_id > :change_id"
+            parameters = {"change_id": last_state["change_id"], "attachment_db_id": last_state["attachment_db_id"]}
+            statements = [
+                "CREATE TABLE backup.entry_changes AS SELECT * FROM main.entry_changes WHERE change_id > :change_id",
+                f"CREATE TABLE backup.entries AS SELECT * FROM main.entries WHERE entry_date IN ({changed_dates})",
+                f"CREATE TABLE backup.entry_attachments AS SELECT * FROM main.entry_attachments WHERE entry_date IN ({changed_dates})",
+                f"CREATE TABLE backup.entry_chunks AS SELECT * FROM main.entry_chunks WHERE entry_date IN ({changed_dates})",
+                "CREATE TABLE backup.attachments AS SELECT * FROM main.attachments WHERE db_id > :attachment_db_id",
+                *(f"CREATE TABLE backup.{table} AS SELECT * FROM main.{table}" for table in BACKUP_WHOLE_TABLES),
+            ]
+            backup_info = {**backup_info, **get_journal_state(self.conn)}
+            # The whole search index is copied when it has been rebuilt
+            if backup_info["search_index_version"] == last_state["search_index_version"]:
+                statements.append(f"CREATE TABLE backup.search_terms AS SELECT * FROM main.search_terms WHERE entry_date IN ({changed_dates})")
+            else:
+                statements.append("CREATE TABLE backup.search_terms AS SELECT * FROM main.search_terms")
+                backup_info["has_all_search_terms"] = 1
+            for statement in statements:
+                self.conn.execute(statement, parameters)
+
+            backup_info["entries"] = self.conn.execute("SELECT COUNT(*) FROM backup.entry_changes").fetchone()[0]
+            self.conn.execute("CREATE TABLE backup.backup_info (key TEXT PRIMARY KEY, value)")
+            self.conn.executemany("INSERT INTO backup.backup_info (key, value) VALUES (?, ?)", backup_info.items())
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.execute("DETACH DATABASE backup")
+        return backup_info
+
+
+    # Replace the content of the database by the one of a full backup
+    def restore_full_backup(self, backup_filepath):
+        self.conn.commit()
+        backup_conn = sqlite3.connect(f"file:{backup_filepath}?mode=ro", uri=True)
+        try:
+            backup_conn.backup(self.conn, pages=config.BACKUP_PAGES_PER_STEP)
+        finally:
+            backup_conn.close()
+        self.conn.execute(f"PRAGMA journal_mode = {config.DB_JOURNAL_MODE}")
+        with self.conn:
+            self.conn.execute("DROP TABLE IF EXISTS backup_info")
+        self.is_schema_ready = False
+
+
+    # Apply an incremental backup to a database restored from the previous backups
+    # (the schema isn't upgraded before, the tables must have the layout they had when the backup was made)
+    def apply_incremental_backup(self, backup_filepath):
+        self.conn.commit()
+        self.conn.execute("ATTACH DATABASE ? AS backup", (backup_filepath,))
+        try:
+            self.conn.execute("BEGIN")
+            changed_dates = "SELECT entry_date FROM backup.entry_changes"
+            has_all_search_terms = self.conn.execute("SELECT 1 FROM backup.backup_info WHERE key = 'has_all_search_terms'").fetchone()
+            statements = [
+                f"DELETE FROM main.entries WHERE entry_date IN ({changed_dates})",
+                "INSERT INTO main.entries SELECT * FROM backup.entries",
+                f"DELETE FROM main.entry_attachments WHERE entry_date IN ({changed_dates})",
+                "INSERT INTO main.entry_attachments SELECT * FROM backup.entry_attachments",
+                f"DELETE FROM main.entry_chunks WHERE entry_date IN ({changed_dates})",
+                "INSERT INTO main.entry_chunks SELECT * FROM backup.entry_chunks",
+                "INSERT OR REPLACE INTO main.attachments SELECT * FROM backup.attachments",
+                "DELETE FROM main.attachments WHERE attachment_id NOT IN (SELECT attachment_id FROM main.entry_attachments)",
+                "DELETE FROM main.search_terms" if has_all_search_terms else f"DELETE FROM main.search_terms WHERE entry_date IN ({changed_dates})",
+                "INSERT INTO main.search_terms SELECT * FROM backup.search_terms",
+                *(statement for table in BACKUP_WHOLE_TABLES
+                  for statement in (f"DELETE FROM main.{table}", f"INSERT INTO main.{table} SELECT * FROM backup.{table}")),
+                # After the entries, replacing the changes journaled by the triggers while they were inserted
+                "INSERT OR REPLACE INTO main.entry_changes SELECT * FROM backup.entry_changes",
+            ]
+            for statement in statements:
+                self.conn.execute(statement)
+            self.conn.commit()
+        except sqlite3.Error:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.execute("DETACH DATABASE backup")
+
+
+    # Get the encrypted mood block of every year
+    def get_mood_blocks(self):
+        self.ensure_schema()
+        return self.conn.execute('''
+        SELECT year, data FROM mood_blocks ORDER BY year
+        ''').fetchall()
+
+
+    # Add or update the encrypted mood block of a year
+    def update_mood_block(self, year, data):
+        self.ensure_schema()
+        self.conn.execute('''
+        INSERT OR REPLACE INTO mood_blocks (year, data) VALUES (?, ?)
+        ''', (year, data))
+
+
+    # Remove every mood block
+    def clear_mood_blocks(self):
+        self.ensure_schema()
+        self.conn.execute("DELETE FROM mood_blocks")
 
 
     # Update a setting
     def update_setting(self, key, value):
-        self.cursor.execute('''
+        self.ensure_schema()
+        self.conn.execute('''
         INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)
         ''', (key, value))
 
     
+    # Remove a setting
+    def delete_setting(self, key):
+        self.ensure_schema()
+        self.conn.execute('''
+        DELETE FROM settings WHERE key = ?
+        ''', (key,))
+
+
+    # Check if a setting exists
+    def has_setting(self, key):
+        self.ensure_schema()
+        return self.conn.execute('''
+        SELECT 1 FROM settings WHERE key = ?
+        ''', (key,)).fetchone() is not None
+
+    
     # Get a specific setting
     def get_setting(self, key):
-        self.cursor.execute('''
+        self.ensure_schema()
+        return self.conn.execute('''
         SELECT * FROM settings WHERE key = ?
-        ''', (key,))
-        return self.cursor.fetchall()[0][2]
+        ''', (key,)).fetchall()[0][2]
@@ -0,0 +1,93 @@
+#    Lifelog (dialogs.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Build the objects of the Glade file only when they are needed : the main window at startup, the dialogs when they are first opened
+# The file is read once and only the requested objects are built (not the whole UI with every dialog)
+
+import html
+import re
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk
+
+from lifelog import config
+
+# Building a dialog referencing the main window would build the main window too, so the dialogs are attached to it in code
+MAIN_WINDOW_PROPERTY_REGEX = re.compile(r'\n\s*<property name="(?:transient-for|attached-to)">main_win</property>')
+# Files are found relatively to the Glade file only when it is loaded with add_from_file
+FILE_PROPERTY_REGEX = re.compile(r'(<property name="(?:icon|logo)">)')
+
+# Objects of the main window (the text buffer and the adjustment aren't its children, so they are built explicitly)
+MAIN_WINDOW_OBJECTS = ["main_win", "entry_texttagtable", "entry_textbuffer", "mood_adjustment"]
+
+# Other top-level objects used by a dialog (like the model of a tree view), built with it
+DIALOG_DEPENDENCIES = {
+    "search_dialog": ["search_liststore"],
+    "performance_dialog": ["performance_liststore"],
+}
+
+glade_xml = None
+
+# Get the content of the Glade file, read the first time
+def get_glade_xml():
+    global glade_xml
+    if glade_xml is None:
+        with open(config.GLADE_FILEPATH, encoding="utf-8") as glade_file:
+            content = MAIN_WINDOW_PROPERTY_REGEX.sub("", glade_file.read())
+        glade_xml = FILE_PROPERTY_REGEX.sub(lambda match: match.group(1) + html.escape(config.RES_DIRECTORY + "/"), content)
+    return glade_xml
+
+
+# Build some objects of the Glade file (with their children) in a new builder
+def build_objects(object_ids):
+    builder = Gtk.Builder()
+    builder.add_objects_from_string(get_glade_xml(), object_ids)
+    return builder
+
+
+class DialogFactory:
+    # Dialogs are made transient for parent_window and their signals are connected to handlers
+    def __init__(self, parent_window, handlers):
+        self.parent_window = parent_window
+        self.handlers = handlers
+        self.builders = {}
+
+
+    # Get the builder of a dialog, building the dialog the first time
+    def get_builder(self, dialog_id):
+        builder = self.builders.get(dialog_id)
+        if builder is not None:
+            return builder
+
+        builder = build_objects([dialog_id] + DIALOG_DEPENDENCIES.get(dialog_id, []))
+        builder.connect_signals(self.handlers)
+        dialog = builder.get_object(dialog_id)
+        dialog.set_transient_for(self.parent_window)
+        dialog.connect("delete-event", lambda widget, event: widget.hide_on_delete()) # Hidden instead of destroyed when closed
+        self.builders[dialog_id] = builder
+        return builder
+
+
+    # Get a dialog, to be hidden (not destroyed) once closed
+    def get_dialog(self, dialog_id):
+        return self.get_builder(dialog_id).get_object(dialog_id)
+
+
+    # Get an object of a dialog
+    def get_object(self, dialog_id, object_id):
+        return self.get_builder(dialog_id).get_object(object_id)
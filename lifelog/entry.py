@@ -0,0 +1,26 @@
+#    Lifelog (entry.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+
+# Decrypted entry, kept apart from the record format so that it can be used without loading the encryption
+
+from collections import namedtuple
+
+# Decrypted entry, the content being the serialized Gtk.TextBuffer
+Entry = namedtuple("Entry", ["title", "tags", "mood", "content"])
+DEFAULT_ENTRY_MOOD = 50
+EMPTY_ENTRY = Entry("", "", DEFAULT_ENTRY_MOOD, b"")
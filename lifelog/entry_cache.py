@@ -0,0 +1,106 @@
+#    Lifelog (entry_cache.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+from collections import OrderedDict
+
+# Rough memory used by an entry besides its fields (tuple, strings and dict slot)
+ENTRY_OVERHEAD_BYTES = 256
+
+class EntryCache:
+    # Initialize an empty cache holding at most max_bytes of decrypted entries
+    def __init__(self, max_bytes:int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # entry_date -> (entry, size), least recently used first
+        self.total_bytes = 0
+
+        # Statistics
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+    # Get an entry by its date, or None if it isn't cached
+    def get(self, entry_date):
+        cached = self.entries.get(entry_date)
+        if cached is None:
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(entry_date)
+        self.hits += 1
+        return cached[0]
+
+
+    # Add an entry, evicting the least recently used ones if the cache is full
+    def put(self, entry_date, entry):
+        self.invalidate(entry_date)
+
+        size = ENTRY_OVERHEAD_BYTES + len(entry.title) + len(entry.tags) + len(entry.content)
+        if size > self.max_bytes:
+            return
+
+        self.entries[entry_date] = (entry, size)
+        self.total_bytes += size
+
+        while self.total_bytes > self.max_bytes:
+            oldest_date = next(iter(self.entries))
+            self.invalidate(oldest_date)
+            self.evictions += 1
+
+
+    # Remove an entry from the cache without wiping it and return it, or None if it isn't cached
+    def pop(self, entry_date):
+        cached = self.entries.pop(entry_date, None)
+        if cached is None:
+            return None
+        self.total_bytes -= cached[1]
+        return cached[0]
+
+
+    # Remove an entry from the cache
+    def invalidate(self, entry_date):
+        cached = self.entries.pop(entry_date, None)
+        if cached is None:
+            return
+        self.total_bytes -= cached[1]
+        wipe_entry(cached[0])
+
+
+    # Remove every entry and overwrite the decrypted content still held by the cache
+    def clear(self):
+        for entry, _ in self.entries.values():
+            wipe_entry(entry)
+        self.entries.clear()
+        self.total_bytes = 0
+
+
+    # Get the cache statistics
+    def get_stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Overwrite the decrypted content of an entry with zeros (only possible for mutable buffers)
+def wipe_entry(entry):
+    if isinstance(entry.content, bytearray):
+        entry.content[:] = bytes(len(entry.content))
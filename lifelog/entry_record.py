@@ -0,0 +1,159 @@
+#    Lifelog (entry_record.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import os
+import struct
+from collections import namedtuple
+
+from lifelog import compression
+from lifelog import crypto_utils
+from lifelog.entry import Entry, DEFAULT_ENTRY_MOOD
+
+# Row formats (entries.entry_format)
+#   1 : title, tags, mood and content encrypted separately with AES-CBC in their own columns
+#   2 : every field packed in a single AES-GCM record stored in entry_content
+#       (with the first chunk of the content, the next ones being records of their own in the entry_chunks table)
+ENTRY_FORMAT_LEGACY = 1
+ENTRY_FORMAT_RECORD = 2
+
+# Record fields, each stored as its ID (1 byte), its length (4 bytes) and its data (unknown IDs are skipped)
+FIELD_TITLE = 1
+FIELD_TAGS = 2
+FIELD_MOOD = 3
+FIELD_CONTENT = 4
+FIELD_CONTENT_CODEC = 5 # Compression codec of the content (none if missing)
+FIELD_ATTACHMENTS = 6 # IDs of the images of the content, stored as attachments
+FIELD_CONTENT_ID = 7 # Random ID of the content, binding its next chunks to this version of the entry (missing if there are none)
+FIELD_CHUNKS_COUNT = 8 # Number of chunks of the content after the first one (none if missing)
+ATTACHMENT_ID_SIZE = 32
+CONTENT_ID_SIZE = 16
+FIELD_HEADER = struct.Struct(">BI")
+CHUNKS_COUNT = struct.Struct(">I")
+CHUNK_INDEX = struct.Struct(">I")
+
+# Decrypted record of an entry : the entry (its content being the first chunk), the IDs of the attachments of this chunk,
+# and the content ID and the number of the next chunks (read with RecordCipher.unpack_chunk)
+EntryRecord = namedtuple("EntryRecord", ["entry", "attachment_ids", "content_id", "chunks_count"])
+
+class RecordCipher:
+    # Initialize the cipher with its own subkey derived from the AES key of the diary
+    def __init__(self, aes_key):
+        self.key = crypto_utils.derive_subkey(aes_key, b"lifelog entry record")
+
+
+    # Serialize and encrypt an entry, the record being bound to its date
+    # The content (the first chunk if there are more) is compressed first, as encrypted data can't be
+    def pack(self, entry_date, entry, attachment_ids=(), content_id=b"", chunks_count=0):
+        fields = [
+            (FIELD_TITLE, entry.title.encode("utf-8")),
+            (FIELD_TAGS, entry.tags.encode("utf-8")),
+            (FIELD_MOOD, bytes([int(entry.mood)])),
+            *self.get_content_fields(entry.content, attachment_ids),
+        ]
+        if chunks_count:
+            fields += [(FIELD_CONTENT_ID, content_id), (FIELD_CHUNKS_COUNT, CHUNKS_COUNT.pack(chunks_count))]
+        return crypto_utils.encrypt_gcm(self.key, self.join_fields(fields), self.get_associated_data(entry_date))
+
+
+    # Decrypt and deserialize a record (raises ValueError if it has been modified or moved to another date)
+    # Returns an EntryRecord
+    # Without with_content, the content is left empty
+    def unpack(self, entry_date, record, with_content=True):
+        fields = self.split_fields(crypto_utils.decrypt_gcm(self.key, record, self.get_associated_data(entry_date)))
+        entry_content, attachment_ids = self.read_content_fields(fields, with_content)
+        entry = Entry(bytes(fields.get(FIELD_TITLE, b"")).decode("utf-8"),
+                      bytes(fields.get(FIELD_TAGS, b"")).decode("utf-8"),
+                      fields[FIELD_MOOD][0] if FIELD_MOOD in fields else DEFAULT_ENTRY_MOOD,
+                      entry_content)
+        chunks_count = CHUNKS_COUNT.unpack(fields[FIELD_CHUNKS_COUNT])[0] if FIELD_CHUNKS_COUNT in fields else 0
+        return EntryRecord(entry, attachment_ids, bytes(fields.get(FIELD_CONTENT_ID, b"")), chunks_count)
+
+
+    # Serialize and encrypt a chunk of a content after the first one (chunk_index starting at 1),
+    # the record being bound to its date, the content ID and its index
+    def pack_chunk(self, entry_date, content_id, chunk_index, chunk_content, attachment_ids=()):
+        fields = self.get_content_fields(chunk_content, attachment_ids)
+        return crypto_utils.encrypt_gcm(self.key, self.join_fields(fields), self.get_chunk_associated_data(entry_date, content_id, chunk_index))
+
+
+    # Decrypt and deserialize a chunk record (raises ValueError if it has been modified, moved or belongs to another version of the entry)
+    # Returns the chunk and the IDs of its attachments
+    def unpack_chunk(self, entry_date, content_id, chunk_index, record):
+        fields = self.split_fields(crypto_utils.decrypt_gcm(self.key, record, self.get_chunk_associated_data(entry_date, content_id, chunk_index)))
+        return self.read_content_fields(fields)
+
+
+    # Get a new random content ID
+    @staticmethod
+    def make_content_id():
+        return os.urandom(CONTENT_ID_SIZE)
+
+
+    # Get the fields of a content (or a chunk of it) and its attachments
+    @staticmethod
+    def get_content_fields(content, attachment_ids):
+        content_codec, compressed_content = compression.compress(bytes(content))
+        return [
+            (FIELD_CONTENT_CODEC, bytes([content_codec])),
+            (FIELD_CONTENT, compressed_content),
+            (FIELD_ATTACHMENTS, b"".join(attachment_ids)),
+        ]
+
+
+    # Get the decompressed content (empty without with_content) and the IDs of the attachments from the fields of a record
+    @staticmethod
+    def read_content_fields(fields, with_content=True):
+        content = b""
+        if with_content and FIELD_CONTENT in fields:
+            content_codec = fields[FIELD_CONTENT_CODEC][0] if FIELD_CONTENT_CODEC in fields else compression.CODEC_NONE
+            content = bytearray(compression.decompress(content_codec, fields[FIELD_CONTENT]))
+
+        attachments_field = bytes(fields.get(FIELD_ATTACHMENTS, b""))
+        attachment_ids = [attachments_field[i:i+ATTACHMENT_ID_SIZE] for i in range(0, len(attachments_field), ATTACHMENT_ID_SIZE)]
+        return content, attachment_ids
+
+
+    # Serialize (field ID, data) tuples
+    @staticmethod
+    def join_fields(fields):
+        return b"".join(FIELD_HEADER.pack(field_id, len(data)) + data for field_id, data in fields)
+
+
+    # Deserialize the fields of a decrypted record, by ID
+    @staticmethod
+    def split_fields(raw_record):
+        raw_record = memoryview(raw_record)
+        fields = {}
+        position = 0
+        while position < len(raw_record):
+            field_id, length = FIELD_HEADER.unpack_from(raw_record, position)
+            position += FIELD_HEADER.size
+            fields[field_id] = raw_record[position:position+length]
+            position += length
+        return fields
+
+
+    # Authenticated data of a record : its format and its date
+    @staticmethod
+    def get_associated_data(entry_date):
+        return bytes([ENTRY_FORMAT_RECORD]) + entry_date.encode("ascii")
+
+
+    # Authenticated data of a chunk record : the one of the record, the content ID and the index of the chunk
+    @staticmethod
+    def get_chunk_associated_data(entry_date, content_id, chunk_index):
+        return RecordCipher.get_associated_data(entry_date) + content_id + CHUNK_INDEX.pack(chunk_index)
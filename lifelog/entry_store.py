@@ -0,0 +1,324 @@
+#    Lifelog (entry_store.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+from collections import namedtuple
+from contextlib import contextmanager
+
+from lifelog import config
+from lifelog.attachment_store import AttachmentStore, split_content, join_content
+from lifelog.content_chunks import split_chunks
+from lifelog.date_masks import DateMasks
+from lifelog.entry_cache import EntryCache
+from lifelog.entry import Entry, DEFAULT_ENTRY_MOOD, EMPTY_ENTRY
+from lifelog.entry_record import ENTRY_FORMAT_LEGACY, RecordCipher
+from lifelog.search_index import SearchIndex
+from lifelog.mood_store import MoodStore
+
+# Beginning of an entry given by load_entry_preview : the entry (its content being the first chunk), whether it has previews,
+# and the content ID and the number of the chunks still to be read with load_entry_chunk
+EntryPreview = namedtuple("EntryPreview", ["entry", "has_previews", "content_id", "chunks_count"])
+
+class EntryStore:
+    # Initialize the store for an opened diary and its AES cipher
+    def __init__(self, db, aes_cipher):
+        self.db = db
+        self.aes_cipher = aes_cipher
+        self.record_cipher = RecordCipher(aes_cipher.key)
+        self.attachment_store = AttachmentStore(db, aes_cipher.key)
+        self.cache = EntryCache(config.ENTRY_CACHE_MAX_BYTES)
+        self.prefetch_cache = EntryCache(config.PREFETCH_MAX_BYTES) # Entries read ahead, moved to the cache once displayed
+        self.search_index = SearchIndex(db, aes_cipher.key)
+        self.mood_store = MoodStore(db, aes_cipher)
+        self.date_masks = DateMasks(db)
+        self.damaged_dates = set() # Dates whose entry couldn't be decrypted, not saved over until it is read again (see save_entries)
+
+
+    # Get the decrypted entry for a date (EMPTY_ENTRY if there is none)
+    def load_entry(self, entry_date):
+        entry = self.get_cached_entry(entry_date)
+        if entry is not None:
+            return entry
+
+        entry = self.read_entry(entry_date)
+        self.cache.put(entry_date, entry)
+        return entry
+
+
+    # Decrypt the entry for a date ahead of its display, unless it is already cached
+    def prefetch_entry(self, entry_date):
+        if entry_date not in self.cache.entries and entry_date not in self.prefetch_cache.entries:
+            self.prefetch_cache.put(entry_date, self.read_entry(entry_date))
+
+
+    # Get a cached entry (a prefetched entry is moved to the cache), or None if it isn't cached
+    def get_cached_entry(self, entry_date):
+        entry = self.cache.get(entry_date)
+        if entry is None:
+            entry = self.prefetch_cache.pop(entry_date)
+            if entry is not None:
+                self.cache.put(entry_date, entry)
+        return entry
+
+
+    # Read and decrypt the entry for a date from the database (EMPTY_ENTRY if there is none)
+    def read_entry(self, entry_date):
+        row = self.db.get_entry_from_date(entry_date)
+        if not row:
+            return EMPTY_ENTRY
+        with self.check_damaged(entry_date):
+            return self.decrypt_entry_row(row)
+
+
+    # Get the beginning of the decrypted entry for a date, faster to load and display : only the first chunk of its content is read,
+    # with the previews of its large images instead of the images
+    # Returns an EntryPreview (the complete entry is given by load_entry if it has previews or more chunks)
+    def load_entry_preview(self, entry_date):
+        entry = self.get_cached_entry(entry_date)
+        if entry is not None:
+            return EntryPreview(entry, False, b"", 0)
+
+        row = self.db.get_entry_from_date(entry_date)
+        if not row or row[6] == ENTRY_FORMAT_LEGACY:
+            return EntryPreview(self.load_entry(entry_date), False, b"", 0)
+
+        with self.check_damaged(entry_date):
+            entry, attachment_ids, content_id, chunks_count = self.record_cipher.unpack(row[1], row[5])
+            attachments, previews_count = self.attachment_store.load_previews(attachment_ids)
+        entry = entry._replace(content=bytearray(join_content(entry.content, attachments)))
+        if not previews_count and not chunks_count:
+            self.cache.put(entry_date, entry)
+        return EntryPreview(entry, previews_count > 0, content_id, chunks_count)
+
+
+    # Get a chunk of the content of an entry after the first one (chunk_index starting at 1), with the previews of its large images
+    # Returns the chunk and whether it has previews
+    # Raises ValueError if the chunk is missing or has been modified (or the entry saved again since content_id was read)
+    def load_entry_chunk(self, entry_date, content_id, chunk_index):
+        chunk_record = self.db.get_entry_chunk(entry_date, chunk_index)
+        with self.check_damaged(entry_date):
+            if chunk_record is None:
+                raise ValueError("Missing content chunk")
+            chunk_content, attachment_ids = self.record_cipher.unpack_chunk(entry_date, content_id, chunk_index, chunk_record)
+            attachments, previews_count = self.attachment_store.load_previews(attachment_ids)
+        return join_content(chunk_content, attachments), previews_count > 0
+
+
+    # Remember a date as damaged if decrypting its entry raises ValueError, or as readable again otherwise
+    @contextmanager
+    def check_damaged(self, entry_date):
+        try:
+            yield
+        except ValueError:
+            self.damaged_dates.add(entry_date)
+            raise
+        self.damaged_dates.discard(entry_date)
+
+
+    # Decrypt the title, tags, mood and content of a database row
+    # Raises ValueError if its record has been modified
+    def decrypt_entry_row(self, row):
+        return self.decrypt_entry_rows([row])[0]
+
+
+    # Decrypt the title, tags and mood of a database row (the content is left empty)
+    def decrypt_entry_summary_row(self, row):
+        return self.decrypt_entry_summary_rows([row])[0]
+
+
+    # Decrypt the title, tags and mood of many database rows at once, in parallel for large batches
+    def decrypt_entry_summary_rows(self, rows):
+        return self.decrypt_entry_rows(rows, with_content=False)
+
+
+    # Same as decrypt_entry_summary_rows, but the rows which can't be decrypted give None (their dates are added to damaged_dates)
+    def decrypt_readable_summary_rows(self, rows):
+        try:
+            return self.decrypt_entry_summary_rows(rows)
+        except ValueError:
+            pass
+
+        entry_summaries = []
+        for row in rows:
+            try:
+                with self.check_damaged(row[1]):
+                    entry_summaries.append(self.decrypt_entry_summary_row(row))
+            except ValueError:
+                entry_summaries.append(None)
+        return entry_summaries
+
+
+    # Decrypt many database rows of any format at once, in parallel for large batches
+    # Without with_content, the content is left empty
+    def decrypt_entry_rows(self, rows, with_content=True):
+        entries = [None] * len(rows)
+
+        # Old rows : every field has been encrypted separately
+        legacy_rows = [(i, row) for i, row in enumerate(rows) if row[6] == ENTRY_FORMAT_LEGACY]
+        fields_count = 4 if with_content else 3
+        decrypted_values = self.aes_cipher.decrypt_many(encrypted_value for i, row in legacy_rows for encrypted_value in row[2:2+fields_count])
+        for j, (i, row) in enumerate(legacy_rows):
+            entry_title, entry_tags, entry_mood = decrypted_values[j*fields_count:j*fields_count+3]
+            entry_content = bytearray(decrypted_values[j*fields_count+3]) if with_content else b""
+            entries[i] = Entry(entry_title.decode("utf-8"), entry_tags.decode("utf-8"),
+                               int(entry_mood.decode("utf-8") or DEFAULT_ENTRY_MOOD), entry_content)
+
+        # New rows : a single record (the whole record is always decrypted, as its tag covers the first chunk of the content too)
+        record_rows = [(i, row) for i, row in enumerate(rows) if row[6] != ENTRY_FORMAT_LEGACY]
+        entry_records = self.aes_cipher.map_parallel(lambda row: self.record_cipher.unpack(row[1], row[5], with_content), (row for i, row in record_rows))
+
+        # The next chunks of the content, each in its own record
+        chunked_entries = [(row[1], entry_record) for (i, row), entry_record in zip(record_rows, entry_records) if with_content and entry_record.chunks_count]
+        chunk_records = self.db.get_entry_chunks_from_dates(entry_date for entry_date, entry_record in chunked_entries)
+        chunk_arguments = []
+        for entry_date, entry_record in chunked_entries:
+            if len(chunk_records.get(entry_date, ())) != entry_record.chunks_count:
+                raise ValueError("Missing content chunk")
+            chunk_arguments += [(entry_date, entry_record.content_id, chunk_index, chunk_record)
+                                for chunk_index, chunk_record in enumerate(chunk_records[entry_date], 1)]
+        unpacked_chunks = iter(self.aes_cipher.map_parallel(lambda arguments: self.record_cipher.unpack_chunk(*arguments), chunk_arguments))
+
+        for (i, row), entry_record in zip(record_rows, entry_records):
+            entry = entry_record.entry
+            if with_content:
+                chunks = [(entry.content, entry_record.attachment_ids)] + [next(unpacked_chunks) for _ in range(entry_record.chunks_count)]
+                entry = entry._replace(content=self.join_chunks(chunks))
+            entries[i] = entry
+
+        return entries
+
+
+    # Rebuild a content from its chunks given as (chunk, attachment_ids) tuples, the images being loaded in a single query
+    def join_chunks(self, chunks):
+        if len(chunks) == 1 and not chunks[0][1]:
+            return chunks[0][0]
+        images = self.attachment_store.load([attachment_id for chunk, attachment_ids in chunks for attachment_id in attachment_ids])
+        content = bytearray()
+        position = 0
+        for chunk, attachment_ids in chunks:
+            content += join_content(chunk, images[position:position+len(attachment_ids)])
+            position += len(attachment_ids)
+        return content
+
+
+    # Rewrite the entries still using the old format as records, in batches each saved in its own transaction
+    # (reading an entry never writes it : the old rows are otherwise only rewritten when they are saved)
+    # progress_callback is called after each batch with the number of upgraded entries
+    def upgrade_legacy_entries(self, batch_size=None, progress_callback=None):
+        batch_size = batch_size or config.KEY_MIGRATION_BATCH_SIZE
+        upgraded_entries = 0
+        last_db_id = 0
+        while True:
+            rows = self.db.get_legacy_entries_after_id(last_db_id, batch_size)
+            if not rows:
+                break
+            try:
+                entry_records = self.encode_entries((row[1], entry) for row, entry in zip(rows, self.decrypt_entry_rows(rows)))
+                self.db.update_entry_records((entry_record, row[0]) for row, entry_record in zip(rows, entry_records))
+                self.db.commit()
+            except BaseException:
+                self.db.rollback()
+                raise
+
+            upgraded_entries += len(rows)
+            last_db_id = rows[-1][0]
+            if progress_callback:
+                progress_callback(upgraded_entries)
+        return upgraded_entries
+
+
+    # Get the mask of the days having an entry in a month (bit 0 being the first day)
+    def get_month_mask(self, year, month):
+        return self.date_masks.get_month_mask(year, month)
+
+
+    # Build the search index and the mood store of a diary created before they existed
+    # The entries which can't be decrypted are left out (their dates are added to damaged_dates)
+    def ensure_indexes_built(self):
+        if not self.search_index.is_built():
+            self.search_index.rebuild(self.decrypt_readable_summary_rows, config.INDEX_REBUILD_BATCH_SIZE)
+        if not self.mood_store.is_built():
+            self.mood_store.rebuild(self.decrypt_readable_summary_rows, config.INDEX_REBUILD_BATCH_SIZE)
+
+
+    # Get the mood statistics (count, average, min, max, histogram) of each month between two dates
+    def get_mood_stats(self, from_date, to_date):
+        self.ensure_indexes_built()
+        return self.mood_store.get_monthly_stats(from_date, to_date)
+
+
+    # Store the images of entries given as (entry_date, entry) tuples as attachments and encrypt the rest as records,
+    # the first chunk of the content in the record of the entry and the next ones in chunk records, saved with the attachments
+    # The images already stored (unchanged or used by another entry) aren't encrypted or written again
+    def encode_entries(self, dated_entries):
+        dated_entries = list(dated_entries)
+        packing_arguments = []
+        chunk_packing_arguments = []
+        chunk_positions = {} # Date -> positions of the arguments of its chunks (an entry given twice is saved as given last)
+        for entry_date, entry in dated_entries:
+            chunks = []
+            for chunk in split_chunks(entry.content):
+                text_content, images = split_content(chunk)
+                chunks.append((text_content, self.attachment_store.store(images)))
+            self.db.update_entry_attachments(entry_date, [attachment_id for text_content, attachment_ids in chunks for attachment_id in attachment_ids])
+
+            content_id = self.record_cipher.make_content_id() if len(chunks) > 1 else b""
+            (text_content, attachment_ids), *next_chunks = chunks
+            packing_arguments.append((entry_date, entry._replace(content=text_content), attachment_ids, content_id, len(next_chunks)))
+            chunk_positions[entry_date] = range(len(chunk_packing_arguments), len(chunk_packing_arguments) + len(next_chunks))
+            chunk_packing_arguments += [(entry_date, content_id, chunk_index, text_content, attachment_ids)
+                                        for chunk_index, (text_content, attachment_ids) in enumerate(next_chunks, 1)]
+
+        chunk_records = self.aes_cipher.map_parallel(lambda arguments: self.record_cipher.pack_chunk(*arguments), chunk_packing_arguments)
+        self.db.update_entry_chunks_from_dates((entry_date, [chunk_records[position] for position in positions]) for entry_date, positions in chunk_positions.items())
+        return self.aes_cipher.map_parallel(lambda arguments: self.record_cipher.pack(*arguments), packing_arguments)
+
+
+    # Encrypt and save an entry as a single record, then drop its outdated cached version
+    def save_entry(self, entry_date, entry_title, entry_tags, entry_mood, entry_content):
+        self.save_entries([(entry_date, Entry(entry_title, entry_tags, entry_mood, entry_content))])
+
+
+    # Encrypt (in parallel for large batches) and save many entries given as (entry_date, entry) tuples in a single transaction
+    # If anything fails, none of them is saved
+    # Raises ValueError if the entry of one of the dates couldn't be decrypted when it was last read (it would be lost)
+    def save_entries(self, dated_entries):
+        dated_entries = list(dated_entries)
+        damaged_dates = self.damaged_dates.intersection(entry_date for entry_date, entry in dated_entries)
+        if damaged_dates:
+            raise ValueError(f"The entry for {min(damaged_dates)} is damaged and can't be saved over")
+        try:
+            entry_records = self.encode_entries(dated_entries)
+            self.db.update_entry_records_from_dates((entry_date, entry_record) for (entry_date, entry), entry_record in zip(dated_entries, entry_records))
+            self.db.update_search_terms_from_dates((entry_date, self.search_index.get_entry_terms(entry.title, entry.tags)) for entry_date, entry in dated_entries)
+            self.mood_store.set_moods((entry_date, entry.mood) for entry_date, entry in dated_entries)
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            self.mood_store.close() # The decrypted blocks are reloaded from the database
+            raise
+
+        for entry_date, entry in dated_entries:
+            self.cache.invalidate(entry_date)
+            self.prefetch_cache.invalidate(entry_date)
+            self.date_masks.add_date(entry_date)
+
+
+    # Wipe the decrypted entries from memory (when the diary is closed or switched)
+    def close(self):
+        self.cache.clear()
+        self.prefetch_cache.clear()
+        self.mood_store.close()
@@ -0,0 +1,273 @@
+#    Lifelog (exporter.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Export the entries of a diary without opening them in the app, streaming them in batches
+# Usage : lifelog export DIARY_FILE OUTPUT --format jsonl|markdown|html|archive [--from DATE] [--to DATE] [--resume]
+
+import argparse
+import html
+import json
+import os
+import sys
+import time
+
+from lifelog import archive
+from lifelog import config
+from lifelog import crypto_utils
+from lifelog import db_handler
+from lifelog import entry_store
+from lifelog import key_manager
+from lifelog import rich_text
+
+# Written next to the output while exporting, to resume an interrupted export
+STATE_FILE_SUFFIX = ".export-state"
+
+HTML_HEADER = '''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Lifelog</title>
+<style>
+body { max-width: 50em; margin: auto; font-family: sans-serif; }
+article { border-bottom: 1px solid #ccc; padding: 1em 0; }
+.meta { color: #666; }
+img { max-width: 100%; }
+</style>
+</head>
+<body>
+'''
+HTML_FOOTER = '''</body>
+</html>
+'''
+
+class FileWriter:
+    # Create the output file, or reopen an interrupted one at the end of the last written batch (given by get_state)
+    def __init__(self, output_filepath, state=None):
+        if state is None:
+            self.file = open(output_filepath, "wb")
+            self.write_header()
+        else:
+            self.file = open(output_filepath, "r+b")
+            self.file.truncate(state["offset"])
+            self.file.seek(state["offset"])
+
+
+    def write_header(self):
+        pass
+
+
+    # Write entries given as (entry_date, entry) tuples
+    def write_entries(self, dated_entries):
+        self.file.write("".join(self.format_entry(entry_date, entry) for entry_date, entry in dated_entries).encode("utf-8"))
+
+
+    # Get what is needed to resume writing after the last written batch
+    def get_state(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {"offset": self.file.tell()}
+
+
+    # Number of bytes written
+    def tell(self):
+        return self.file.tell()
+
+
+    def close(self):
+        self.file.close()
+
+
+class JsonlWriter(FileWriter):
+    # One JSON object per line (the text without its formatting and images), as read by lifelog import
+    def format_entry(self, entry_date, entry):
+        return json.dumps({"date": entry_date, "title": entry.title, "tags": entry.tags, "mood": entry.mood,
+                           "text": rich_text.to_plain_text(entry.content)}, ensure_ascii=False) + "\n"
+
+
+class HtmlWriter(FileWriter):
+    # A single page, with the images embedded
+    def write_header(self):
+        self.file.write(HTML_HEADER.encode("utf-8"))
+
+
+    def format_entry(self, entry_date, entry):
+        heading = html.escape(f"{entry_date} - {entry.title}" if entry.title else entry_date)
+        return (f'<article>\n<h2>{heading}</h2>\n<p class="meta">Tags : {html.escape(entry.tags)} | Mood : {entry.mood}</p>\n'
+                f'<div>{rich_text.to_html(entry.content)}</div>\n</article>\n')
+
+
+    def close(self):
+        self.file.write(HTML_FOOTER.encode("utf-8"))
+        self.file.close()
+
+
+class MarkdownWriter:
+    # A Markdown file per entry, as read by lifelog import, and a PNG file per image
+    def __init__(self, output_folder, state=None):
+        self.output_folder = output_folder
+        self.written_bytes = state["written_bytes"] if state else 0
+        os.makedirs(output_folder, exist_ok=True)
+
+
+    def write_entries(self, dated_entries):
+        for entry_date, entry in dated_entries:
+            # Written again if the export is resumed
+            def write_image(image_index, image, entry_date=entry_date):
+                png_image = rich_text.pixdata_to_png(image)
+                if png_image is None:
+                    return ""
+                image_filename = f"{entry_date}-{image_index + 1}.png"
+                self.write_file(image_filename, png_image)
+                return f"![]({image_filename})"
+
+            front_matter = f"---\ntitle: {' '.join(entry.title.split())}\ntags: {' '.join(entry.tags.split())}\nmood: {entry.mood}\n---\n"
+            self.write_file(f"{entry_date}.md", (front_matter + rich_text.to_markdown(entry.content, write_image) + "\n").encode("utf-8"))
+
+
+    def write_file(self, filename, data):
+        with open(os.path.join(self.output_folder, filename), "wb") as output_file:
+            output_file.write(data)
+        self.written_bytes += len(data)
+
+
+    def get_state(self):
+        return {"written_bytes": self.written_bytes}
+
+
+    def tell(self):
+        return self.written_bytes
+
+
+    def close(self):
+        pass
+
+
+WRITERS = {"jsonl": JsonlWriter, "markdown": MarkdownWriter, "html": HtmlWriter, "archive": archive.ArchiveWriter}
+
+# Create the writer of an export format (the archives need a password), resuming from its state if given
+def make_writer(export_format, output_path, state=None, archive_password=None):
+    if export_format == "archive":
+        if archive_password is None:
+            raise ValueError("An archive password is needed")
+        return archive.ArchiveWriter(output_path, archive_password, state)
+    return WRITERS[export_format](output_path, state)
+
+
+# Decrypt the entries between two dates (after after_date) in batches and write them, only one batch being in memory at a time
+# on_batch_written is called after each batch with the date of its last entry and the number of entries in the batch
+def export_entries(store, writer, from_date, to_date, batch_size=None, after_date="", on_batch_written=None):
+    batch_size = batch_size or config.EXPORT_BATCH_SIZE
+    for rows in store.db.iter_entries_between(from_date, to_date, batch_size, after_date):
+        entries = store.decrypt_entry_rows(rows)
+        writer.write_entries((row[1], entry) for row, entry in zip(rows, entries))
+        if on_batch_written:
+            on_batch_written(rows[-1][1], len(rows))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="lifelog export", description="Export the entries of a diary (close the diary in Lifelog first). "
+                                                                         "The archive format keeps everything and is encrypted with its own password, "
+                                                                         "it can be imported with lifelog import. The passwords are read from "
+                                                                         "LIFELOG_PASSWORD and LIFELOG_ARCHIVE_PASSWORD if set")
+    parser.add_argument("diary", help="diary file to export")
+    parser.add_argument("output", help="output file (or folder for markdown)")
+    parser.add_argument("--format", choices=sorted(WRITERS), required=True, help="output format")
+    parser.add_argument("--from", dest="from_date", default="0000-00-00", help="first date exported (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="to_date", default="9999-99-99", help="last date exported (YYYY-MM-DD)")
+    parser.add_argument("--batch-size", type=int, default=config.EXPORT_BATCH_SIZE, help="entries decrypted and written at once")
+    parser.add_argument("--resume", action="store_true", help="resume an interrupted export")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.diary):
+        sys.exit(f"No such file : {args.diary}")
+
+    state_filepath = args.output.rstrip(os.sep) + STATE_FILE_SUFFIX
+    state = None
+    if args.resume:
+        if not os.path.isfile(state_filepath):
+            sys.exit(f"Nothing to resume : {state_filepath} doesn't exist")
+        with open(state_filepath, encoding="utf-8") as state_file:
+            state = json.load(state_file)
+        if (state["format"], state["from_date"], state["to_date"]) != (args.format, args.from_date, args.to_date):
+            sys.exit("The format and dates must be the same as the ones of the interrupted export")
+    elif os.path.exists(args.output):
+        sys.exit(f"The output already exists : {args.output} (use --resume to resume an interrupted export)")
+
+    from lifelog import cli # Not imported with the module, as lifelog-cli uses it through lifelog.core
+
+    db = db_handler.DbHandler(args.diary)
+    try:
+        aes_key = key_manager.unlock(db, cli.get_password().encode("utf-8"))
+        if aes_key is None:
+            sys.exit("Wrong password!")
+        store = entry_store.EntryStore(db, crypto_utils.AESCipher(aes_key))
+
+        writer_state = state["writer"] if state else None
+        if args.format == "archive":
+            try:
+                archive_password = (cli.get_password if args.resume else cli.get_new_password)("Archive password : ", cli.ARCHIVE_PASSWORD_ENVIRONMENT_VARIABLE).encode("utf-8")
+            except ValueError as exception:
+                sys.exit(str(exception))
+        else:
+            archive_password = None
+        writer = make_writer(args.format, args.output, writer_state, archive_password)
+
+        total_entries = db.count_entries_between(args.from_date, args.to_date)
+        exported_entries = state["exported_entries"] if state else 0
+        start_time = time.perf_counter()
+        start_bytes = writer.tell()
+        export_state = {"format": args.format, "from_date": args.from_date, "to_date": args.to_date,
+                        "last_date": state["last_date"] if state else "", "exported_entries": exported_entries}
+
+        # Save the progress after each batch, so that an interrupted export can be resumed
+        def save_export_state():
+            export_state["writer"] = writer.get_state()
+            with open(state_filepath + ".tmp", "w", encoding="utf-8") as state_file:
+                json.dump(export_state, state_file)
+            os.replace(state_filepath + ".tmp", state_filepath)
+
+        # Also before the first batch, as the output exists already
+        if not args.resume:
+            save_export_state()
+
+        def on_batch_written(last_date, batch_entries):
+            export_state["last_date"] = last_date
+            export_state["exported_entries"] += batch_entries
+            save_export_state()
+
+            elapsed_seconds = max(time.perf_counter() - start_time, 1e-9)
+            print(f"\r{export_state['exported_entries']}/{total_entries} entries exported "
+                  f"({(writer.tell() - start_bytes) / 1024**2 / elapsed_seconds:.1f} MiB/s)", end="", file=sys.stderr)
+
+        try:
+            export_entries(store, writer, args.from_date, args.to_date, args.batch_size, export_state["last_date"], on_batch_written)
+            writer.close()
+        finally:
+            store.close()
+        if os.path.exists(state_filepath):
+            os.remove(state_filepath)
+
+        elapsed_seconds = max(time.perf_counter() - start_time, 1e-9)
+        exported_now = export_state["exported_entries"] - exported_entries
+        print(f"\n{exported_now} entries exported in {elapsed_seconds:.1f} s ({exported_now / elapsed_seconds:.0f} entries/s, "
+              f"{(writer.tell() if args.format == 'markdown' else os.path.getsize(args.output)) / 1024**2:.1f} MiB written).", file=sys.stderr)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+#    Lifelog (image_ingest.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import gi
+gi.require_version('GdkPixbuf', '2.0')
+from gi.repository import GdkPixbuf
+
+from lifelog import config
+
+# Decode an image file for its insertion in an entry (can run outside of the main loop)
+# Large images are decoded directly at a smaller size, which is much faster and lighter than scaling them afterwards
+def load_image(image_filepath, max_size=None):
+    max_size = max_size or config.IMAGE_MAX_SIZE
+    image_format, width, height = GdkPixbuf.Pixbuf.get_file_info(image_filepath)
+    if image_format is None:
+        raise ValueError(f"Unsupported image format: {image_filepath}")
+
+    if max(width, height) > max_size:
+        image_pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(image_filepath, max_size, max_size, True)
+    else:
+        image_pixbuf = GdkPixbuf.Pixbuf.new_from_file(image_filepath)
+
+    # Photos are often stored sideways with their orientation in their EXIF tags
+    return image_pixbuf.apply_embedded_orientation() or image_pixbuf
@@ -0,0 +1,263 @@
+#    Lifelog (importer.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Import entries written with other tools into a diary
+# Usage : lifelog import DIARY_FILE SOURCE [--format jsonl|markdown|csv]
+#   JSON Lines : one object per line with "date", and optionally "title", "tags" (text or list), "mood" and "content" (or "text")
+#   CSV        : a header row, then the same columns
+#   Markdown   : a folder of .md files named after their date (2024-05-17.md...), with an optional front matter
+#                (date, title, tags and mood between two "---" lines), otherwise titled by their first "# " heading
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+
+from lifelog import archive
+from lifelog import cli
+from lifelog import config
+from lifelog import crypto_utils
+from lifelog import db_handler
+from lifelog import entry_store
+from lifelog import key_manager
+from lifelog import rich_text
+
+FILENAME_DATE_REGEX = re.compile(r"(\d{4}-\d{2}-\d{2})")
+FRONT_MATTER_LINE_REGEX = re.compile(r"^(\w+)\s*:\s*(.*?)\s*$")
+
+# Make an entry from the fields read for it, returning its date and the entry
+# Raises ValueError (with the location of the entry) if a field is invalid
+def make_imported_entry(fields, location):
+    try:
+        entry_date = datetime.strptime(str(fields.get("date") or "").strip(), "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        raise ValueError(f"{location}: invalid or missing date (expected YYYY-MM-DD)") from None
+
+    entry_tags = fields.get("tags") or ""
+    if isinstance(entry_tags, list):
+        entry_tags = ", ".join(str(entry_tag) for entry_tag in entry_tags)
+
+    entry_mood = fields.get("mood")
+    if entry_mood in (None, ""):
+        entry_mood = entry_store.DEFAULT_ENTRY_MOOD
+    try:
+        entry_mood = int(entry_mood)
+    except ValueError:
+        raise ValueError(f"{location}: invalid mood {entry_mood!r}") from None
+    if not 0 <= entry_mood <= 100:
+        raise ValueError(f"{location}: mood {entry_mood} isn't between 0 and 100")
+
+    entry_text = fields.get("content") or fields.get("text") or ""
+    return entry_date, entry_store.Entry(str(fields.get("title") or ""), str(entry_tags), entry_mood, rich_text.from_plain_text(str(entry_text)))
+
+
+# Read the entries of a JSON Lines file, one at a time
+def read_jsonl(source_path):
+    with open(source_path, encoding="utf-8") as source_file:
+        for line_number, line in enumerate(source_file, 1):
+            if not line.strip():
+                continue
+            location = f"{source_path}:{line_number}"
+            try:
+                fields = json.loads(line)
+            except json.JSONDecodeError as exception:
+                raise ValueError(f"{location}: {exception}") from None
+            if not isinstance(fields, dict):
+                raise ValueError(f"{location}: expected an object")
+            yield make_imported_entry(fields, location)
+
+
+# Read the entries of a CSV file with a header row, one at a time
+def read_csv(source_path):
+    with open(source_path, encoding="utf-8", newline="") as source_file:
+        reader = csv.DictReader(source_file)
+        for fields in reader:
+            yield make_imported_entry(fields, f"{source_path}:{reader.line_num}")
+
+
+# Read the entries of a folder of Markdown files (searched recursively, in name order), one at a time
+def read_markdown_folder(source_path):
+    for folder_path, folder_names, file_names in os.walk(source_path):
+        folder_names.sort()
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(".md"):
+                file_path = os.path.join(folder_path, file_name)
+                with open(file_path, encoding="utf-8") as markdown_file:
+                    yield make_imported_entry(parse_markdown(markdown_file.read(), file_name), file_path)
+
+
+# Get the fields of a Markdown entry from its text and its file name
+def parse_markdown(text, file_name):
+    fields = {}
+    filename_date_match = FILENAME_DATE_REGEX.search(file_name)
+    if filename_date_match:
+        fields["date"] = filename_date_match.group(1)
+
+    lines = text.splitlines()
+    if lines and lines[0].strip() == "---" and "---" in (line.strip() for line in lines[1:]):
+        front_matter_end = [line.strip() for line in lines].index("---", 1)
+        for line in lines[1:front_matter_end]:
+            front_matter_match = FRONT_MATTER_LINE_REGEX.match(line)
+            if front_matter_match:
+                key, value = front_matter_match.groups()
+                if key == "tags" and value.startswith("[") and value.endswith("]"):
+                    value = [entry_tag.strip().strip("\"'") for entry_tag in value[1:-1].split(",") if entry_tag.strip()]
+                else:
+                    value = value.strip("\"'")
+                fields[key] = value
+        lines = lines[front_matter_end+1:]
+
+    # Without a title, the first heading is used
+    if "title" not in fields:
+        for i, line in enumerate(lines):
+            if line.strip():
+                if line.startswith("# "):
+                    fields["title"] = line[2:].strip()
+                    del lines[i]
+                break
+
+    fields["content"] = "\n".join(lines).strip("\n")
+    return fields
+
+
+# The archives made by lifelog export are read with archive.read_archive, which needs their password
+READERS = {"jsonl": read_jsonl, "csv": read_csv, "markdown": read_markdown_folder, "archive": archive.read_archive}
+
+# Guess the format of a source from its path
+def guess_format(source_path):
+    if os.path.isdir(source_path):
+        return "markdown"
+    if source_path.lower().endswith(".csv"):
+        return "csv"
+    if source_path.lower().endswith(archive.ARCHIVE_EXTENSION):
+        return "archive"
+    return "jsonl"
+
+
+# Save the imported entries in batches, each batch being encrypted in parallel and saved in its own transaction
+# The existing entries are kept (as well as the first one of the imported entries having the same date) unless replace is set
+# Returns the numbers of imported and skipped entries
+def import_entries(store, imported_entries, batch_size=None, replace=False, progress_callback=None):
+    batch_size = batch_size or config.IMPORT_BATCH_SIZE
+    store.ensure_indexes_built() # The imported entries are then indexed as they are saved
+    skipped_dates = set() if replace else set(store.db.get_entry_dates_between("0000-00-00", "9999-99-99"))
+
+    imported_count = skipped_count = 0
+    batch = []
+    for entry_date, entry in imported_entries:
+        if entry_date in skipped_dates:
+            skipped_count += 1
+            continue
+        if not replace:
+            skipped_dates.add(entry_date)
+
+        batch.append((entry_date, entry))
+        if len(batch) >= batch_size:
+            store.save_entries(batch)
+            imported_count += len(batch)
+            batch = []
+            if progress_callback:
+                progress_callback(imported_count, skipped_count)
+
+    if batch:
+        store.save_entries(batch)
+        imported_count += len(batch)
+        if progress_callback:
+            progress_callback(imported_count, skipped_count)
+    return imported_count, skipped_count
+
+
+# Delete a diary being created and the journal files of its database
+def delete_diary_files(db_filepath):
+    for filepath in (db_filepath, db_filepath + "-wal", db_filepath + "-shm"):
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="lifelog import", description="Import entries from JSON Lines, CSV, a folder of Markdown files "
+                                                                         "or an archive made by lifelog export into a diary "
+                                                                         "(close the diary in Lifelog first). The passwords are read from "
+                                                                         "LIFELOG_PASSWORD and LIFELOG_ARCHIVE_PASSWORD if set")
+    parser.add_argument("diary", help="diary file to import into")
+    parser.add_argument("source", help="JSON Lines file, CSV file, folder of Markdown files or archive")
+    parser.add_argument("--format", choices=sorted(READERS), help="format of the source (guessed from its path by default)")
+    parser.add_argument("--batch-size", type=int, default=config.IMPORT_BATCH_SIZE, help="entries saved per transaction")
+    parser.add_argument("--replace", action="store_true", help="replace the existing entries of the same dates instead of keeping them")
+    parser.add_argument("--create", action="store_true", help="create a new diary")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.source):
+        sys.exit(f"No such file or folder : {args.source}")
+    if args.create == os.path.exists(args.diary):
+        sys.exit(f"The diary already exists : {args.diary}" if args.create else f"No such file : {args.diary} (use --create to create it)")
+
+    # The passwords are checked before the diary is created, so that no diary without keys is left behind
+    try:
+        password = (cli.get_new_password() if args.create else cli.get_password()).encode("utf-8")
+    except ValueError as exception:
+        sys.exit(str(exception))
+
+    db = db_handler.DbHandler(args.diary)
+    try:
+        if args.create:
+            try:
+                db.reset_database()
+                aes_key = key_manager.create_keys(db, password)
+                db.commit()
+            except BaseException:
+                db.close()
+                delete_diary_files(args.diary)
+                raise
+        else:
+            aes_key = key_manager.unlock(db, password)
+            if aes_key is None:
+                sys.exit("Wrong password!")
+
+        store = entry_store.EntryStore(db, crypto_utils.AESCipher(aes_key))
+        source_format = args.format or guess_format(args.source)
+        if source_format == "archive":
+            archive_password = cli.get_password("Archive password : ", cli.ARCHIVE_PASSWORD_ENVIRONMENT_VARIABLE).encode("utf-8")
+            try:
+                archive.read_archive_key(args.source, archive_password)
+            except ValueError as exception:
+                sys.exit(str(exception))
+            imported_entries = archive.read_archive(args.source, archive_password)
+        else:
+            imported_entries = READERS[source_format](args.source)
+        start_time = time.perf_counter()
+        progress_callback = lambda imported_count, skipped_count: print(f"\r{imported_count} entries imported, {skipped_count} skipped", end="", file=sys.stderr)
+        try:
+            imported_count, skipped_count = import_entries(store, imported_entries, args.batch_size, args.replace, progress_callback)
+        except ValueError as exception:
+            sys.exit(f"\nImport stopped (the previous batches are saved) : {exception}")
+        finally:
+            store.close()
+
+        elapsed_seconds = time.perf_counter() - start_time
+        print(f"\n{imported_count} entries imported in {elapsed_seconds:.1f} s ({imported_count / max(elapsed_seconds, 1e-9):.0f} entries/s), "
+              f"{skipped_count} existing ones kept.", file=sys.stderr)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
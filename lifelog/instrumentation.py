@@ -0,0 +1,140 @@
+#    Lifelog (instrumentation.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Timing and counting of the hot paths (database, encryption, key derivation, compression and the app's text buffer)
+# Nothing is wrapped or loaded until enable() is called, so the instrumentation costs nothing when it is disabled
+# The statistics are shown in the performance dialog of the app (Ctrl+Shift+D) and can be saved as JSON,
+# and the calls as a trace in the Chrome trace event format (for chrome://tracing, Perfetto or speedscope)
+
+import atexit
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+from lifelog import config
+
+is_enabled = False
+lock = threading.Lock()
+stats = {} # Name -> [calls, total seconds, maximum seconds]
+trace_events = deque(maxlen=config.INSTRUMENTATION_MAX_TRACE_EVENTS) # (name, start time, seconds, thread ID)
+start_time = time.perf_counter()
+
+def record(name, call_start_time, elapsed_seconds):
+    with lock:
+        stat = stats.get(name)
+        if stat is None:
+            stats[name] = [1, elapsed_seconds, elapsed_seconds]
+        else:
+            stat[0] += 1
+            stat[1] += elapsed_seconds
+            stat[2] = max(stat[2], elapsed_seconds)
+        trace_events.append((name, call_start_time, elapsed_seconds, threading.get_ident()))
+
+
+# Wrap a function to record the time taken by each of its calls
+def timed(name, function):
+    @functools.wraps(function)
+    def timed_function(*args, **kwargs):
+        call_start_time = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            record(name, call_start_time, time.perf_counter() - call_start_time)
+    return timed_function
+
+
+# Replace functions of a module or methods of a class by timed ones, recorded as prefix.name
+def instrument(owner, names, prefix):
+    import inspect
+    for name in names:
+        attribute = inspect.getattr_static(owner, name)
+        if isinstance(attribute, staticmethod):
+            setattr(owner, name, staticmethod(timed(f"{prefix}.{name}", attribute.__func__)))
+        else:
+            setattr(owner, name, timed(f"{prefix}.{name}", getattr(owner, name)))
+
+
+# Get the names of the public methods of a class, except the generators (whose calls only create them)
+def get_public_methods(cls):
+    import inspect
+    return [name for name, attribute in vars(cls).items()
+            if inspect.isfunction(attribute) and not name.startswith("_") and not inspect.isgeneratorfunction(attribute)]
+
+
+# Time the hot paths shared by the app and the command line tools
+def enable():
+    global is_enabled
+    if is_enabled:
+        return
+    is_enabled = True
+
+    # Loaded here, so that importing this module doesn't load the encryption, the database and the compression
+    # (nor inspect and json, imported where they are used) when the instrumentation is disabled
+    from lifelog import compression
+    from lifelog import crypto_utils
+    from lifelog import db_handler
+    instrument(db_handler.DbHandler, get_public_methods(db_handler.DbHandler), "db")
+    instrument(crypto_utils.AESCipher, ["encrypt", "decrypt"], "aes")
+    instrument(crypto_utils.scryptHasher, ["hash_password"], "scrypt")
+    instrument(crypto_utils, ["derive_master_key", "encrypt_gcm", "decrypt_gcm"], "crypto")
+    instrument(compression, ["compress", "decompress"], "compression")
+
+
+# Enable the instrumentation if asked by the environment, returning whether it is enabled
+def enable_from_environment():
+    if os.environ.get(config.INSTRUMENTATION_ENV_VARIABLE, "") in ("", "0"):
+        return False
+    enable()
+    trace_filepath = os.environ.get(config.INSTRUMENTATION_TRACE_FILE_ENV_VARIABLE)
+    if trace_filepath:
+        atexit.register(save_trace, trace_filepath)
+    return True
+
+
+def reset():
+    with lock:
+        stats.clear()
+        trace_events.clear()
+
+
+# Get the statistics of each timed function, the slowest ones in total first
+def get_stats():
+    with lock:
+        stats_items = [(name, list(stat)) for name, stat in stats.items()]
+    return {name: {"calls": calls, "total_ms": total_seconds * 1000, "mean_ms": total_seconds * 1000 / calls, "max_ms": max_seconds * 1000}
+            for name, (calls, total_seconds, max_seconds) in sorted(stats_items, key=lambda item: item[1][1], reverse=True)}
+
+
+def save_stats(filepath):
+    import json
+    with open(filepath, "w", encoding="utf-8") as stats_file:
+        json.dump(get_stats(), stats_file, indent=2)
+
+
+# Save the recorded calls as complete events ("X") of the Chrome trace event format, in microseconds
+def save_trace(filepath):
+    import json
+    with lock:
+        events = list(trace_events)
+    process_id = os.getpid()
+    with open(filepath, "w", encoding="utf-8") as trace_file:
+        json.dump({"traceEvents": [{"name": name, "cat": name.split(".")[0], "ph": "X", "pid": process_id, "tid": thread_id,
+                                    "ts": (call_start_time - start_time) * 1e6, "dur": elapsed_seconds * 1e6}
+                                   for name, call_start_time, elapsed_seconds, thread_id in events],
+                   "displayTimeUnit": "ms"}, trace_file)
@@ -0,0 +1,164 @@
+#    Lifelog (key_manager.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import hmac
+import json
+import os
+import time
+
+from lifelog import config
+from lifelog import crypto_utils
+
+# Key layouts :
+#   1 : the password is hashed twice (verification hash and AES key)
+#   2 : the KDF runs once and its output is expanded into the verification key and the AES key
+#   3 : same as 2, the second expanded key wrapping the AES key (which can then outlive the KDF parameters)
+KEY_LAYOUT_VERSION = 3
+
+# KDF parameter versions : 1 doesn't use the cores (no scrypt lanes), 2 is calibrated for the machine creating the diary
+KDF_PARAMS_VERSION = 2
+
+# Get the KDF parameters used for new diaries, tuned to take about target_seconds on this machine
+def calibrate_kdf_params(target_seconds=None):
+    target_seconds = target_seconds or config.KDF_TARGET_UNLOCK_SECONDS
+    cpu_count = os.cpu_count() or 1
+    max_memory_kib = config.KDF_MAX_MEMORY_MIB * 1024
+
+    if crypto_utils.IS_ARGON2_AVAILABLE:
+        kdf_params = {"version": KDF_PARAMS_VERSION, "algorithm": "argon2id", "time_cost": config.ARGON2_TIME_COST,
+                      "memory_cost": min(config.ARGON2_MEMORY_COST_KIB, max_memory_kib), "parallelism": cpu_count}
+        cost_key, max_cost = "time_cost", config.KDF_MAX_ARGON2_TIME_COST
+    else:
+        # Each lane uses 128 * n * r bytes of memory
+        lanes = min(cpu_count, 16)
+        kdf_params = {"version": KDF_PARAMS_VERSION, "algorithm": "scrypt", "n": config.SCRYPT_N, "r": config.SCRYPT_R, "p": config.SCRYPT_P, "lanes": lanes}
+        cost_key, max_cost = "n", max_memory_kib * 1024 // (128 * config.SCRYPT_R * lanes)
+
+    # Double the cost until the derivation is slow enough (never going below the defaults)
+    while True:
+        start_time = time.perf_counter()
+        crypto_utils.derive_master_key(b"calibration", os.urandom(16), kdf_params)
+        elapsed_seconds = time.perf_counter() - start_time
+        if elapsed_seconds >= target_seconds / 2 or kdf_params[cost_key] * 2 > max_cost:
+            break
+        kdf_params[cost_key] *= 2
+
+    # Argon2 time cost can be fine-tuned linearly
+    if cost_key == "time_cost" and elapsed_seconds < target_seconds:
+        kdf_params["time_cost"] = min(max_cost, max(1, round(kdf_params["time_cost"] * target_seconds / elapsed_seconds)))
+    return kdf_params
+
+
+# Settings of the original key layout, removed once a diary is upgraded
+LEGACY_KEY_SETTINGS = ["encryption_salt", "password_verification_salt", "password_verification_hash"]
+
+# Setup the encryption of a new diary with a random AES key and return it (the settings aren't committed)
+def create_keys(db, password, kdf_params=None):
+    aes_key = os.urandom(32)
+    set_password(db, password, aes_key, kdf_params)
+    db.update_setting("is_aes_key_random", 1)
+    return aes_key
+
+
+# Check if a database has the keys of a diary (of any layout)
+def has_keys(db):
+    return db.has_setting("key_layout_version") or db.has_setting("password_verification_hash")
+
+
+# Check if the AES key of a diary has been derived from its password (diaries created before the key was random)
+def needs_key_migration(db):
+    return not db.has_setting("is_aes_key_random")
+
+
+# Change the password of a diary by re-wrapping its AES key (no entry is re-encrypted, whatever the size of the diary)
+# Returns False if the current password is incorrect
+def change_password(db, current_password, new_password):
+    aes_key = unlock(db, current_password)
+    if aes_key is None:
+        return False
+
+    # Keep the current KDF parameters if they are up to date to avoid a new calibration
+    kdf_params = None
+    if not needs_rehash(db):
+        kdf_params = json.loads(db.get_setting("kdf_params"))
+    set_password(db, new_password, aes_key, kdf_params)
+    db.commit()
+    return True
+
+
+# Wrap the AES key with a key derived from a password (the entries don't need to be re-encrypted, the settings aren't committed)
+def set_password(db, password, aes_key, kdf_params=None):
+    kdf_params = kdf_params or calibrate_kdf_params()
+    kdf_salt = os.urandom(16)
+    verification_key, key_encryption_key = crypto_utils.expand_master_key(crypto_utils.derive_master_key(password, kdf_salt, kdf_params))
+
+    for legacy_key_setting in LEGACY_KEY_SETTINGS:
+        db.delete_setting(legacy_key_setting)
+    db.update_setting("key_layout_version", KEY_LAYOUT_VERSION)
+    db.update_setting("kdf_params", json.dumps(kdf_params))
+    db.update_setting("kdf_salt", kdf_salt)
+    db.update_setting("password_verification_key", verification_key)
+    db.update_setting("wrapped_aes_key", crypto_utils.wrap_key(key_encryption_key, aes_key))
+
+
+# Check if a diary uses an older key layout or KDF parameters
+def needs_rehash(db):
+    if not db.has_setting("key_layout_version") or int(db.get_setting("key_layout_version")) < KEY_LAYOUT_VERSION:
+        return True
+    return json.loads(db.get_setting("kdf_params")).get("version", 1) < KDF_PARAMS_VERSION
+
+
+# Upgrade the key layout and the KDF parameters of an unlocked diary if needed, keeping its AES key
+# Returns True if the diary has been upgraded
+def rehash(db, password, aes_key):
+    if not needs_rehash(db):
+        return False
+    set_password(db, password, aes_key)
+    db.commit()
+    return True
+
+
+# Check a password and return the AES key of the diary, or None if the password is incorrect
+def unlock(db, password):
+    if not db.has_setting("key_layout_version"):
+        return unlock_legacy(db, password)
+
+    key_layout_version = int(db.get_setting("key_layout_version"))
+    kdf_params = json.loads(db.get_setting("kdf_params"))
+    kdf_salt = db.get_setting("kdf_salt")
+    verification_key, derived_key = crypto_utils.expand_master_key(crypto_utils.derive_master_key(password, kdf_salt, kdf_params))
+
+    if not hmac.compare_digest(verification_key, db.get_setting("password_verification_key")):
+        return None
+    if key_layout_version >= 3:
+        return crypto_utils.unwrap_key(derived_key, db.get_setting("wrapped_aes_key"))
+    return derived_key
+
+
+# Check a password against a diary using the original layout (two separate scrypt hashes)
+def unlock_legacy(db, password):
+    encryption_salt = db.get_setting("encryption_salt")
+    password_verification_salt = db.get_setting("password_verification_salt")
+    password_verification_hash = db.get_setting("password_verification_hash")
+
+    # Hash the input password with the password verification salt
+    input_password_hash = crypto_utils.scryptHasher.hash_password(password, password_verification_salt)
+
+    # If the hashes match (password is correct), generate the key
+    if hmac.compare_digest(input_password_hash, password_verification_hash):
+        return crypto_utils.scryptHasher.hash_password(password, encryption_salt)
+    return None
@@ -0,0 +1,128 @@
+#    Lifelog (key_migration.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# One-off migration of the diaries created before their AES key was random, or whose entries still use the old format
+# Usage : python3 -m lifelog.key_migration DIARY_FILE
+
+import argparse
+import getpass
+import json
+import os
+import sys
+import time
+
+from lifelog import config
+from lifelog import crypto_utils
+from lifelog import db_handler
+from lifelog import entry_store
+from lifelog import key_manager
+
+# Re-encrypt every entry of a diary (in the current format) with a new random AES key wrapped by the password, streaming the rows in batches
+# Everything is done in a single transaction, so an interrupted migration leaves the diary unchanged
+# Returns False if the password is incorrect
+def migrate_to_random_key(db, password, batch_size=None, progress_callback=None):
+    batch_size = batch_size or config.KEY_MIGRATION_BATCH_SIZE
+    old_aes_key = key_manager.unlock(db, password)
+    if old_aes_key is None:
+        return False
+
+    old_entry_store = entry_store.EntryStore(db, crypto_utils.AESCipher(old_aes_key))
+    new_aes_key = os.urandom(32)
+    new_entry_store = entry_store.EntryStore(db, crypto_utils.AESCipher(new_aes_key))
+    total_entries = db.count_entries_between("0000-00-00", "9999-99-99")
+
+    try:
+        # Re-encrypt each batch of rows as records, whatever their current format
+        migrated_entries = 0
+        last_db_id = 0
+        while True:
+            rows = db.get_entries_after_id(last_db_id, batch_size)
+            if not rows:
+                break
+
+            # Every entry of the batch is decrypted before its images are stored again, as they may be shared
+            entries = old_entry_store.decrypt_entry_rows(rows)
+            entry_records = new_entry_store.encode_entries((row[1], entry) for row, entry in zip(rows, entries))
+            db.update_entry_records((record, row[0]) for row, record in zip(rows, entry_records))
+
+            migrated_entries += len(rows)
+            last_db_id = rows[-1][0]
+            if progress_callback:
+                progress_callback(migrated_entries, total_entries)
+
+        # The search index and the mood blocks depend on the key, they are rebuilt on the next search
+        db.clear_search_terms()
+        db.clear_mood_blocks()
+        db.delete_setting("search_index_version")
+        db.delete_setting("mood_store_version")
+
+        # Wrap the new key with the password (keeping the KDF parameters if they are up to date)
+        kdf_params = None
+        if not key_manager.needs_rehash(db):
+            kdf_params = json.loads(db.get_setting("kdf_params"))
+        key_manager.set_password(db, password, new_aes_key, kdf_params)
+        db.update_setting("is_aes_key_random", 1)
+        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-encrypt a diary created by an older Lifelog version with a random key, "
+                                                 "so that its password can be changed without re-encrypting it, and its entries in the current format "
+                                                 "(close the diary in Lifelog first)")
+    parser.add_argument("diary", help="diary file to migrate")
+    parser.add_argument("--batch-size", type=int, default=config.KEY_MIGRATION_BATCH_SIZE, help="entries re-encrypted at once")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.diary):
+        sys.exit(f"No such file : {args.diary}")
+
+    db = db_handler.DbHandler(args.diary)
+    try:
+        if key_manager.needs_key_migration(db):
+            password = getpass.getpass("Password : ").encode("utf-8")
+            start_time = time.perf_counter()
+            progress_callback = lambda migrated_entries, total_entries: print(f"\r{migrated_entries}/{total_entries} entries re-encrypted", end="", file=sys.stderr)
+            if not migrate_to_random_key(db, password, args.batch_size, progress_callback):
+                sys.exit("Wrong password!")
+            print(f"\nMigration done in {time.perf_counter() - start_time:.1f} s.", file=sys.stderr)
+            return
+
+        # The key is random already, only the entries still using the old format are rewritten
+        total_entries = db.count_legacy_entries()
+        if not total_entries:
+            print("This diary already uses a random key and the current entry format.")
+            return
+        aes_key = key_manager.unlock(db, getpass.getpass("Password : ").encode("utf-8"))
+        if aes_key is None:
+            sys.exit("Wrong password!")
+        store = entry_store.EntryStore(db, crypto_utils.AESCipher(aes_key))
+        start_time = time.perf_counter()
+        try:
+            store.upgrade_legacy_entries(args.batch_size, lambda upgraded_entries: print(f"\r{upgraded_entries}/{total_entries} entries rewritten", end="", file=sys.stderr))
+        finally:
+            store.close()
+        print(f"\nUpgrade done in {time.perf_counter() - start_time:.1f} s.", file=sys.stderr)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
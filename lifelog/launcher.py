@@ -0,0 +1,35 @@
+#    Lifelog (launcher.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+# Entry point of the lifelog command : "lifelog" opens the app, "lifelog COMMAND ..." runs a command without loading GTK
+
+import importlib
+import sys
+
+# Command -> module having its main function
+COMMANDS = {
+    "import": "lifelog.importer",
+    "export": "lifelog.exporter",
+    "backup": "lifelog.backup",
+}
+
+def run():
+    if len(sys.argv) > 1 and sys.argv[1] in COMMANDS:
+        importlib.import_module(COMMANDS[sys.argv[1]]).main(sys.argv[2:])
+    else:
+        from lifelog.__main__ import run as run_app
+        run_app()
@@ -0,0 +1,173 @@
+#    Lifelog (mood_store.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import re
+
+# Bumped whenever the block layout changes (the blocks are then rebuilt)
+MOOD_STORE_VERSION = 1
+NO_MOOD = 255                # Value of the days without an entry
+YEAR_BLOCK_SIZE = 12 * 31    # One byte per day, 31 days per month
+HISTOGRAM_BUCKET_SIZE = 10   # Moods 0-9, 10-19, ..., 90-100 (100 goes in the last bucket)
+
+# Mood filters typed in the search dialog : "<30", ">= 70", "40-60", or any other text for a substring match
+COMPARISON_FILTER_REGEX = re.compile(r"^\s*(<=|>=|<|>|=)\s*(\d+)\s*$")
+RANGE_FILTER_REGEX = re.compile(r"^\s*(\d+)\s*-\s*(\d+)\s*$")
+
+class MoodStore:
+    # Initialize the mood store of a diary
+    def __init__(self, db, aes_cipher):
+        self.db = db
+        self.aes_cipher = aes_cipher
+        self.year_blocks = None # Decrypted blocks, year -> bytearray (loaded on first use)
+
+
+    # Check if the blocks cover every entry of the diary
+    def is_built(self):
+        return self.db.has_setting("mood_store_version") and int(self.db.get_setting("mood_store_version")) == MOOD_STORE_VERSION
+
+
+    # Get the position of a day in its year block
+    @staticmethod
+    def get_day_index(entry_date):
+        _, month, day = entry_date.split("-")
+        return (int(month) - 1) * 31 + int(day) - 1
+
+
+    # Load and decrypt the blocks (a single one per year having entries)
+    def load_year_blocks(self):
+        if self.year_blocks is not None:
+            return
+
+        self.year_blocks = {}
+        for year, data in self.db.get_mood_blocks():
+            self.year_blocks[year] = bytearray(self.aes_cipher.decrypt(data))
+
+
+    # Set the mood of an entry (the year block is re-encrypted but not committed)
+    def set_mood(self, entry_date, entry_mood):
+        self.set_moods([(entry_date, entry_mood)])
+
+
+    # Set the moods of many entries given as (entry_date, entry_mood) tuples (each year block is re-encrypted once, but not committed)
+    def set_moods(self, dated_moods):
+        self.load_year_blocks()
+        changed_years = set()
+        for entry_date, entry_mood in dated_moods:
+            year = entry_date[:4]
+            year_block = self.year_blocks.setdefault(year, bytearray([NO_MOOD] * YEAR_BLOCK_SIZE))
+            year_block[self.get_day_index(entry_date)] = int(entry_mood)
+            changed_years.add(year)
+
+        for year in sorted(changed_years):
+            self.db.update_mood_block(year, self.aes_cipher.encrypt(bytes(self.year_blocks[year])))
+
+
+    # Get the dates and moods of the entries between two dates
+    def get_moods_between(self, from_date, to_date):
+        self.load_year_blocks()
+
+        moods = []
+        for year, year_block in sorted(self.year_blocks.items()):
+            if not from_date[:4] <= year <= to_date[:4]:
+                continue
+            for day_index, mood in enumerate(year_block):
+                if mood == NO_MOOD:
+                    continue
+                entry_date = f"{year}-{str(day_index // 31 + 1).zfill(2)}-{str(day_index % 31 + 1).zfill(2)}"
+                if from_date <= entry_date <= to_date:
+                    moods.append((entry_date, mood))
+        return moods
+
+
+    # Get the dates of the entries between two dates whose mood matches a filter typed by the user
+    def find_dates(self, from_date, to_date, mood_filter):
+        mood_predicate = parse_mood_filter(mood_filter)
+        return [entry_date for entry_date, mood in self.get_moods_between(from_date, to_date) if mood_predicate(mood)]
+
+
+    # Get the number of entries, average, minimum, maximum and histogram of the moods for each month between two dates
+    def get_monthly_stats(self, from_date, to_date):
+        monthly_moods = {}
+        for entry_date, mood in self.get_moods_between(from_date, to_date):
+            monthly_moods.setdefault(entry_date[:7], []).append(mood)
+
+        monthly_stats = {}
+        for month, moods in monthly_moods.items():
+            histogram = [0] * (100 // HISTOGRAM_BUCKET_SIZE)
+            for mood in moods:
+                histogram[min(mood // HISTOGRAM_BUCKET_SIZE, len(histogram) - 1)] += 1
+            monthly_stats[month] = {
+                "count": len(moods),
+                "average": sum(moods) / len(moods),
+                "min": min(moods),
+                "max": max(moods),
+                "histogram": histogram,
+            }
+        return monthly_stats
+
+
+    # Build the blocks from the moods of every entry, reading the rows in batches decrypted with the given function
+    # (returning the entry summary of each row, or None if it can't be decrypted)
+    # The entries which can't be decrypted are left out, their dates are returned
+    def rebuild(self, decrypt_summary_rows, batch_size):
+        self.close()
+        self.year_blocks = {}
+        damaged_dates = []
+        for entry_rows in self.db.iter_entry_summaries_between("0000-00-00", "9999-99-99", batch_size):
+            for entry_row, entry_summary in zip(entry_rows, decrypt_summary_rows(entry_rows)):
+                if entry_summary is None:
+                    damaged_dates.append(entry_row[1])
+                    continue
+                year = entry_row[1][:4]
+                self.year_blocks.setdefault(year, bytearray([NO_MOOD] * YEAR_BLOCK_SIZE))
+                self.year_blocks[year][self.get_day_index(entry_row[1])] = entry_summary.mood
+
+        self.db.clear_mood_blocks()
+        for year, year_block in self.year_blocks.items():
+            self.db.update_mood_block(year, self.aes_cipher.encrypt(bytes(year_block)))
+        self.db.update_setting("mood_store_version", MOOD_STORE_VERSION)
+        self.db.commit()
+        return damaged_dates
+
+
+    # Wipe the decrypted moods from memory
+    def close(self):
+        for year_block in (self.year_blocks or {}).values():
+            year_block[:] = bytes(len(year_block))
+        self.year_blocks = None
+
+
+# Convert a mood filter ("<30", ">= 70", "40-60" or a substring) to a function checking a mood
+def parse_mood_filter(mood_filter):
+    comparison_match = COMPARISON_FILTER_REGEX.match(mood_filter)
+    if comparison_match:
+        operator, value = comparison_match.group(1), int(comparison_match.group(2))
+        return {
+            "<": lambda mood: mood < value,
+            "<=": lambda mood: mood <= value,
+            ">": lambda mood: mood > value,
+            ">=": lambda mood: mood >= value,
+            "=": lambda mood: mood == value,
+        }[operator]
+
+    range_match = RANGE_FILTER_REGEX.match(mood_filter)
+    if range_match:
+        low, high = sorted((int(range_match.group(1)), int(range_match.group(2))))
+        return lambda mood: low <= mood <= high
+
+    # Same as searching the other fields
+    return lambda mood: mood_filter in str(mood)
@@ -0,0 +1,146 @@
+#    Lifelog (rich_text.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import base64
+import html
+import struct
+import zlib
+from xml.etree import ElementTree
+
+from lifelog import attachment_store
+from lifelog import config
+from lifelog import content_chunks
+from lifelog.content_chunks import SECTION_HEADER, TEXT_SECTION_NAME
+
+# Tags of the app converted to Markdown and HTML (the others, like the justification, are dropped)
+MARKDOWN_TAGS = {"bold": ("**", "**"), "italic": ("*", "*"), "underline": ("<u>", "</u>"), "strikethrough": ("~~", "~~")}
+HTML_TAGS = {"bold": ("<b>", "</b>"), "italic": ("<i>", "</i>"), "underline": ("<u>", "</u>"), "strikethrough": ("<s>", "</s>")}
+
+# Escape &, < and > (xml.sax.saxutils.escape is slow to import)
+def escape(text):
+    return html.escape(text, quote=False)
+
+
+# Serialize a plain text as a Gtk.TextBuffer without tags (what Gtk.TextBuffer.serialize gives for it), in chunks like the app does
+def from_plain_text(text):
+    chunk_offsets = content_chunks.get_chunk_offsets(text, config.ENTRY_CHUNK_CHARS, config.ENTRY_CHUNK_IMAGES)
+    chunks = []
+    for start, end in zip(chunk_offsets, chunk_offsets[1:] + [len(text)]):
+        xml = f"<text_view_markup>\n <tags>\n </tags>\n<text>{escape(text[start:end])}</text>\n</text_view_markup>\n".encode("utf-8")
+        chunks.append(SECTION_HEADER.pack(TEXT_SECTION_NAME, len(xml)) + xml)
+    return b"".join(chunks)
+
+
+# Parse the chunks of an entry content (serialized Gtk.TextBuffers) into runs of text and images
+# Returns the runs, as (text, tag names) tuples or (None, image index) tuples for the images, and the data of the images
+# Content which isn't a serialized Gtk.TextBuffer is returned as a single run of text
+def parse(entry_content):
+    runs = []
+    images = []
+    for chunk in content_chunks.split_chunks(entry_content):
+        text_content, chunk_images = attachment_store.split_content(chunk)
+        try:
+            if not text_content.startswith(TEXT_SECTION_NAME):
+                raise ValueError
+            root = ElementTree.fromstring(text_content[SECTION_HEADER.size:])
+        except (ValueError, ElementTree.ParseError):
+            return [(bytes(entry_content).decode("utf-8", "replace"), ())], []
+
+        # Walk the nested <apply_tag> elements, keeping the names of the tags applied to each run
+        # (the images are numbered from 0 in each chunk)
+        first_image_index = len(images)
+        def add_runs(element, tag_names):
+            if element.text:
+                runs.append((element.text, tag_names))
+            for child in element:
+                if child.tag == "apply_tag":
+                    add_runs(child, tag_names + ((child.get("name"),) if child.get("name") else ()))
+                elif child.tag == "pixbuf":
+                    runs.append((None, first_image_index + int(child.get("index", 0))))
+                if child.tail:
+                    runs.append((child.tail, tag_names))
+
+        text_element = root.find("text")
+        if text_element is not None:
+            add_runs(text_element, ())
+        images += chunk_images
+    return runs, images
+
+
+# Convert a serialized Gtk.TextBuffer to plain text (images are dropped)
+def to_plain_text(entry_content):
+    runs, _ = parse(entry_content)
+    return "".join(text for text, _ in runs if text is not None)
+
+
+# Convert a serialized Gtk.TextBuffer to Markdown, get_image_link giving the Markdown of an image from its index and its data
+def to_markdown(entry_content, get_image_link=lambda image_index, image: ""):
+    runs, images = parse(entry_content)
+    markdown_parts = []
+    for text, tag_names_or_image_index in runs:
+        if text is None:
+            if tag_names_or_image_index < len(images):
+                markdown_parts.append(get_image_link(tag_names_or_image_index, images[tag_names_or_image_index]))
+        else:
+            markdown_parts.append(format_text(text, tag_names_or_image_index, MARKDOWN_TAGS, lambda text: text))
+    return "".join(markdown_parts)
+
+
+# Convert a serialized Gtk.TextBuffer to HTML, the images being embedded as PNG
+def to_html(entry_content):
+    runs, images = parse(entry_content)
+    html_parts = []
+    for text, tag_names_or_image_index in runs:
+        if text is None:
+            png_image = pixdata_to_png(images[tag_names_or_image_index]) if tag_names_or_image_index < len(images) else None
+            if png_image:
+                html_parts.append(f'<img src="data:image/png;base64,{base64.b64encode(png_image).decode("ascii")}" alt="">')
+        else:
+            html_parts.append(format_text(text, tag_names_or_image_index, HTML_TAGS, escape).replace("\n", "<br>\n"))
+    return "".join(html_parts)
+
+
+# Surround each line of a run of text with the markup of its tags
+def format_text(text, tag_names, markup_tags, escape_text):
+    prefix = "".join(markup_tags[tag_name][0] for tag_name in tag_names if tag_name in markup_tags)
+    suffix = "".join(markup_tags[tag_name][1] for tag_name in reversed(tag_names) if tag_name in markup_tags)
+    if not prefix:
+        return escape_text(text)
+    return "\n".join(prefix + escape_text(line) + suffix if line.strip() else line for line in text.split("\n"))
+
+
+# Encode the data of an image section (a GdkPixdata) as PNG, or return None if it can't be read
+def pixdata_to_png(image):
+    if len(image) < attachment_store.PIXDATA_HEADER.size:
+        return None
+    magic, length, pixdata_type, rowstride, width, height = attachment_store.PIXDATA_HEADER.unpack_from(image)
+    channels = attachment_store.PIXDATA_CHANNELS.get(pixdata_type & attachment_store.PIXDATA_COLOR_TYPE_MASK)
+    if (magic != attachment_store.PIXDATA_MAGIC or channels is None
+            or pixdata_type & attachment_store.PIXDATA_ENCODING_MASK != attachment_store.PIXDATA_ENCODING_RAW
+            or len(image) < attachment_store.PIXDATA_HEADER.size + rowstride * height):
+        return None
+
+    # Each row is prefixed with its filter type (0 : none)
+    pixels = memoryview(image)[attachment_store.PIXDATA_HEADER.size:]
+    raw_rows = b"".join(b"\x00" + pixels[y*rowstride:y*rowstride + width*channels] for y in range(height))
+
+    def make_chunk(chunk_type, data):
+        return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+    color_type = 6 if channels == 4 else 2 # RGBA or RGB, 8 bits per sample
+    return (b"\x89PNG\r\n\x1a\n" + make_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+            + make_chunk(b"IDAT", zlib.compress(raw_rows, 6)) + make_chunk(b"IEND", b""))
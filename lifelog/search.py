@@ -0,0 +1,77 @@
+#    Lifelog (search.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import threading
+
+class CancellationToken:
+    # Initialize a token shared between a search and the code able to cancel it
+    def __init__(self):
+        self.event = threading.Event()
+
+
+    # Ask the search to stop before its next batch
+    def cancel(self):
+        self.event.set()
+
+
+    def is_cancelled(self):
+        return self.event.is_set()
+
+
+# Search the entries between two dates whose title or tags contain a text (or whose mood matches a filter)
+# Yields a list of (entry_date, entry_summary) after each batch of rows, which may be empty
+# progress_callback is called with the number of scanned and total entries after each batch
+def iter_search_results(entry_store, from_date, to_date, field, search_content, batch_size, cancellation_token=None, progress_callback=None):
+    entry_store.ensure_indexes_built()
+
+    # Moods are known without decrypting the entries
+    if field == "mood":
+        candidate_dates = entry_store.mood_store.find_dates(from_date, to_date, search_content)
+        is_match = lambda entry_summary: True
+
+    # Only decrypt the entries having all the terms of the searched text if possible
+    else:
+        candidate_dates = entry_store.search_index.get_candidate_dates(field, search_content, from_date, to_date)
+        is_match = lambda entry_summary: search_content in getattr(entry_summary, field) # The index only tells which entries may match
+
+    # Stream the rows in batches
+    if candidate_dates is None:
+        total_entries = entry_store.db.count_entries_between(from_date, to_date)
+        row_batches = entry_store.db.iter_entry_summaries_between(from_date, to_date, batch_size)
+    else:
+        total_entries = len(candidate_dates)
+        row_batches = (entry_store.db.get_entry_summaries_from_dates(candidate_dates[i:i+batch_size]) for i in range(0, len(candidate_dates), batch_size))
+
+    scanned_entries = 0
+    try:
+        for rows in row_batches:
+            if cancellation_token and cancellation_token.is_cancelled():
+                return
+
+            found_entries = []
+            for row, entry_summary in zip(rows, entry_store.decrypt_entry_summary_rows(rows)):
+                if is_match(entry_summary):
+                    found_entries.append((row[1], entry_summary))
+
+            scanned_entries += len(rows)
+            if progress_callback:
+                progress_callback(scanned_entries, total_entries)
+            yield found_entries
+    finally:
+        # Release the database cursor if the search stopped early
+        if hasattr(row_batches, "close"):
+            row_batches.close()
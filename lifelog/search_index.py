@@ -0,0 +1,79 @@
+#    Lifelog (search_index.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import hmac
+import hashlib
+
+# Bumped whenever the way terms are computed changes (the index is then rebuilt)
+SEARCH_INDEX_VERSION = 1
+TERM_LENGTH = 3        # Length of the indexed substrings (trigrams)
+TERM_DIGEST_SIZE = 16  # Truncated HMAC-SHA256 stored for each term
+
+# Indexed fields, the ID being part of the HMAC input so that the same text gives different terms in each field
+INDEXED_FIELDS = {"title": b"T", "tags": b"G"}
+
+class SearchIndex:
+    # Initialize the index of a diary, the HMAC key being derived from its AES key
+    def __init__(self, db, aes_key):
+        self.db = db
+        self.hmac_key = hmac.new(aes_key, b"lifelog search index", hashlib.sha256).digest()
+
+
+    # Check if the index covers every entry of the diary
+    def is_built(self):
+        return self.db.has_setting("search_index_version") and int(self.db.get_setting("search_index_version")) == SEARCH_INDEX_VERSION
+
+
+    # Compute the keyed term of a substring of a field
+    def get_term(self, field, text):
+        return hmac.new(self.hmac_key, INDEXED_FIELDS[field] + text.encode("utf-8"), hashlib.sha256).digest()[:TERM_DIGEST_SIZE]
+
+
+    # Get the terms of every substring of TERM_LENGTH characters of a text
+    def get_text_terms(self, field, text):
+        return {self.get_term(field, text[i:i+TERM_LENGTH]) for i in range(len(text) - TERM_LENGTH + 1)}
+
+
+    # Get the terms to store for an entry
+    def get_entry_terms(self, entry_title, entry_tags):
+        return self.get_text_terms("title", entry_title) | self.get_text_terms("tags", entry_tags)
+
+
+    # Get the dates of the entries which may contain the searched text, or None if the index can't be used
+    def get_candidate_dates(self, field, search_content, from_date, to_date):
+        if field not in INDEXED_FIELDS or len(search_content) < TERM_LENGTH or not self.is_built():
+            return None
+
+        search_terms = self.get_text_terms(field, search_content)
+        return self.db.get_entry_dates_with_search_terms(search_terms, from_date, to_date)
+
+
+    # Index every entry of the diary, reading the rows in batches decrypted with the given function
+    # (returning the entry summary of each row, or None if it can't be decrypted)
+    # The entries which can't be decrypted aren't indexed, their dates are returned
+    def rebuild(self, decrypt_summary_rows, batch_size):
+        self.db.clear_search_terms()
+        damaged_dates = []
+        for entry_rows in self.db.iter_entry_summaries_between("0000-00-00", "9999-99-99", batch_size):
+            for entry_row, entry_summary in zip(entry_rows, decrypt_summary_rows(entry_rows)):
+                if entry_summary is None:
+                    damaged_dates.append(entry_row[1])
+                else:
+                    self.db.update_search_terms(entry_row[1], self.get_entry_terms(entry_summary.title, entry_summary.tags))
+        self.db.update_setting("search_index_version", SEARCH_INDEX_VERSION)
+        self.db.commit()
+        return damaged_dates
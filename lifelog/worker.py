@@ -0,0 +1,112 @@
+#    Lifelog (worker.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+class BackgroundWorker:
+    # Initialize the worker, dispatch being the function calling the callbacks from the main loop (GLib.idle_add)
+    # A single thread runs the jobs in order, so the database and the decrypted entries are never used concurrently
+    def __init__(self, dispatch, name="lifelog-worker"):
+        self.dispatch = dispatch
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=name)
+        self.latest_jobs = {} # key -> future of the latest job submitted with this key (only used from the main loop)
+        self.pending_jobs = 0 # Jobs whose callbacks haven't been called yet (only used from the main loop)
+        self.idle_jobs = deque() # (job, on_done) tuples, run one at a time when there is nothing else to do
+
+
+    # Run a job in the worker thread, then call on_done with its result (or on_error with its exception) from the main loop
+    # A job submitted with a key supersedes the previous one with the same key : the previous one is cancelled
+    # if it hasn't started yet, and its callbacks are never called otherwise
+    def submit(self, job, on_done=None, on_error=None, key=None):
+        if key is not None:
+            self.discard(key)
+
+        future = self.executor.submit(job)
+        self.pending_jobs += 1
+        if key is not None:
+            self.latest_jobs[key] = future
+        future.add_done_callback(lambda future: self.dispatch(self.deliver_result, future, key, on_done, on_error))
+        return future
+
+
+    # Run a job in the worker thread only when no other job is pending, then call on_done with its result from the main loop
+    # The other jobs therefore never wait for more than one idle job, and the exceptions of idle jobs are ignored
+    def submit_idle(self, job, on_done=None):
+        self.idle_jobs.append((job, on_done))
+        self.run_next_idle_job()
+
+
+    # Forget the jobs waiting for the worker to be idle
+    def clear_idle_jobs(self):
+        self.idle_jobs.clear()
+
+
+    # Start the next idle job if the worker has nothing else to do
+    def run_next_idle_job(self):
+        if self.idle_jobs and self.pending_jobs == 0:
+            job, on_done = self.idle_jobs.popleft()
+            self.submit(job, on_done, on_error=lambda exception: None)
+
+
+    # Forget the latest job submitted with a key, cancelling it if it hasn't started yet
+    def discard(self, key):
+        previous_future = self.latest_jobs.pop(key, None)
+        if previous_future:
+            previous_future.cancel()
+
+
+    # Check if the latest job submitted with a key hasn't delivered its result yet
+    def is_pending(self, key):
+        return key in self.latest_jobs
+
+
+    # Call the callbacks of a finished job (from the main loop)
+    def deliver_result(self, future, key, on_done, on_error):
+        self.pending_jobs -= 1
+        try:
+            self.call_callbacks(future, key, on_done, on_error)
+        finally:
+            self.run_next_idle_job()
+        return False
+
+
+    # Call the callbacks of a finished job, unless it has been cancelled or superseded
+    def call_callbacks(self, future, key, on_done, on_error):
+        if future.cancelled():
+            return
+
+        if key is not None:
+            # Ignore the results of the superseded jobs
+            if self.latest_jobs.get(key) is not future:
+                return
+            del self.latest_jobs[key]
+
+        exception = future.exception()
+        if exception is None:
+            if on_done:
+                on_done(future.result())
+        elif on_error:
+            on_error(exception)
+        else:
+            raise exception
+
+
+    # Wait for the submitted jobs to finish and stop the worker thread
+    def shutdown(self):
+        self.clear_idle_jobs()
+        self.executor.shutdown(wait=True)
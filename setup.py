@@ -40,7 +40,7 @@ setup(
         "pycryptodomex"
     ],
     entry_points={
-        "console_scripts": ["lifelog = lifelog.__main__:run"]
+        "console_scripts": ["lifelog = lifelog.launcher:run", "lifelog-cli = lifelog.cli:main"]
     },
     include_package_data=True,
     package_data = {
@@ -50,7 +50,9 @@ setup(
         ]
     },
     extras_require={
-        "dev": ["twine"]
+        "dev": ["twine"],
+        "argon2": ["argon2-cffi"],
+        "zstd": ["zstandard"]
     },
     python_requires=">=3.9",
 )
@@ -0,0 +1,140 @@
+#    Lifelog (test_archive.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from lifelog import archive
+from lifelog import key_manager
+from lifelog import rich_text
+from lifelog.entry import Entry
+
+# Fast KDF parameters, the calibrated ones taking about half a second
+TEST_KDF_PARAMS = {"version": key_manager.KDF_PARAMS_VERSION, "algorithm": "scrypt", "n": 2**10, "r": 8, "p": 1, "lanes": 1}
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.archive_filepath = os.path.join(temp_dir.name, "diary" + archive.ARCHIVE_EXTENSION)
+        calibration_patcher = mock.patch.object(key_manager, "calibrate_kdf_params", return_value=TEST_KDF_PARAMS)
+        calibration_patcher.start()
+        self.addCleanup(calibration_patcher.stop)
+
+        self.dated_entries = [(f"2024-01-{day:02d}", Entry(f"Day {day}", "tag", day, rich_text.from_plain_text(f"Text {day} é")))
+                              for day in range(1, 8)]
+
+
+    # Write the entries in chunks of 3 and return the offsets of the chunks
+    def write_archive(self, close=True):
+        writer = archive.ArchiveWriter(self.archive_filepath, b"password")
+        chunk_offsets = [writer.tell()]
+        for first_entry in range(0, len(self.dated_entries), 3):
+            writer.write_entries(self.dated_entries[first_entry:first_entry+3])
+            chunk_offsets.append(writer.tell())
+        if close:
+            writer.close()
+        else:
+            writer.file.close()
+        return chunk_offsets
+
+
+    def read_archive(self, password=b"password"):
+        return [(entry_date, (entry.title, entry.tags, entry.mood, bytes(entry.content)))
+                for entry_date, entry in archive.read_archive(self.archive_filepath, password)]
+
+
+    def get_expected_entries(self):
+        return [(entry_date, (entry.title, entry.tags, entry.mood, bytes(entry.content))) for entry_date, entry in self.dated_entries]
+
+
+    def test_round_trip(self):
+        self.write_archive()
+        self.assertEqual(self.read_archive(), self.get_expected_entries())
+        with self.assertRaises(ValueError):
+            self.read_archive(b"passwore")
+
+
+    def test_resume(self):
+        writer = archive.ArchiveWriter(self.archive_filepath, b"password")
+        writer.write_entries(self.dated_entries[:3])
+        state = writer.get_state()
+        # Written after the state was saved, then interrupted
+        writer.write_entries(self.dated_entries[3:])
+        writer.write_entries(self.dated_entries[3:])
+        writer.file.close()
+
+        writer = archive.ArchiveWriter(self.archive_filepath, b"password", state)
+        writer.write_entries(self.dated_entries[3:])
+        writer.close()
+        self.assertEqual(self.read_archive(), self.get_expected_entries())
+
+
+    def test_truncated_archive(self):
+        chunk_offsets = self.write_archive()
+        with open(self.archive_filepath, "rb") as archive_file:
+            archive_data = archive_file.read()
+
+        # Cut between chunks, in a chunk, or without the last chunk
+        for length in chunk_offsets + [chunk_offsets[1] + 10, len(archive_data) - 1]:
+            with open(self.archive_filepath, "wb") as archive_file:
+                archive_file.write(archive_data[:length])
+            with self.assertRaises(ValueError):
+                self.read_archive()
+
+
+    def test_unfinished_archive(self):
+        self.write_archive(close=False)
+        with self.assertRaises(ValueError):
+            self.read_archive()
+
+
+    def test_extended_archive(self):
+        self.write_archive()
+        with open(self.archive_filepath, "ab") as archive_file:
+            archive_file.write(bytes(16))
+        with self.assertRaises(ValueError):
+            self.read_archive()
+
+
+    def test_modified_archive(self):
+        chunk_offsets = self.write_archive()
+        with open(self.archive_filepath, "rb") as archive_file:
+            archive_data = archive_file.read()
+
+        for position in [chunk_offsets[0] + archive.LENGTH.size + 20, chunk_offsets[2] - 1, len(archive_data) - 1]:
+            with open(self.archive_filepath, "wb") as archive_file:
+                archive_file.write(archive_data[:position] + bytes([archive_data[position] ^ 1]) + archive_data[position+1:])
+            with self.assertRaises(ValueError):
+                self.read_archive()
+
+
+    def test_reordered_chunks(self):
+        chunk_offsets = self.write_archive()
+        with open(self.archive_filepath, "rb") as archive_file:
+            archive_data = archive_file.read()
+        first_chunk, second_chunk = archive_data[chunk_offsets[0]:chunk_offsets[1]], archive_data[chunk_offsets[1]:chunk_offsets[2]]
+        with open(self.archive_filepath, "wb") as archive_file:
+            archive_file.write(archive_data[:chunk_offsets[0]] + second_chunk + first_chunk + archive_data[chunk_offsets[2]:])
+        with self.assertRaises(ValueError):
+            self.read_archive()
+
+
+if __name__ == "__main__":
+    unittest.main()
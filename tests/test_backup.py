@@ -0,0 +1,122 @@
+#    Lifelog (test_backup.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import os
+import tempfile
+import unittest
+
+from lifelog import backup
+from lifelog import crypto_utils
+from lifelog import db_handler
+from lifelog import rich_text
+from lifelog.entry_store import EntryStore
+
+class BackupTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        self.backup_folder = os.path.join(self.temp_dir, "backups")
+        self.db = db_handler.DbHandler(os.path.join(self.temp_dir, "diary.db"))
+        self.addCleanup(self.db.close)
+        self.aes_cipher = crypto_utils.AESCipher(os.urandom(32))
+        self.store = EntryStore(self.db, self.aes_cipher)
+
+
+    # Contents of the tables changed with the entries, to compare a restored diary with the original one
+    @staticmethod
+    def get_tables(db):
+        return {table: sorted(db.conn.execute(f"SELECT * FROM {table}"))
+                for table in ("entries", "entry_chunks", "entry_changes", "search_terms", "mood_blocks", "settings")}
+
+
+    def restore(self, restored_filename):
+        restored_filepath = os.path.join(self.temp_dir, restored_filename)
+        backups_count = backup.restore_diary(self.backup_folder, restored_filepath)
+        restored_db = db_handler.DbHandler(restored_filepath)
+        self.addCleanup(restored_db.close)
+        return backups_count, restored_db
+
+
+    def test_full_and_incremental_backups(self):
+        long_text = "".join(f"Line {i}\n" for i in range(20000))
+        self.store.save_entry("2024-01-01", "First", "tag", 10, rich_text.from_plain_text("First entry"))
+        self.store.save_entry("2024-01-02", "Long", "", 20, rich_text.from_plain_text(long_text))
+        self.store.save_entry("2024-01-03", "Deleted", "", 30, rich_text.from_plain_text("Deleted later"))
+        backup_filepath, backup_info = backup.backup_diary(self.db, self.backup_folder)
+        self.assertEqual(backup_info["kind"], backup.BACKUP_FULL)
+
+        # A new entry, an edited one, a long entry made short (its chunks are deleted) and a deleted entry
+        self.store.save_entry("2024-01-04", "New", "", 40, rich_text.from_plain_text("New entry"))
+        self.store.save_entry("2024-01-01", "First edited", "tag", 15, rich_text.from_plain_text("Edited"))
+        backup_filepath, backup_info = backup.backup_diary(self.db, self.backup_folder)
+        self.assertEqual((backup_info["kind"], backup_info["entries"]), (backup.BACKUP_INCREMENTAL, 2))
+
+        self.store.save_entry("2024-01-02", "Short", "", 25, rich_text.from_plain_text("Not long anymore"))
+        self.db.conn.execute("DELETE FROM entries WHERE entry_date = ?", ("2024-01-03",))
+        self.db.conn.execute("DELETE FROM search_terms WHERE entry_date = ?", ("2024-01-03",))
+        self.db.commit()
+        backup_filepath, backup_info = backup.backup_diary(self.db, self.backup_folder)
+        self.assertEqual((backup_info["kind"], backup_info["entries"]), (backup.BACKUP_INCREMENTAL, 2))
+
+        backups_count, restored_db = self.restore("restored.db")
+        self.assertEqual(backups_count, 3)
+        self.assertEqual(self.get_tables(restored_db), self.get_tables(self.db))
+        self.assertEqual(restored_db.conn.execute("SELECT COUNT(*) FROM entry_chunks").fetchone()[0], 0)
+
+        restored_store = EntryStore(restored_db, self.aes_cipher)
+        self.assertIsNone(restored_db.get_entry_from_date("2024-01-03"))
+        self.assertEqual(restored_store.load_entry("2024-01-01").title, "First edited")
+        self.assertEqual(rich_text.to_plain_text(restored_store.load_entry("2024-01-02").content), "Not long anymore")
+        self.assertEqual(restored_store.load_entry("2024-01-04").mood, 40)
+
+        # The backups of the restored diary continue from the ones it was restored from
+        backup_filepath, backup_info = backup.backup_diary(restored_db, self.backup_folder)
+        self.assertEqual((backup_info["kind"], backup_info["entries"]), (backup.BACKUP_INCREMENTAL, 0))
+
+
+    def test_missing_incremental_backup(self):
+        self.store.save_entry("2024-01-01", "First", "", 10, rich_text.from_plain_text("First entry"))
+        backup.backup_diary(self.db, self.backup_folder)
+        self.store.save_entry("2024-01-02", "Second", "", 20, rich_text.from_plain_text("Second entry"))
+        missing_backup_filepath, backup_info = backup.backup_diary(self.db, self.backup_folder)
+        self.store.save_entry("2024-01-03", "Third", "", 30, rich_text.from_plain_text("Third entry"))
+        backup.backup_diary(self.db, self.backup_folder)
+
+        os.remove(missing_backup_filepath)
+        with self.assertRaises(ValueError):
+            self.restore("restored.db")
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, "restored.db")))
+
+
+    def test_full_backup_of_another_diary(self):
+        self.store.save_entry("2024-01-01", "First", "", 10, rich_text.from_plain_text("First entry"))
+        backup.backup_diary(self.db, self.backup_folder)
+
+        other_db = db_handler.DbHandler(os.path.join(self.temp_dir, "other.db"))
+        self.addCleanup(other_db.close)
+        EntryStore(other_db, self.aes_cipher).save_entry("2024-02-01", "Other", "", 50, rich_text.from_plain_text("Other diary"))
+        backup_filepath, backup_info = backup.backup_diary(other_db, self.backup_folder)
+        self.assertEqual(backup_info["kind"], backup.BACKUP_FULL)
+
+        backups_count, restored_db = self.restore("restored.db")
+        self.assertEqual(backups_count, 1)
+        self.assertEqual(self.get_tables(restored_db)["entries"], self.get_tables(other_db)["entries"])
+
+
+if __name__ == "__main__":
+    unittest.main()
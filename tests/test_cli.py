@@ -0,0 +1,64 @@
+#    Lifelog (test_cli.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from lifelog import cli
+from lifelog import core
+from lifelog import rich_text
+
+class WriteCommandTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.db_filepath = os.path.join(temp_dir.name, "diary.db")
+        self.content = rich_text.from_plain_text("First line\nSecond line")
+        with core.Diary(self.db_filepath, "password", create=True) as diary:
+            diary.write_entry("2024-01-01", title="Title", tags="tag", mood=40, content=self.content)
+
+        environment_patcher = mock.patch.dict(os.environ, {cli.PASSWORD_ENVIRONMENT_VARIABLE: "password"})
+        environment_patcher.start()
+        self.addCleanup(environment_patcher.stop)
+
+
+    def write(self, *arguments, stdin=""):
+        with mock.patch("sys.stdin", io.StringIO(stdin)):
+            cli.main([self.db_filepath, "write", "2024-01-01", *arguments])
+        with core.Diary(self.db_filepath, "password") as diary:
+            return diary.read_entry("2024-01-01")
+
+
+    def test_fields_not_given_are_kept(self):
+        entry = self.write("--mood", "70", stdin="not read")
+        self.assertEqual((entry.title, entry.tags, entry.mood), ("Title", "tag", 70))
+        self.assertEqual(bytes(entry.content), bytes(self.content))
+
+
+    def test_text(self):
+        entry = self.write("--text", "New text")
+        self.assertEqual((entry.title, entry.mood, rich_text.to_plain_text(entry.content)), ("Title", 40, "New text"))
+
+        entry = self.write("--text", "-", stdin="From stdin")
+        self.assertEqual(rich_text.to_plain_text(entry.content), "From stdin")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+#    Lifelog (test_core.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import os
+import tempfile
+import unittest
+
+from lifelog import core
+
+class DiaryPasswordTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.db_filepath = os.path.join(temp_dir.name, "diary.db")
+        with core.Diary(self.db_filepath, "old password", create=True) as diary:
+            diary.write_entry("2024-01-01", title="New year", text="First day")
+
+
+    def test_change_password(self):
+        with core.Diary(self.db_filepath, "old password") as diary:
+            diary.change_password("old password", "new password")
+
+        with self.assertRaises(ValueError):
+            core.Diary(self.db_filepath, "old password")
+        with core.Diary(self.db_filepath, "new password") as diary:
+            self.assertEqual(diary.read_entry("2024-01-01").title, "New year")
+            self.assertEqual(diary.read_text("2024-01-01"), "First day")
+
+
+    def test_change_password_checks_passwords(self):
+        with core.Diary(self.db_filepath, "old password") as diary:
+            with self.assertRaises(ValueError):
+                diary.change_password("wrong password", "new password")
+            with self.assertRaises(ValueError):
+                diary.change_password("old password", "short")
+
+        with core.Diary(self.db_filepath, "old password") as diary:
+            self.assertEqual(diary.read_entry("2024-01-01").title, "New year")
+
+
+class DiaryTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+
+
+    def test_missing_diary(self):
+        db_filepath = os.path.join(self.temp_dir, "mistyped.db")
+        with self.assertRaises(ValueError):
+            core.Diary(db_filepath, "password")
+        self.assertFalse(os.path.exists(db_filepath))
+
+        # An empty file has no keys
+        open(db_filepath, "wb").close()
+        with self.assertRaises(ValueError):
+            core.Diary(db_filepath, "password")
+
+
+    def test_mood_range(self):
+        with core.Diary(os.path.join(self.temp_dir, "diary.db"), "password", create=True) as diary:
+            for mood in (-5, 101, 255, 300):
+                with self.assertRaises(ValueError):
+                    diary.write_entry("2024-01-01", mood=mood)
+            self.assertEqual(diary.get_entry_dates(), [])
+
+            diary.write_entry("2024-01-01", mood=100)
+            diary.write_entry("2024-01-02", mood="0")
+            self.assertEqual([entry_date for entry_date, entry in diary.search("mood", ">= 0")], ["2024-01-01", "2024-01-02"])
+
+
+if __name__ == "__main__":
+    unittest.main()
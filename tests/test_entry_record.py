@@ -0,0 +1,96 @@
+#    Lifelog (test_entry_record.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import os
+import unittest
+
+from lifelog import rich_text
+from lifelog.entry import Entry
+from lifelog.entry_record import RecordCipher
+
+class RecordCipherTest(unittest.TestCase):
+    def setUp(self):
+        self.record_cipher = RecordCipher(os.urandom(32))
+        self.entry = Entry("Title é", "tag, other", 73, bytearray(rich_text.from_plain_text("Some text " * 100)))
+        self.attachment_ids = [os.urandom(32), os.urandom(32)]
+
+
+    def test_round_trip(self):
+        record = self.record_cipher.pack("2024-01-01", self.entry, self.attachment_ids)
+        entry_record = self.record_cipher.unpack("2024-01-01", record)
+        self.assertEqual(entry_record.entry, self.entry)
+        self.assertEqual(entry_record.attachment_ids, self.attachment_ids)
+        self.assertEqual((entry_record.content_id, entry_record.chunks_count), (b"", 0))
+
+        entry_summary = self.record_cipher.unpack("2024-01-01", record, with_content=False).entry
+        self.assertEqual(entry_summary, self.entry._replace(content=b""))
+
+
+    def test_modified_record(self):
+        record = self.record_cipher.pack("2024-01-01", self.entry)
+        for position in (0, len(record) // 2, len(record) - 1):
+            damaged_record = bytearray(record)
+            damaged_record[position] ^= 1
+            with self.assertRaises(ValueError):
+                self.record_cipher.unpack("2024-01-01", bytes(damaged_record))
+        with self.assertRaises(ValueError):
+            self.record_cipher.unpack("2024-01-01", record[:-1])
+
+
+    def test_record_bound_to_date_and_key(self):
+        record = self.record_cipher.pack("2024-01-01", self.entry)
+        with self.assertRaises(ValueError):
+            self.record_cipher.unpack("2024-01-02", record)
+        with self.assertRaises(ValueError):
+            RecordCipher(os.urandom(32)).unpack("2024-01-01", record)
+
+
+    def test_chunks_round_trip(self):
+        content_id = self.record_cipher.make_content_id()
+        record = self.record_cipher.pack("2024-01-01", self.entry, content_id=content_id, chunks_count=2)
+        entry_record = self.record_cipher.unpack("2024-01-01", record)
+        self.assertEqual((entry_record.content_id, entry_record.chunks_count), (content_id, 2))
+
+        chunk = rich_text.from_plain_text("Next chunk")
+        chunk_record = self.record_cipher.pack_chunk("2024-01-01", content_id, 1, chunk, self.attachment_ids)
+        self.assertEqual(self.record_cipher.unpack_chunk("2024-01-01", content_id, 1, chunk_record), (chunk, self.attachment_ids))
+
+
+    def test_chunk_bound_to_date_content_id_and_index(self):
+        content_id = self.record_cipher.make_content_id()
+        chunk_record = self.record_cipher.pack_chunk("2024-01-01", content_id, 1, rich_text.from_plain_text("Next chunk"))
+        for entry_date, chunk_content_id, chunk_index in (("2024-01-02", content_id, 1),
+                                                          ("2024-01-01", self.record_cipher.make_content_id(), 1),
+                                                          ("2024-01-01", content_id, 2)):
+            with self.assertRaises(ValueError):
+                self.record_cipher.unpack_chunk(entry_date, chunk_content_id, chunk_index, chunk_record)
+
+        damaged_chunk_record = bytearray(chunk_record)
+        damaged_chunk_record[-1] ^= 1
+        with self.assertRaises(ValueError):
+            self.record_cipher.unpack_chunk("2024-01-01", content_id, 1, bytes(damaged_chunk_record))
+
+        # An entry record can't be read as a chunk, and the other way round
+        record = self.record_cipher.pack("2024-01-01", self.entry)
+        with self.assertRaises(ValueError):
+            self.record_cipher.unpack_chunk("2024-01-01", content_id, 1, record)
+        with self.assertRaises(ValueError):
+            self.record_cipher.unpack("2024-01-01", chunk_record)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+#    Lifelog (test_entry_store.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import os
+import tempfile
+import unittest
+
+from lifelog import crypto_utils
+from lifelog import db_handler
+from lifelog import rich_text
+from lifelog import search
+from lifelog.entry_record import ENTRY_FORMAT_LEGACY
+from lifelog.entry_store import EntryStore
+
+class EntryStoreTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.db = db_handler.DbHandler(os.path.join(temp_dir.name, "diary.db"))
+        self.addCleanup(self.db.close)
+        self.aes_cipher = crypto_utils.AESCipher(os.urandom(32))
+        self.store = EntryStore(self.db, self.aes_cipher)
+
+
+    # Flip a bit of the record of an entry
+    def damage_entry(self, entry_date):
+        record = self.db.get_entry_from_date(entry_date)[5]
+        self.db.conn.execute("UPDATE entries SET entry_content = ? WHERE entry_date = ?", (record[:-1] + bytes([record[-1] ^ 1]), entry_date))
+        self.db.commit()
+        self.store.cache.clear()
+        return record
+
+
+    def get_entry_formats(self):
+        return dict(self.db.conn.execute("SELECT entry_date, entry_format FROM entries"))
+
+
+    # Save an entry the way older versions did, every field being encrypted separately
+    def save_legacy_entry(self, entry_date, entry_title, entry_content):
+        self.db.update_entry(entry_date, self.aes_cipher.encrypt(entry_title.encode("utf-8")), self.aes_cipher.encrypt(b""),
+                             self.aes_cipher.encrypt(b"50"), self.aes_cipher.encrypt(entry_content))
+        self.db.commit()
+
+
+    def test_reading_legacy_entries_doesnt_write(self):
+        content = rich_text.from_plain_text("Old entry")
+        self.save_legacy_entry("2020-01-01", "Old", content)
+        total_changes = self.db.conn.total_changes
+
+        self.assertEqual(self.store.load_entry("2020-01-01").title, "Old")
+        self.store.cache.clear()
+        self.assertEqual(self.store.load_entry_preview("2020-01-01").entry.title, "Old")
+        self.store.prefetch_entry("2020-01-02")
+        self.assertEqual(self.db.conn.total_changes, total_changes)
+        self.assertEqual(self.get_entry_formats(), {"2020-01-01": ENTRY_FORMAT_LEGACY})
+
+
+    def test_upgrade_legacy_entries(self):
+        for day in range(1, 6):
+            self.save_legacy_entry(f"2020-01-0{day}", f"Day {day}", rich_text.from_plain_text(f"Text {day}"))
+        self.store.save_entry("2020-02-01", "New", "", 50, rich_text.from_plain_text("New entry"))
+
+        self.assertEqual(self.store.upgrade_legacy_entries(batch_size=2), 5)
+        self.assertNotIn(ENTRY_FORMAT_LEGACY, self.get_entry_formats().values())
+        self.store.cache.clear()
+        for day in range(1, 6):
+            entry = self.store.load_entry(f"2020-01-0{day}")
+            self.assertEqual((entry.title, rich_text.to_plain_text(entry.content)), (f"Day {day}", f"Text {day}"))
+        self.assertEqual(self.store.upgrade_legacy_entries(), 0)
+
+
+    def test_damaged_entry_cant_be_saved_over(self):
+        self.store.save_entry("2024-01-01", "Kept", "", 50, rich_text.from_plain_text("Some text"))
+        record = self.damage_entry("2024-01-01")
+
+        with self.assertRaises(ValueError):
+            self.store.load_entry_preview("2024-01-01")
+        with self.assertRaises(ValueError):
+            self.store.save_entry("2024-01-01", "", "", 50, b"")
+        with self.assertRaises(ValueError):
+            self.store.save_entries([("2024-01-02", self.store.load_entry("2024-01-02")), ("2024-01-01", self.store.load_entry("2024-01-02"))])
+        self.assertEqual(self.db.get_entry_from_date("2024-01-01")[5][:-1], record[:-1])
+        self.assertIsNone(self.db.get_entry_from_date("2024-01-02"))
+
+        # Once the entry is read again successfully, it can be saved
+        self.db.conn.execute("UPDATE entries SET entry_content = ? WHERE entry_date = ?", (record, "2024-01-01"))
+        self.db.commit()
+        self.assertEqual(self.store.load_entry("2024-01-01").title, "Kept")
+        self.store.save_entry("2024-01-01", "Edited", "", 50, b"")
+        self.store.cache.clear()
+        self.assertEqual(self.store.load_entry("2024-01-01").title, "Edited")
+
+
+    def test_chunked_entry_round_trip(self):
+        text = "".join(f"Line {i}\n" for i in range(20000))
+        self.store.save_entry("2024-01-01", "Long", "", 50, rich_text.from_plain_text(text))
+        chunks_count = self.db.conn.execute("SELECT COUNT(*) FROM entry_chunks WHERE entry_date = ?", ("2024-01-01",)).fetchone()[0]
+        self.assertGreater(chunks_count, 1)
+
+        self.store.cache.clear()
+        self.assertEqual(rich_text.to_plain_text(self.store.load_entry("2024-01-01").content), text)
+        self.store.cache.clear()
+        entry_preview = self.store.load_entry_preview("2024-01-01")
+        self.assertEqual(entry_preview.chunks_count, chunks_count)
+        content = bytes(entry_preview.entry.content) + b"".join(self.store.load_entry_chunk("2024-01-01", entry_preview.content_id, chunk_index)[0]
+                                                                for chunk_index in range(1, chunks_count + 1))
+        self.assertEqual(rich_text.to_plain_text(content), text)
+
+        # The chunks of an older version of the entry can't be put back, and a shorter version has no chunks left
+        old_chunk = self.db.get_entry_chunk("2024-01-01", 1)
+        self.store.save_entry("2024-01-01", "Long", "", 50, rich_text.from_plain_text(text + "More\n"))
+        self.db.conn.execute("UPDATE entry_chunks SET chunk_record = ? WHERE entry_date = ? AND chunk_index = 1", (old_chunk, "2024-01-01"))
+        self.db.commit()
+        self.store.cache.clear()
+        with self.assertRaises(ValueError):
+            self.store.load_entry("2024-01-01")
+        self.store.damaged_dates.clear()
+        self.store.save_entry("2024-01-01", "Short", "", 50, rich_text.from_plain_text("Short"))
+        self.assertIsNone(self.db.get_entry_chunk("2024-01-01", 1))
+
+
+    def test_damaged_chunk_cant_be_saved_over(self):
+        self.store.save_entry("2024-01-01", "Long", "", 50, rich_text.from_plain_text("line\n" * 10000))
+        entry_preview = self.store.load_entry_preview("2024-01-01")
+        self.assertGreater(entry_preview.chunks_count, 1)
+        self.db.conn.execute("DELETE FROM entry_chunks WHERE entry_date = ? AND chunk_index = 2", ("2024-01-01",))
+        self.db.commit()
+
+        self.store.load_entry_chunk("2024-01-01", entry_preview.content_id, 1)
+        with self.assertRaises(ValueError):
+            self.store.load_entry_chunk("2024-01-01", entry_preview.content_id, 2)
+        with self.assertRaises(ValueError):
+            self.store.save_entry("2024-01-01", "Long", "", 50, entry_preview.entry.content)
+
+
+    def test_search_index_rebuild_skips_damaged_entries(self):
+        self.store.ensure_indexes_built()
+        self.store.save_entries([(f"2024-01-0{day}", self.store.load_entry("2024-01-01")._replace(title=f"Walk {day}")) for day in range(1, 5)])
+        self.damage_entry("2024-01-02")
+        self.db.delete_setting("search_index_version")
+        self.db.commit()
+
+        found_dates = [entry_date for found_entries in search.iter_search_results(self.store, "0000-00-00", "9999-99-99", "title", "Walk", 2)
+                       for entry_date, entry_summary in found_entries]
+        self.assertEqual(found_dates, ["2024-01-01", "2024-01-03", "2024-01-04"])
+        self.assertTrue(self.store.search_index.is_built())
+        self.assertEqual(self.store.damaged_dates, {"2024-01-02"})
+
+        # The other dates can still be saved
+        self.store.ensure_indexes_built()
+        self.store.save_entry("2024-01-05", "Walk 5", "", 50, b"")
+        self.assertEqual(self.store.search_index.get_candidate_dates("title", "Walk", "0000-00-00", "9999-99-99"),
+                         ["2024-01-01", "2024-01-03", "2024-01-04", "2024-01-05"])
+
+
+    def test_mood_store_rebuild_skips_damaged_entries(self):
+        self.store.ensure_indexes_built()
+        self.store.save_entries([(f"2024-01-0{day}", self.store.load_entry("2024-01-01")._replace(mood=day * 10)) for day in range(1, 5)])
+        self.damage_entry("2024-01-03")
+        self.db.delete_setting("mood_store_version")
+        self.db.commit()
+        self.store.mood_store.close()
+
+        self.assertEqual(self.store.get_mood_stats("2024-01-01", "2024-01-31")["2024-01"]["count"], 3)
+        found_dates = [entry_date for found_entries in search.iter_search_results(self.store, "0000-00-00", "9999-99-99", "mood", ">= 20", 2)
+                       for entry_date, entry_summary in found_entries]
+        self.assertEqual(found_dates, ["2024-01-02", "2024-01-04"])
+        self.assertTrue(self.store.mood_store.is_built())
+        self.assertEqual(self.store.damaged_dates, {"2024-01-03"})
+
+
+if __name__ == "__main__":
+    unittest.main()
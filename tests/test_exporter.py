@@ -0,0 +1,93 @@
+#    Lifelog (test_exporter.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from lifelog import archive
+from lifelog import cli
+from lifelog import core
+from lifelog import exporter
+from lifelog import key_manager
+
+# Fast KDF parameters, the calibrated ones taking about half a second
+TEST_KDF_PARAMS = {"version": key_manager.KDF_PARAMS_VERSION, "algorithm": "scrypt", "n": 2**10, "r": 8, "p": 1, "lanes": 1}
+
+class ExportResumeTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        self.db_filepath = os.path.join(self.temp_dir, "diary.db")
+        for patcher in (mock.patch.object(key_manager, "calibrate_kdf_params", return_value=TEST_KDF_PARAMS),
+                        mock.patch.dict(os.environ, {cli.PASSWORD_ENVIRONMENT_VARIABLE: "password",
+                                                     cli.ARCHIVE_PASSWORD_ENVIRONMENT_VARIABLE: "archive password"})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.entry_dates = [f"2024-01-{day:02d}" for day in range(1, 11)]
+        with core.Diary(self.db_filepath, "password", create=True) as diary:
+            for day, entry_date in enumerate(self.entry_dates, 1):
+                diary.write_entry(entry_date, title=f"Day {day}", tags="tag", mood=day, text=f"Text {day}")
+
+
+    # Export in batches of 3 entries, the export being interrupted after writing the third batch (and the start of another one)
+    # but before saving its state
+    def export_interrupted(self, output_path, export_format, writer_class):
+        write_entries = writer_class.write_entries
+        written_batches = []
+        def interrupted_write_entries(writer, dated_entries):
+            write_entries(writer, dated_entries)
+            written_batches.append(None)
+            if len(written_batches) == 3:
+                writer.file.write(bytes(4096))
+                raise KeyboardInterrupt
+
+        with mock.patch.object(writer_class, "write_entries", interrupted_write_entries):
+            with self.assertRaises(KeyboardInterrupt):
+                exporter.main([self.db_filepath, output_path, "--format", export_format, "--batch-size", "3"])
+        with open(output_path + exporter.STATE_FILE_SUFFIX, encoding="utf-8") as state_file:
+            self.assertEqual(json.load(state_file)["exported_entries"], 6)
+
+        # The output must not be overwritten by a new export
+        with self.assertRaises(SystemExit):
+            exporter.main([self.db_filepath, output_path, "--format", export_format])
+        exporter.main([self.db_filepath, output_path, "--format", export_format, "--batch-size", "3", "--resume"])
+        self.assertFalse(os.path.exists(output_path + exporter.STATE_FILE_SUFFIX))
+
+
+    def test_resume_jsonl(self):
+        output_path = os.path.join(self.temp_dir, "diary.jsonl")
+        self.export_interrupted(output_path, "jsonl", exporter.JsonlWriter)
+        with open(output_path, encoding="utf-8") as output_file:
+            exported_entries = [json.loads(line) for line in output_file]
+        self.assertEqual([(exported_entry["date"], exported_entry["title"], exported_entry["text"]) for exported_entry in exported_entries],
+                         [(entry_date, f"Day {day}", f"Text {day}") for day, entry_date in enumerate(self.entry_dates, 1)])
+
+
+    def test_resume_archive(self):
+        output_path = os.path.join(self.temp_dir, "diary" + archive.ARCHIVE_EXTENSION)
+        self.export_interrupted(output_path, "archive", archive.ArchiveWriter)
+        self.assertEqual([(entry_date, entry.title, entry.mood) for entry_date, entry in archive.read_archive(output_path, b"archive password")],
+                         [(entry_date, f"Day {day}", day) for day, entry_date in enumerate(self.entry_dates, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
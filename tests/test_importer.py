@@ -0,0 +1,114 @@
+#    Lifelog (test_importer.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from lifelog import archive
+from lifelog import cli
+from lifelog import core
+from lifelog import exporter
+from lifelog import importer
+from lifelog import key_manager
+
+# Fast KDF parameters, the calibrated ones taking about half a second
+TEST_KDF_PARAMS = {"version": key_manager.KDF_PARAMS_VERSION, "algorithm": "scrypt", "n": 2**10, "r": 8, "p": 1, "lanes": 1}
+
+class ImportTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.temp_dir = temp_dir.name
+        self.db_filepath = os.path.join(self.temp_dir, "diary.db")
+        for patcher in (mock.patch.object(key_manager, "calibrate_kdf_params", return_value=TEST_KDF_PARAMS),
+                        mock.patch.dict(os.environ, {cli.PASSWORD_ENVIRONMENT_VARIABLE: "password",
+                                                     cli.ARCHIVE_PASSWORD_ENVIRONMENT_VARIABLE: "archive password"})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+    def write_jsonl(self, source_filepath, rows):
+        with open(source_filepath, "w", encoding="utf-8") as source_file:
+            source_file.writelines(json.dumps(row) + "\n" for row in rows)
+
+
+    def read_entries(self, db_filepath):
+        with core.Diary(db_filepath, "password") as diary:
+            return {entry_date: (entry.title, entry.mood, diary.read_text(entry_date)) for entry_date, entry in
+                    ((entry_date, diary.read_entry(entry_date)) for entry_date in diary.get_entry_dates())}
+
+
+    def test_rerun_after_stopped_import(self):
+        with core.Diary(self.db_filepath, "password", create=True) as diary:
+            diary.write_entry("2024-01-02", title="Existing", mood=90, text="Written before the import")
+
+        rows = [{"date": f"2024-01-{day:02d}", "title": f"Day {day}", "mood": day, "text": f"Text {day}"} for day in range(1, 11)]
+        source_filepath = os.path.join(self.temp_dir, "source.jsonl")
+        self.write_jsonl(source_filepath, rows[:7] + [{**rows[7], "mood": "high"}] + rows[8:])
+
+        # Stopped at the 8th line, after saving the first two batches (the existing entry being skipped)
+        with self.assertRaises(SystemExit):
+            importer.main([self.db_filepath, source_filepath, "--batch-size", "3"])
+        entries = self.read_entries(self.db_filepath)
+        self.assertEqual(sorted(entries), [f"2024-01-{day:02d}" for day in range(1, 8)])
+
+        self.write_jsonl(source_filepath, rows)
+        importer.main([self.db_filepath, source_filepath, "--batch-size", "3"])
+        expected_entries = {row["date"]: (row["title"], row["mood"], row["text"]) for row in rows}
+        expected_entries["2024-01-02"] = ("Existing", 90, "Written before the import")
+        self.assertEqual(self.read_entries(self.db_filepath), expected_entries)
+
+        with core.Diary(self.db_filepath, "password") as diary:
+            self.assertEqual([entry_date for entry_date, entry in diary.search("title", "Day 9")], ["2024-01-09"])
+
+
+    def test_replace(self):
+        with core.Diary(self.db_filepath, "password", create=True) as diary:
+            diary.write_entry("2024-01-01", title="Existing", mood=90, text="Written before the import")
+        source_filepath = os.path.join(self.temp_dir, "source.jsonl")
+        self.write_jsonl(source_filepath, [{"date": "2024-01-01", "title": "Imported", "mood": 10, "text": "Imported text"}])
+
+        importer.main([self.db_filepath, source_filepath, "--replace"])
+        self.assertEqual(self.read_entries(self.db_filepath), {"2024-01-01": ("Imported", 10, "Imported text")})
+
+
+    def test_archive_round_trip(self):
+        with core.Diary(self.db_filepath, "password", create=True) as diary:
+            for day in range(1, 6):
+                diary.write_entry(f"2024-01-{day:02d}", title=f"Day {day}", tags="tag", mood=day * 10, text=f"Text {day}")
+        archive_filepath = os.path.join(self.temp_dir, "diary" + archive.ARCHIVE_EXTENSION)
+        exporter.main([self.db_filepath, archive_filepath, "--format", "archive", "--batch-size", "2"])
+
+        imported_db_filepath = os.path.join(self.temp_dir, "imported.db")
+        importer.main([imported_db_filepath, archive_filepath, "--create", "--batch-size", "2"])
+        self.assertEqual(self.read_entries(imported_db_filepath), self.read_entries(self.db_filepath))
+
+        # A wrong archive password stops before anything is imported
+        other_db_filepath = os.path.join(self.temp_dir, "other.db")
+        with core.Diary(other_db_filepath, "password", create=True):
+            pass
+        with mock.patch.dict(os.environ, {cli.ARCHIVE_PASSWORD_ENVIRONMENT_VARIABLE: "wrong password"}):
+            with self.assertRaises(SystemExit):
+                importer.main([other_db_filepath, archive_filepath])
+        self.assertEqual(self.read_entries(other_db_filepath), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
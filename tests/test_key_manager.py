@@ -0,0 +1,118 @@
+#    Lifelog (test_key_manager.py)
+#    Copyright (C) 2024 MrBeam89_
+#
+#    This file is part of Lifelog.
+#
+#    Lifelog is free software: you can redistribute it and/or modify it under the terms of 
+#    the GNU General Public License as published by the Free Software Foundation, 
+#    either version 3 of the License, or (at your option) any later version.
+#
+#    Lifelog is distributed in the hope that it will be useful, but WITHOUT ANY 
+#    WARRANTY; without even the implied warranty of MERCHANTABILITY or 
+#    FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for 
+#    more details.
+#
+#    You should have received a copy of the GNU General Public License along with 
+#    Lifelog. If not, see <https://www.gnu.org/licenses/>. 
+
+import os
+import tempfile
+import unittest
+
+from lifelog import crypto_utils
+from lifelog import db_handler
+from lifelog import key_manager
+from lifelog import key_migration
+from lifelog import rich_text
+from lifelog.entry_record import ENTRY_FORMAT_LEGACY
+from lifelog.entry_store import EntryStore
+
+# Fast KDF parameters, the default ones being calibrated to take about half a second
+TEST_KDF_PARAMS = {"version": key_manager.KDF_PARAMS_VERSION, "algorithm": "scrypt", "n": 2**10, "r": 8, "p": 1, "lanes": 1}
+
+class KeyManagerTest(unittest.TestCase):
+    def setUp(self):
+        temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        self.db = db_handler.DbHandler(os.path.join(temp_dir.name, "diary.db"))
+        self.addCleanup(self.db.close)
+
+
+    def test_create_and_unlock(self):
+        aes_key = key_manager.create_keys(self.db, b"password", TEST_KDF_PARAMS)
+        self.db.commit()
+        self.assertEqual(key_manager.unlock(self.db, b"password"), aes_key)
+        self.assertIsNone(key_manager.unlock(self.db, b"passwore"))
+        self.assertFalse(key_manager.needs_key_migration(self.db))
+        self.assertFalse(key_manager.needs_rehash(self.db))
+
+
+    def test_modified_wrapped_key(self):
+        key_manager.create_keys(self.db, b"password", TEST_KDF_PARAMS)
+        wrapped_aes_key = bytearray(self.db.get_setting("wrapped_aes_key"))
+        wrapped_aes_key[-1] ^= 1
+        self.db.update_setting("wrapped_aes_key", bytes(wrapped_aes_key))
+        with self.assertRaises(ValueError):
+            key_manager.unlock(self.db, b"password")
+
+
+    def test_change_password(self):
+        aes_key = key_manager.create_keys(self.db, b"old password", TEST_KDF_PARAMS)
+        self.db.commit()
+        wrapped_aes_key = self.db.get_setting("wrapped_aes_key")
+
+        self.assertFalse(key_manager.change_password(self.db, b"wrong password", b"new password"))
+        self.assertEqual(key_manager.unlock(self.db, b"old password"), aes_key)
+
+        # The same AES key is wrapped again, with new salts
+        self.assertTrue(key_manager.change_password(self.db, b"old password", b"new password"))
+        self.assertIsNone(key_manager.unlock(self.db, b"old password"))
+        self.assertEqual(key_manager.unlock(self.db, b"new password"), aes_key)
+        self.assertNotEqual(self.db.get_setting("wrapped_aes_key"), wrapped_aes_key)
+
+
+    # Setup a diary the way the first versions did : the AES key derived from the password, and every field encrypted separately
+    def create_legacy_diary(self, password, dated_texts):
+        encryption_salt, password_verification_salt = os.urandom(16), os.urandom(16)
+        self.db.update_setting("encryption_salt", encryption_salt)
+        self.db.update_setting("password_verification_salt", password_verification_salt)
+        self.db.update_setting("password_verification_hash", crypto_utils.scryptHasher.hash_password(password, password_verification_salt))
+        aes_cipher = crypto_utils.AESCipher(crypto_utils.scryptHasher.hash_password(password, encryption_salt))
+        for entry_date, text in dated_texts:
+            self.db.update_entry(entry_date, aes_cipher.encrypt(text.encode("utf-8")), aes_cipher.encrypt(b"tag"), aes_cipher.encrypt(b"60"),
+                                 aes_cipher.encrypt(rich_text.from_plain_text(text)))
+        self.db.commit()
+        return aes_cipher.key
+
+
+    def test_migrate_to_random_key(self):
+        dated_texts = [(f"2020-01-{day:02d}", f"Day {day}") for day in range(1, 8)]
+        legacy_aes_key = self.create_legacy_diary(b"password", dated_texts)
+        self.assertTrue(key_manager.needs_key_migration(self.db))
+        self.assertEqual(key_manager.unlock(self.db, b"password"), legacy_aes_key)
+
+        self.assertFalse(key_migration.migrate_to_random_key(self.db, b"wrong password"))
+        self.assertTrue(key_manager.needs_key_migration(self.db))
+
+        self.assertTrue(key_migration.migrate_to_random_key(self.db, b"password", batch_size=3))
+        self.assertFalse(key_manager.needs_key_migration(self.db))
+        self.assertFalse(key_manager.needs_rehash(self.db))
+        for legacy_key_setting in key_manager.LEGACY_KEY_SETTINGS:
+            self.assertFalse(self.db.has_setting(legacy_key_setting))
+
+        aes_key = key_manager.unlock(self.db, b"password")
+        self.assertNotEqual(aes_key, legacy_aes_key)
+        store = EntryStore(self.db, crypto_utils.AESCipher(aes_key))
+        self.assertNotIn(ENTRY_FORMAT_LEGACY, [row[6] for row in self.db.get_entries_after_id(0, 100)])
+        for entry_date, text in dated_texts:
+            entry = store.load_entry(entry_date)
+            self.assertEqual((entry.title, entry.tags, entry.mood, rich_text.to_plain_text(entry.content)), (text, "tag", 60, text))
+
+        # The search index and the mood store are rebuilt with the new key
+        store.ensure_indexes_built()
+        self.assertEqual(store.search_index.get_candidate_dates("title", "Day 3", "0000-00-00", "9999-99-99"), ["2020-01-03"])
+        self.assertEqual(store.get_mood_stats("2020-01-01", "2020-01-31")["2020-01"]["count"], len(dated_texts))
+
+
+if __name__ == "__main__":
+    unittest.main()